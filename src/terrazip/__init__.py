@@ -0,0 +1,34 @@
+from typing import TYPE_CHECKING
+import importlib
+
+if TYPE_CHECKING:
+    from .cores import Terrazip, TerrazipFastapi
+    from . import ai
+
+# PEP 562: nothing heavy (FastAPI, adapters, langchain...) is imported by `import terrazip`
+_LAZY_IMPORTS = {
+    'Terrazip': '.cores',
+    'TerrazipFastapi': '.cores',
+}
+# Optional extras, their dependencies are only needed when used
+_LAZY_SUBMODULES = ('ai',)
+
+__all__ = [
+    'Terrazip',
+    'TerrazipFastapi',
+]
+
+
+def __getattr__(name: str):
+    if name in _LAZY_SUBMODULES:
+        return importlib.import_module(f'.{name}', __name__)
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__ + list(_LAZY_SUBMODULES))
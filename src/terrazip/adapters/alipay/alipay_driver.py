@@ -1,8 +1,7 @@
 from decimal import Decimal
-from typing import Tuple
+from typing import Tuple, Optional
 import json
 from urllib.parse import quote as urlib_quote
-from urllib.parse import parse_qs
 
 from .alipay_config import (
     AlipayCredential,
@@ -20,9 +19,11 @@ from ...utils import (
     logger,
     error_context,
     AsyncRequest,
-    sign_with_rsa2,
-    verify_sign_rsa2,
+    PoolConfig,
+    RSA2Signer,
+    SignExecutor,
     process_payload_to_json,
+    ParsedPayload,
     is_currency_support
 )
 from ...utils.exceptions import *
@@ -40,19 +41,35 @@ class AlipayDriver(AdapterDriver):
         webhook_url: str| None = None,
         timeout: Decimal = 10.0,
         retry_codes: Tuple = (500, 502, 503, 504),
+        pool: Optional[PoolConfig] = None,
+        sign_executor: Optional[SignExecutor] = None,
     ):
         self._gateway = gateway
         self._credentials = credentials
         self._webhook_url = webhook_url
-        logger.debug(f"Init alipay gateway: {gateway}, credentials: {credentials}")
-        self._requestor = AsyncRequest(timeout=timeout, retry_codes=retry_codes)
+        logger.debug("Init alipay gateway: {}, app_id: {}", gateway, credentials.APP_ID)
+        self._requestor = AsyncRequest(timeout=timeout, retry_codes=retry_codes, pool=pool, name="alipay")
+        self._sign_executor = sign_executor
+        self._signer: RSA2Signer | None = None
+
+    async def init(self):
+        # Parse the keys once, they are reused for every order, query and webhook
+        self._signer = RSA2Signer(
+            private_key=self._credentials.PRIVATE_KEY,
+            public_key=self._credentials.PUBLIC_KEY,
+            executor=self._sign_executor,
+        )
+        logger.info("Load alipay RSA2 keys")
+
+    async def aclose(self):
+        await self._requestor.aclose()
 
     async def create_order(self, order: OrderCreatorScheme) -> OrderSnapshot:
         if not self._credentials.APP_ID:
             logger.error("Alipay should input app_id, but got None")
             raise ServerCredentialError("Alipay should input app_id, but got None")
 
-        logger.debug(f"Alipay order info: {order}")
+        logger.debug("Alipay order info: {}", order)
         
         if not is_currency_support(order.currency, SUPPORT_CURRENCY):
             logger.error(f'{order.currency} is not supported in {SUPPORT_CURRENCY}')
@@ -79,14 +96,14 @@ class AlipayDriver(AdapterDriver):
             ),
         ).model_dump(exclude_none=True)
 
-        sign = sign_with_rsa2(params, self._credentials.PRIVATE_KEY)
+        sign = await self._signer.asign(params)
         params["sign"] = sign
 
         paylink = f"{self._gateway.base_url}?" + "&".join(
             f"{k}={urlib_quote(str(v))}" for k, v in params.items()
         )
 
-        logger.debug(f"Sign with rsa2 and create paylink for {paylink}")
+        logger.debug("Sign with rsa2 and create paylink for {}", paylink)
         logger.info("Create alipay order")
 
         return OrderSnapshot(
@@ -99,27 +116,31 @@ class AlipayDriver(AdapterDriver):
 
 
     async def capture_order(self, order_snapshot: OrderSnapshot) -> OrderSnapshot:
-        logger.debug(f"Alipay no need for capture order: {order_snapshot}")
+        logger.debug("Alipay no need for capture order: {}", order_snapshot)
         return order_snapshot.replace(
             status=OrderStatus.CAPTURED
         )
 
 
     async def verify_webhook(
-        self, header: dict, body: bytes, order_snapshot: OrderSnapshot
+        self,
+        header: dict,
+        body: bytes,
+        order_snapshot: OrderSnapshot,
+        payload: Optional[ParsedPayload] = None,
     ) -> OrderSnapshot:
-        logger.debug(f"webhook for header: {order_snapshot}")
-        decoded = body.decode("utf-8") if body else ""
-        params = {k: v[0] for k, v in parse_qs(decoded).items()}
-        logger.debug(f"Webhook with payload: {body}")
+        logger.debug("webhook for header: {}", order_snapshot)
+        # A copy, sign and sign_type are popped below
+        params = dict((payload or ParsedPayload(body, header)).form)
+        logger.debug("Webhook with payload: {}", body)
         try:
             if params.get("trade_status") == "TRADE_SUCCESS":
                 sign = params.pop("sign", None)
                 params.pop("sign_type", None)
-                logger.debug(f"Sign for {sign}")
-                if verify_sign_rsa2(params, sign, self._credentials.PUBLIC_KEY):
+                logger.debug("Sign for {}", {"sign": sign})
+                if await self._signer.averify(params, sign):
                     logger.warning("Verify signature failed params")
-                    logger.debug(f"Verify params: {params}")
+                    logger.debug("Verify params: {}", params)
                     return order_snapshot.replace(
                         status=OrderStatus.WEBHOOKED,
                     )
@@ -130,14 +151,16 @@ class AlipayDriver(AdapterDriver):
             raise ServerRequestError(error_info)
 
     @classmethod
-    def extract_order_id(cls, header: dict, body: bytes) -> str:
-        decoded = body.decode("utf-8") if body else ""
-        params = {k: v[0] for k, v in parse_qs(decoded).items()}
-        return params["out_trade_no"]
+    def extract_order_id(cls, header: dict, body: bytes, payload: Optional[ParsedPayload] = None) -> str:
+        return (payload or ParsedPayload(body, header)).form["out_trade_no"]
+
+    @classmethod
+    def extract_event_id(cls, header: dict, body: bytes, payload: Optional[ParsedPayload] = None) -> Optional[str]:
+        return (payload or ParsedPayload(body, header)).form.get("notify_id")
 
 
     async def fetch_order_status(self, order_snapshot: OrderSnapshot) -> OrderSnapshot:
-        logger.debug(f"Get order_snapshot for {order_snapshot}")
+        logger.debug("Get order_snapshot for {}", order_snapshot)
         biz_content = {
             "out_trade_no": order_snapshot.order_id,
             "query_options": ["trade_settle_info"],
@@ -155,10 +178,10 @@ class AlipayDriver(AdapterDriver):
                 separators=(",", ":"),
             ),
         ).model_dump(exclude_none=True)
-        sign = sign_with_rsa2(params, self._credentials.PRIVATE_KEY)
+        sign = await self._signer.asign(params)
         params["sign"] = sign
         response = await self._requestor.post(
-            url=f"{self._gateway.base_url}", data=params
+            url=f"{self._gateway.base_url}", data=params, endpoint="trade_query"
         )
         if response.status_code != 200:
             raise RuntimeError(f"Alipay HTTP error: {response.status_code}")
@@ -167,7 +190,7 @@ class AlipayDriver(AdapterDriver):
             payload=response.content, headers=response.headers
         )
 
-        logger.debug(f"Alipay raw response: {payload}")
+        logger.debug("Alipay raw response: {}", payload)
         query_response = payload.get("alipay_trade_query_response")
         if not query_response:
             raise RuntimeError("Invalid Alipay response structure")
@@ -176,7 +199,7 @@ class AlipayDriver(AdapterDriver):
             raise RuntimeError("order id incorrect")
 
         if query_response.get("code") != "10000":
-            logger.debug(f"Alipay query payment failed for {query_response}")
+            logger.debug("Alipay query payment failed for {}", query_response)
 
             return order_snapshot.replace(status=OrderStatus.FAILED)
 
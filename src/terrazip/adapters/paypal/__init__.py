@@ -1,8 +1,11 @@
 from .paypal_config import PayPalCredential, PayPalGateway
 from .paypal_driver import PayPalDriver
+from .paypal_cache import WebhookRegistryCache, CertificateCache
 
 __all__ = [
     "PayPalCredential",
     "PayPalGateway",
     "PayPalDriver",
+    "WebhookRegistryCache",
+    "CertificateCache",
 ]
\ No newline at end of file
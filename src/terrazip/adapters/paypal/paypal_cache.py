@@ -0,0 +1,171 @@
+from typing import Dict, Optional, Set, Tuple
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+from ...utils import logger, is_private_path
+
+
+def _read_json(path: str) -> dict:
+    try:
+        # No follow, the path was checked with lstat and must not be swapped for a link
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+        with open(fd, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_json(path: str, data: dict):
+    """
+    Atomic replace, so parallel workers never read a half written file.
+    The temp file is created exclusive and no-follow (mkstemp), owner only (0600).
+    """
+    fd, tmp_path = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp", dir=os.path.dirname(path) or None)
+    try:
+        with open(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _private_directory(directory: Optional[str], what: str) -> Optional[str]:
+    """
+    directory created 0700 when missing, None (memory only) unless it is private.
+    """
+    if not directory:
+        return None
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    except OSError as e:
+        logger.warning(f"Create {what} {directory} failed: {e}")
+    if not is_private_path(directory, is_dir=True):
+        logger.warning(f"{what.capitalize()} {directory} is not private (owner only, 0700), keep it in memory")
+        return None
+    return directory
+
+
+class WebhookRegistryCache:
+    """
+    Webhook urls registered in a PayPal app, cached so that driver inits reuse
+    a recent listing instead of calling `v1/notifications/webhooks` every time.
+
+    In memory only by default. With a directory, restarts and parallel workers
+    on one host also share it through a JSON file, under the same owner only
+    policy as CertificateCache.
+    """
+
+    FILENAME = "paypal_webhooks.json"
+
+    def __init__(self, directory: Optional[str] = None, ttl: float = 600.0):
+        self.directory = _private_directory(directory, "webhook registry cache")
+        self.ttl = ttl
+        # key -> (expires_at, urls), wall clock as the file is shared between processes
+        self._memory: Dict[str, Tuple[float, Set[str]]] = {}
+
+    @property
+    def path(self) -> Optional[str]:
+        return os.path.join(self.directory, self.FILENAME) if self.directory else None
+
+    def _trusted_path(self) -> Optional[str]:
+        # Checked on every access, the directory may have been replaced since
+        if not self.directory or not is_private_path(self.directory, is_dir=True):
+            return None
+        return self.path
+
+    @staticmethod
+    def make_key(base_url: str, client_id: str) -> str:
+        # Hashed, the file must not expose the client id
+        return hashlib.sha256(f"{base_url}|{client_id}".encode("utf-8")).hexdigest()
+
+    def _load(self, path: str) -> dict:
+        return _read_json(path) if is_private_path(path, is_dir=False) else {}
+
+    def get(self, key: str) -> Optional[Set[str]]:
+        now = time.time()
+        cached = self._memory.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        path = self._trusted_path()
+        if path is None:
+            return None
+        entry = self._load(path).get(key)
+        if entry and entry.get("expires_at", 0) > now:
+            urls = set(entry.get("urls", []))
+            self._memory[key] = (entry["expires_at"], urls)
+            logger.debug(f"Webhook registry loaded from {path}")
+            return urls
+        return None
+
+    def set(self, key: str, urls: Set[str]):
+        expires_at = time.time() + self.ttl
+        self._memory[key] = (expires_at, set(urls))
+        path = self._trusted_path()
+        if path is None:
+            return
+        try:
+            data = self._load(path)
+            data[key] = {"expires_at": expires_at, "urls": sorted(urls)}
+            _write_json(path, data)
+        except OSError as e:
+            logger.warning(f"Write webhook registry cache {path} failed: {e}")
+
+
+class CertificateCache:
+    """
+    PayPal webhook signing certificates (PEM), keyed by their `paypal-cert-url`.
+
+    A cached certificate is trusted to verify webhooks, so it is kept in memory
+    only by default. With a directory, it is also shared on disk, but only
+    through a directory and files owned by this user with mode 0700 / 0600:
+    anything else could hold a certificate planted by another local user.
+    """
+
+    def __init__(self, directory: Optional[str] = None, ttl: float = 24 * 3600.0):
+        self.directory = _private_directory(directory, "certificate cache")
+        self.ttl = ttl
+        # url -> (expires_at, pem)
+        self._memory: Dict[str, Tuple[float, str]] = {}
+
+    def _path(self, url: str) -> str:
+        return os.path.join(self.directory, f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json")
+
+    def _trusted_path(self, url: str) -> Optional[str]:
+        # Checked on every read, the directory may have been replaced since
+        if not self.directory or not is_private_path(self.directory, is_dir=True):
+            return None
+        path = self._path(url)
+        return path if is_private_path(path, is_dir=False) else None
+
+    def get(self, url: str) -> Optional[str]:
+        now = time.time()
+        cached = self._memory.get(url)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        path = self._trusted_path(url)
+        if path is None:
+            return None
+        entry = _read_json(path)
+        if entry.get("url") == url and entry.get("expires_at", 0) > now:
+            self._memory[url] = (entry["expires_at"], entry["pem"])
+            return entry["pem"]
+        return None
+
+    def set(self, url: str, pem: str):
+        expires_at = time.time() + self.ttl
+        self._memory[url] = (expires_at, pem)
+        if not self.directory or not is_private_path(self.directory, is_dir=True):
+            return
+        try:
+            _write_json(self._path(url), {"url": url, "expires_at": expires_at, "pem": pem})
+        except OSError as e:
+            logger.warning(f"Write certificate cache for {url} failed: {e}")
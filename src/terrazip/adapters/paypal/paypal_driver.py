@@ -1,8 +1,20 @@
 from decimal import Decimal
-from typing import Tuple, Set
+from functools import lru_cache
+from typing import Tuple, Set, Optional, Literal
+from urllib.parse import urlparse
+import base64
+import re
+import zlib
+
+import httpx
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
 
 from .paypal_config import PayPalCredential, RawPurchaseUnits, PayPalCreateOrderRequestBody, PayPalCreateOrderResponseBody, PayPalWebhookResponsePayload
-from ...utils import logger, error_context, AsyncRequest, is_currency_support, process_payload_to_json
+from .paypal_token import PayPalTokenManager
+from .paypal_cache import WebhookRegistryCache, CertificateCache
+from ...utils import logger, error_context, AsyncRequest, PoolConfig, SignExecutor, is_currency_support, process_payload_to_json, ParsedPayload
 from ...utils.exceptions import *
 from ...models import OrderCreatorScheme, OrderSnapshot, AdapterDriver, GatewayConfig, OrderStatus
 
@@ -20,67 +32,78 @@ class PayPalDriver(AdapterDriver):
         webhook_url: str| None = None,
         timeout: Decimal = 10.0,
         retry_codes: Tuple = (500, 502, 503, 504),
+        pool: Optional[PoolConfig] = None,
+        sign_executor: Optional[SignExecutor] = None,
+        webhook_cache: Optional[WebhookRegistryCache] = None,
+        webhook_verify: Literal['local', 'remote'] = 'local',
+        cert_cache: Optional[CertificateCache] = None,
     ):
         self._gateway = gateway
         self._credentials = credentials
         self._http = AsyncRequest(
             timeout=timeout,
-            retry_codes=retry_codes
+            retry_codes=retry_codes,
+            pool=pool,
+            name="paypal",
         )
         self.webhook_url = webhook_url
+        # PayPal has no request signing, used for local webhook signature verification
+        self._sign_executor = sign_executor
+        self._webhook_verify = webhook_verify
+        self._cert_cache = cert_cache or CertificateCache()
+        self._webhook_cache = webhook_cache or WebhookRegistryCache()
+        self._tokens = PayPalTokenManager(
+            http=self._http,
+            url=f"{self._gateway.base_url}{self._gateway.endpoints.get('auth')}",
+            client_id=self._credentials.CLIENT_ID,
+            client_secret=self._credentials.CLIENT_SECRET,
+        )
         
     async def init(self):
-        self._access_token = await self._get_access_token()
+        access_token = await self._tokens.get_token()
         if self.webhook_url:
             await _is_webhook_valid(
+                http_tool=self._http,
                 base_url=self._gateway.base_url,
                 webhook_url=self.webhook_url,
-                access_token=self._access_token
+                access_token=access_token,
+                cache=self._webhook_cache,
+                cache_key=WebhookRegistryCache.make_key(
+                    str(self._gateway.base_url), self._credentials.CLIENT_ID
+                ),
             )
-        
-    async def _get_access_token(self) -> str:
+
+    async def aclose(self):
+        self._tokens.close()
+        await self._http.aclose()
+
+    async def _authorized_request(
+        self, method: str, url: str, headers: Optional[dict] = None, **kwargs
+    ) -> httpx.Response:
         """
-        Authenticate with PayPal and retrieve an OAuth2 token.
-        Demonstrates the use of post method with Basic Auth.
+        Send a request with the shared access token, refresh it once on 401.
         """
-        url = f"{self._gateway.base_url}{self._gateway.endpoints.get('auth')}"
+        token = await self._tokens.get_token()
+        send = getattr(self._http, method.lower())
+        response = await send(url, headers={**(headers or {}), "Authorization": f"Bearer {token}"}, **kwargs)
+        if response.status_code != 401:
+            return response
 
-        response = await self._http.post(
-                url,
-                data={"grant_type": "client_credentials"},
-                auth=(self._credentials.CLIENT_ID, self._credentials.CLIENT_SECRET),
-            )
-        
-        try:
-            response_data = response.json()
-            logger.debug(f"Response data: {response_data}")
-        except Exception as e:
-            error_info = error_context()
-            logger.error(f"Request error:{error_info}, exception: {e}")
-            raise ServerCredentialError(f"Request error:{error_info}, exception: {e}")
-        
-        if response_data:
-            self._access_token = response_data["access_token"]
-            logger.info("Got PayPal access token successfully!")
-            return self._access_token
-
-        logger.error("Got PayPal access token failed!")
-        raise ConnectionError(
-            "Got None response from Paypal Access token request, please check your USER info or web"
-        )
+        logger.info("PayPal access token rejected, refresh it")
+        if self._tokens.invalidate(token):
+            token = await self._tokens.refresh()
+        else:
+            # Another caller already refreshed it (or is refreshing it)
+            token = await self._tokens.get_token()
+        return await send(url, headers={**(headers or {}), "Authorization": f"Bearer {token}"}, **kwargs)
     
     async def create_order(self, order: OrderCreatorScheme) -> OrderSnapshot:
-        if not self._access_token:
-            logger.error("Run get_access_token attri firstly, check your codes")
-            raise RuntimeError("Run get_access_token firstly, check your codes")
-        
         if not is_currency_support(order.currency, SUPPORT_CURRENCY):
             raise OrderError(f"Unsupport currency: {order.currency}, only support: {SUPPORT_CURRENCY}")
         
         headers = {
             "Connection": "keep-alive",
             "Content-Type": "application/json",
-            "Authorization": f"Bearer {self._access_token}",
         }
         
         payload = PayPalCreateOrderRequestBody(
@@ -104,11 +127,13 @@ class PayPalDriver(AdapterDriver):
         
         
         url = f"{self._gateway.base_url}{self._gateway.endpoints.get('create_order')}"
-        logger.debug(f"Create order for {url} payloads: {payload}")
+        logger.debug("Create order for {} payloads: {}", url, payload)
         try:
-            response = await self._http.post(url, headers=headers, json=payload)
+            response = await self._authorized_request(
+                "POST", url, headers=headers, json=payload, endpoint="create_order"
+            )
             response_payload = process_payload_to_json(payload=response.content, headers=response.headers)
-            logger.debug(f'Create order payload:{response_payload}')
+            logger.debug('Create order payload:{}', response_payload)
             response_body = PayPalCreateOrderResponseBody(
                 links=response_payload.get('links')
             )
@@ -118,13 +143,13 @@ class PayPalDriver(AdapterDriver):
             )
             if not payment_link:
                 raise RuntimeError(f"PayPal approve link missing: {response}")
-            logger.debug(f"Got paypal paymentlink for {payment_link}")
+            logger.debug("Got paypal paymentlink for {}", payment_link)
             return OrderSnapshot(
                 order_id=order.order_id,
                 status=OrderStatus.CREATED,
                 payment_link=payment_link,
                 created_at=order.created_at,
-                raw_response=response_payload,
+                provider_order_id=response_payload["id"],
             )
         except:
             error_info = error_context()
@@ -137,22 +162,18 @@ class PayPalDriver(AdapterDriver):
         This attr will be triggered after client click the payment methods bottom for
              return_url or EVENT for CHECKOUT.ORDER.APPROVE
         """ 
-        if not self._access_token:
-            raise RuntimeError("Run get_access_token attri firstly")
-        
-        capture_order_required_id = order_snapshot.raw_response.get("id")
+        capture_order_required_id = _provider_order_id(order_snapshot)
         
         endpoint = self._gateway.endpoints.get("capture_order").format(id=capture_order_required_id)
         url = f"{self._gateway.base_url}{endpoint}"
         headers = {
-            "Authorization": f"Bearer {self._access_token}",
             "Content-Type": "application/json",
         }
-        logger.debug(f"capture order for paypal id: {capture_order_required_id}")
+        logger.debug("capture order for paypal id: {}", capture_order_required_id)
         try:
-            response = await self._http.post(url, headers=headers)
+            response = await self._authorized_request("POST", url, headers=headers, endpoint="capture_order")
             payloads = process_payload_to_json(response.content, response.headers)
-            logger.debug(f"capture order payloads:{payloads}")
+            logger.debug("capture order payloads:{}", payloads)
             
             status_event_map = {
                 'APPROVED': OrderStatus.CAPTURED,
@@ -162,7 +183,7 @@ class PayPalDriver(AdapterDriver):
             
             status = payloads.get('status')
             if status in status_event_map:
-                logger.debug(f"status: {status} -> event_status: {status_event_map.get(status)}")
+                logger.debug("status: {} -> event_status: {}", status, status_event_map.get(status))
                 return order_snapshot.replace(
                     status=status_event_map.get(status)
                 )
@@ -177,18 +198,29 @@ class PayPalDriver(AdapterDriver):
             logger.error(f"Capture order get error:{error_info}, exception: {e}")
             raise OrderError(f"Capture order get error:{error_info}, exception: {e}")
     
-    async def verify_webhook(self, header: dict, body: bytes, order_snapshot: OrderSnapshot) -> OrderSnapshot:
-        payload = process_payload_to_json(payload=body, headers=header)
+    async def verify_webhook(
+        self,
+        header: dict,
+        body: bytes,
+        order_snapshot: OrderSnapshot,
+        payload: Optional[ParsedPayload] = None,
+    ) -> OrderSnapshot:
+        payload = (payload or ParsedPayload(body, header)).data
         if payload.get("event_type") == "CHECKOUT.ORDER.COMPLETED":
             try:
-                is_verify = await _verify_paypal_webhook(
-                    post_tool=self._http,
-                    webhook_id=self._credentials.WEBHOOK_ID,
-                    access_token=self._access_token,
-                    base_url=self._gateway.base_url,
-                    headers=header,
-                    payload=payload
-                )
+                is_verify = False
+                if self._webhook_verify == 'local':
+                    is_verify = await self._verify_webhook_locally(header=header, body=body)
+                if not is_verify:
+                    # Remote verification only when the local one can't confirm it
+                    is_verify = await _verify_paypal_webhook(
+                        post_tool=self._http,
+                        webhook_id=self._credentials.WEBHOOK_ID,
+                        access_token=await self._tokens.get_token(),
+                        base_url=self._gateway.base_url,
+                        headers=header,
+                        payload=payload
+                    )
                 if is_verify:
                     logger.info("A PayPal order webhook complete")
                     return order_snapshot.replace(
@@ -200,33 +232,74 @@ class PayPalDriver(AdapterDriver):
                 logger.error(f"Webhook error: {error_info}, Exception: {e}")
                 raise OrderError(f"Webhook error: {error_info}, Exception: {e}")
 
+    async def _verify_webhook_locally(self, header: dict, body: bytes) -> bool:
+        """
+        Verify the transmission signature with the cached PayPal certificate,
+        False when it can't be confirmed (download error, bad signature...).
+        """
+        info = _handle_paypal_webhook_info(headers=header, payload={}, webhook_id=self._credentials.WEBHOOK_ID)
+        cert_url = info["cert_url"]
+        if info["auth_algo"] != "SHA256withRSA" or not _is_paypal_cert_url(cert_url):
+            logger.warning(f"Skip local webhook verification, algo: {info['auth_algo']}, cert_url: {cert_url}")
+            return False
+        if not (info["transmission_id"] and info["transmission_time"] and info["transmission_sig"]):
+            return False
+
+        try:
+            cert_pem = self._cert_cache.get(cert_url)
+            if cert_pem is None:
+                response = await self._http.get(cert_url, endpoint="webhook_cert")
+                if response.status_code != 200:
+                    logger.warning(f"Download PayPal cert {cert_url} failed: {response.status_code}")
+                    return False
+                cert_pem = response.text
+                self._cert_cache.set(cert_url, cert_pem)
+
+            message = "|".join((
+                info["transmission_id"],
+                info["transmission_time"],
+                self._credentials.WEBHOOK_ID,
+                str(zlib.crc32(body)),
+            ))
+            if self._sign_executor:
+                return await self._sign_executor.run(
+                    _verify_with_certificate, cert_pem, message, info["transmission_sig"]
+                )
+            return _verify_with_certificate(cert_pem, message, info["transmission_sig"])
+        except Exception as e:
+            logger.warning(f"Local webhook verification failed: {e}")
+            return False
+
     @classmethod
-    def extract_order_id(cls, header: dict, body: bytes) -> str:
-        payload = process_payload_to_json(body, header)
+    def extract_order_id(cls, header: dict, body: bytes, payload: Optional[ParsedPayload] = None) -> str:
+        payload = (payload or ParsedPayload(body, header)).data
         webhook_payload_obj = PayPalWebhookResponsePayload.model_validate(payload)
-        if payload.resource.purchase_units:
+        if webhook_payload_obj.resource.purchase_units:
             ref_id = webhook_payload_obj.resource.purchase_units[0].reference_id
             return ref_id
         raise OrderError(f"Got uptyped payload:{payload}")
+
+    @classmethod
+    def extract_event_id(cls, header: dict, body: bytes, payload: Optional[ParsedPayload] = None) -> Optional[str]:
+        for k, v in header.items():
+            if k.lower() == "paypal-transmission-id":
+                return v
+        return None
     
     
     async def fetch_order_status(self, order_snapshot: OrderSnapshot) -> OrderSnapshot:
-        if not self._access_token:
-            raise RuntimeError("Run get_access_token attri firstly")
-        
-        fetch_order_required_id = order_snapshot.raw_response.get("id")
+        fetch_order_required_id = _provider_order_id(order_snapshot)
         
         endpoint = self._gateway.endpoints.get("capture_order").format(id=fetch_order_required_id)
         url = f"{self._gateway.base_url}{endpoint}"
         headers = {
-            "Authorization": f"Bearer {self._access_token}",
             "Content-Type": "application/json",
         }
-        logger.debug(f"fetch order for paypal id: {fetch_order_required_id}")
+        logger.debug("fetch order for paypal id: {}", fetch_order_required_id)
         try:
-            response = await self._http.post(url, headers=headers)
+            response = await self._authorized_request("POST", url, headers=headers, endpoint="fetch_order")
             payloads = process_payload_to_json(response.content, response.headers)
-            logger.debug(f"capture order payloads:{payloads}")
+            logger.debug("capture order payloads:{}", payloads)
             if payloads.get('status') == 'COMPLETED':
                 logger.info(f'order:{order_snapshot.order_id} captured completed!')
                 return order_snapshot.replace(
@@ -239,10 +312,24 @@ class PayPalDriver(AdapterDriver):
             raise OrderError(f"Fetch order status error:{error_info}, Exception:{e}")
 
     
-async def _is_webhook_valid(base_url: str, webhook_url: str, access_token: str) -> bool:
+async def _is_webhook_valid(
+    http_tool: AsyncRequest,
+    base_url: str,
+    webhook_url: str,
+    access_token: str,
+    cache: Optional[WebhookRegistryCache] = None,
+    cache_key: str = "",
+) -> bool:
     logger.info("Check Webhook status")
-    request = AsyncRequest(timeout=5)
-    webhook_set = await _list_webhook(request, base_url, access_token)
+    webhook_set = cache.get(cache_key) if cache else None
+    # A miss in a cached listing may be a newly registered webhook, list again
+    if webhook_set is None or webhook_url not in webhook_set:
+        webhook_set = await _list_webhook(http_tool, base_url, access_token)
+        if cache:
+            cache.set(cache_key, webhook_set)
+    else:
+        logger.debug("Webhook registry cache hit")
+
     if webhook_url in webhook_set:
         logger.info(
         f"{webhook_url} already exist in your PayPal webhook endpoint!"
@@ -261,10 +348,10 @@ async def _list_webhook(
 ) -> Set[str]:
     url = f"{base_url}v1/notifications/webhooks"
     headers = {"Authorization": f"Bearer {access_token}", "Content-Type": "application/json"}
-    response = await http_tool.get(url, headers=headers)
+    response = await http_tool.get(url, headers=headers, timeout=5, endpoint="list_webhooks")
     try:
         payload = process_payload_to_json(response.content, response.headers)
-        logger.debug(f"Get payload:{payload}")
+        logger.debug("Get payload:{}", payload)
     except:
         error_info = error_context()
         logger.error(f"get error info: {error_info}")
@@ -272,6 +359,47 @@ async def _list_webhook(
 
     return {webhook.get("url") for webhook in payload["webhooks"]}
 
+def _provider_order_id(order_snapshot: OrderSnapshot) -> str:
+    if order_snapshot.provider_order_id:
+        return order_snapshot.provider_order_id
+    # Snapshots stored by older versions only have the raw create response
+    return (order_snapshot.raw_response or {}).get("id")
+
+
+def _is_paypal_cert_url(cert_url: Optional[str]) -> bool:
+    """
+    The certificate url comes from the request headers, only trust PayPal hosts.
+    """
+    if not cert_url:
+        return False
+    parsed = urlparse(cert_url)
+    host = parsed.hostname or ""
+    return parsed.scheme == "https" and (host == "paypal.com" or host.endswith(".paypal.com"))
+
+
+_PEM_CERTIFICATE_RE = re.compile(r"-----BEGIN CERTIFICATE-----.+?-----END CERTIFICATE-----", re.DOTALL)
+
+
+@lru_cache(maxsize=16)
+def _load_certificate_verifier(cert_pem: str) -> pkcs1_15.PKCS115_SigScheme:
+    # The url may serve a chain, the signing certificate comes first
+    match = _PEM_CERTIFICATE_RE.search(cert_pem)
+    return pkcs1_15.new(RSA.import_key(match.group(0) if match else cert_pem))
+
+
+def _verify_with_certificate(cert_pem: str, message: str, signature: str) -> bool:
+    """
+    SHA256withRSA verification of a PayPal transmission signature.
+    """
+    try:
+        _load_certificate_verifier(cert_pem).verify(
+            SHA256.new(message.encode("utf-8")), base64.b64decode(signature)
+        )
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
 def _handle_paypal_webhook_info(headers: dict, payload: dict, webhook_id: str) -> dict:
     return {
         "auth_algo": headers.get("paypal-auth-algo"),
@@ -298,6 +426,7 @@ async def _verify_paypal_webhook(
     try:
         response = await post_tool.post(
             verify_url,
+            endpoint="verify_webhook",
             json=data,
             headers={
                 "Content-Type": "application/json",
@@ -0,0 +1,117 @@
+from typing import Optional
+import asyncio
+import time
+
+from ...utils import logger, error_context, AsyncRequest
+from ...utils.exceptions import *
+
+
+class PayPalTokenManager:
+    """
+    OAuth2 client-credentials token shared by every coroutine of a driver.
+
+    The token is refreshed in background refresh_margin seconds before it
+    expires, so the hot path only reads it from memory. Concurrent refreshes
+    (expiry, a 401 on several requests at once) share a single token request.
+    """
+
+    def __init__(
+        self,
+        http: AsyncRequest,
+        url: str,
+        client_id: str,
+        client_secret: str,
+        refresh_margin: float = 300.0,
+        retry_delay: float = 30.0,
+    ):
+        self._http = http
+        self._url = url
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self.refresh_margin = refresh_margin
+        self.retry_delay = retry_delay
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._refreshing: Optional[asyncio.Task] = None
+        self._refresh_handle: Optional[asyncio.TimerHandle] = None
+        self.fetch_count = 0
+
+    @property
+    def token(self) -> Optional[str]:
+        if self._token and time.monotonic() < self._expires_at:
+            return self._token
+        return None
+
+    async def get_token(self) -> str:
+        return self.token or await self.refresh()
+
+    async def refresh(self) -> str:
+        if self._refreshing is None or self._refreshing.done():
+            self._refreshing = asyncio.create_task(self._fetch())
+        # Shield, a cancelled caller must not cancel the refresh shared with others
+        return await asyncio.shield(self._refreshing)
+
+    def invalidate(self, token: str) -> bool:
+        """
+        Drop token after the server rejected it (401), unless it was already replaced.
+        False when it was, the current token can be used as is.
+        """
+        if self._token == token:
+            self._token = None
+            return True
+        return False
+
+    async def _fetch(self) -> str:
+        response = await self._http.post(
+            self._url,
+            data={"grant_type": "client_credentials"},
+            auth=(self._client_id, self._client_secret),
+            endpoint="oauth_token",
+        )
+        self.fetch_count += 1
+
+        try:
+            response_data = response.json()
+        except Exception as e:
+            error_info = error_context()
+            logger.error(f"Request error:{error_info}, exception: {e}")
+            raise ServerCredentialError(f"Request error:{error_info}, exception: {e}")
+
+        if not response_data or "access_token" not in response_data:
+            logger.error("Got PayPal access token failed!")
+            raise ConnectionError(
+                "Got None response from Paypal Access token request, please check your USER info or web"
+            )
+
+        # PayPal tokens usually live 9 hours
+        expires_in = float(response_data.get("expires_in", 32400))
+        self._token = response_data["access_token"]
+        self._expires_at = time.monotonic() + expires_in
+        self._schedule_refresh(max(expires_in - self.refresh_margin, expires_in / 2))
+        logger.info(f"Got PayPal access token successfully, expires in {expires_in}s")
+        return self._token
+
+    def _schedule_refresh(self, delay: float):
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+        self._refresh_handle = asyncio.get_running_loop().call_later(delay, self._refresh_in_background)
+
+    def _refresh_in_background(self):
+        self._refresh_handle = None
+        task = asyncio.ensure_future(self.refresh())
+
+        def _done(done: asyncio.Future):
+            if done.cancelled():
+                return
+            if done.exception():
+                logger.warning(f"Refresh PayPal token failed: {done.exception()}, retry in {self.retry_delay}s")
+                self._schedule_refresh(self.retry_delay)
+
+        task.add_done_callback(_done)
+
+    def close(self):
+        if self._refresh_handle is not None:
+            self._refresh_handle.cancel()
+            self._refresh_handle = None
+        if self._refreshing is not None and not self._refreshing.done():
+            self._refreshing.cancel()
@@ -1,10 +1,84 @@
-from .application import Terrazip, TerrazipFastapi
-from .engine import AsyncEventBus, OrderPaidEvent, OrderFailedEvent
+from typing import TYPE_CHECKING
+import importlib
+
+if TYPE_CHECKING:
+    from .application import Terrazip
+    from .fastapi_app import TerrazipFastapi, StreamAuthorizer
+    from .event_bus import AsyncEventBus, HandlerConfig
+    from .outbox import EventOutbox
+    from .engine import OrderPaidEvent, OrderFailedEvent, OrderStatusChangedEvent
+    from .reconciler import ReconcileConfig
+    from .store import OrderStore, OrderRecord, InMemoryOrderStore, SqliteOrderStore
+    from .sharding import ShardRouter
+    from .ingestion import WebhookQueueConfig
+    from .streaming import OrderStatusBroadcaster
+    from .idempotency import (
+        WebhookDeduplicator,
+        IdempotencyStore,
+        InMemoryIdempotencyStore,
+        SqliteIdempotencyStore,
+    )
+
+# PEP 562: submodules are imported on first attribute access, so e.g.
+# FastAPI is only loaded by applications using TerrazipFastapi
+_LAZY_IMPORTS = {
+    'Terrazip': '.application',
+    'TerrazipFastapi': '.fastapi_app',
+    'StreamAuthorizer': '.fastapi_app',
+    'AsyncEventBus': '.event_bus',
+    'HandlerConfig': '.event_bus',
+    'EventOutbox': '.outbox',
+    'OrderPaidEvent': '.engine',
+    'OrderFailedEvent': '.engine',
+    'OrderStatusChangedEvent': '.engine',
+    'ReconcileConfig': '.reconciler',
+    'OrderStore': '.store',
+    'OrderRecord': '.store',
+    'InMemoryOrderStore': '.store',
+    'SqliteOrderStore': '.store',
+    'ShardRouter': '.sharding',
+    'WebhookQueueConfig': '.ingestion',
+    'OrderStatusBroadcaster': '.streaming',
+    'WebhookDeduplicator': '.idempotency',
+    'IdempotencyStore': '.idempotency',
+    'InMemoryIdempotencyStore': '.idempotency',
+    'SqliteIdempotencyStore': '.idempotency',
+}
 
 __all__ = [
     'Terrazip',
     'TerrazipFastapi',
+    'StreamAuthorizer',
     'AsyncEventBus',
+    'HandlerConfig',
+    'EventOutbox',
     'OrderPaidEvent',
-    'OrderFailedEvent'
-]
\ No newline at end of file
+    'OrderFailedEvent',
+    'OrderStatusChangedEvent',
+    'ReconcileConfig',
+    'OrderStore',
+    'OrderRecord',
+    'InMemoryOrderStore',
+    'SqliteOrderStore',
+    'ShardRouter',
+    'WebhookQueueConfig',
+    'OrderStatusBroadcaster',
+    'WebhookDeduplicator',
+    'IdempotencyStore',
+    'InMemoryIdempotencyStore',
+    'SqliteIdempotencyStore',
+]
+
+
+def __getattr__(name: str):
+    module = _LAZY_IMPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    # Cache it, next accesses don't go through __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,6 +1,6 @@
 from typing import Literal, Sequence, Callable, Awaitable
-import asyncio
-from dataclasses import dataclass, field, asdict
+import base64
+from dataclasses import dataclass, field
 from decimal import Decimal
 from wsgiref.handlers import format_date_time
 import time
@@ -8,13 +8,14 @@ from datetime import datetime
 from typing import TypedDict, Optional
 from urllib.parse import urlparse
 
-from fastapi import FastAPI, Request, Response
-from fastapi.responses import JSONResponse
-import uvicorn
-
 from ..models import Environment, ServerGateway, OrderCreatorScheme, OrderStatus, OrderSnapshot, AdapterDriver
 from .engine import OrderEngine, AsyncEventBus
-from ..utils import logger, create_order_uuid, process_payload_to_json, error_context
+from .reconciler import ReconcileConfig
+from .store import OrderStore
+from .sharding import ShardRouter
+from .idempotency import WebhookDeduplicator
+from ..utils import logger, create_order_uuid, PoolConfig, SignExecutor, ParsedPayload
+from ..utils.tracing import start_span
 from .manager import create_adapter_detector, AdapterManager
 
 ENVIORMENT = {
@@ -46,6 +47,15 @@ class Terrazip:
         event_bus: Optional[AsyncEventBus] = None,
         order_timeout_min: float = 15,
         timeout: Decimal = 10.0,
+        http_pool: Optional[PoolConfig] = None,
+        sign_executor: Optional[Literal['thread', 'process']] = None,
+        sign_workers: Optional[int] = None,
+        reconcile_config: Optional[ReconcileConfig] = None,
+        order_store: Optional[OrderStore] = None,
+        shard_router: Optional[ShardRouter] = None,
+        webhook_dedup: Optional[WebhookDeduplicator] = None,
+        adapter_init_timeout: Optional[float] = 30.0,
+        partial_adapters: bool = False,
     ):
         self._env = ENVIORMENT.get(env)
         self._adapters = adapters
@@ -59,22 +69,81 @@ class Terrazip:
         self.event_bus = event_bus
         self.order_timeout_min = order_timeout_min
         self._timeout = timeout
+        self._http_pool = http_pool
+        self._sign_executor_mode = sign_executor
+        self._sign_workers = sign_workers
+        self._sign_executor: Optional[SignExecutor] = None
+        self._reconcile_config = reconcile_config
+        self._order_store = order_store
+        self._shard_router = shard_router
+        self.webhook_dedup = webhook_dedup or WebhookDeduplicator()
+        self._adapter_init_timeout = adapter_init_timeout
+        self._partial_adapters = partial_adapters
         self._detector = create_adapter_detector()
         
     async def init(self):
+        if self._sign_executor_mode:
+            # Keep RSA signing/verification off the event loop
+            self._sign_executor = SignExecutor(
+                mode=self._sign_executor_mode,
+                max_workers=self._sign_workers,
+            )
         self.adapter_manager = await AdapterManager.create(
             env=self._env,
             adapters=self._adapters,
             webhook_url=f"{self._webhook_base_url}{self._endpoints.get('webhook')}",
-            timeout=self._timeout
+            timeout=self._timeout,
+            pool=self._http_pool,
+            sign_executor=self._sign_executor,
+            init_timeout=self._adapter_init_timeout,
+            partial=self._partial_adapters,
         )
         self._engine = OrderEngine(
             adapter_manager=self.adapter_manager,
             event_bus=self.event_bus,
-            order_timeout_min=self.order_timeout_min
+            order_timeout_min=self.order_timeout_min,
+            reconcile_config=self._reconcile_config,
+            store=self._order_store,
         )
+        # Orders of an adapter still retrying its init are skipped by restore, reload them once it is up
+        self.adapter_manager.on_available(self._restore_adapter)
+        if self._shard_router:
+            # Only the owner shard keeps an order and schedules its timeout
+            self._shard_router.claim()
+            await self._engine.restore(owns=self._shard_router.is_owner)
+            await self._shard_router.start(self._handle_forwarded)
+        else:
+            await self._engine.restore()
+        if self.event_bus:
+            # Events a crash left unhandled, handlers are subscribed by now
+            await self.event_bus.recover(confirm=self._engine.is_committed)
         logger.info(f"Init order engine")
 
+    async def _restore_adapter(self, adapter: str):
+        owns = self._shard_router.is_owner if self._shard_router else None
+        await self._engine.restore(owns=owns, adapter=adapter)
+
+    async def aclose(self):
+        """
+        Release the resources created by init, e.g. pooled http connections.
+        """
+        if self._shard_router:
+            await self._shard_router.aclose()
+        engine = getattr(self, "_engine", None)
+        if engine:
+            await engine.aclose()
+        if self.event_bus:
+            # Handlers may still call the providers, drain before closing the adapters
+            await self.event_bus.aclose()
+        adapter_manager = getattr(self, "adapter_manager", None)
+        if adapter_manager:
+            await adapter_manager.aclose()
+        await self.webhook_dedup.aclose()
+        if self._sign_executor:
+            self._sign_executor.shutdown()
+            self._sign_executor = None
+        logger.info("Close terrazip")
+
     async def create_order(
         self,
         adapter: str,
@@ -84,6 +153,8 @@ class Terrazip:
         description: str = 'Test Order',
         metadata: dict| None = None,
     ):
+        if self._shard_router and not self._shard_router.is_owner(order_id):
+            raise ValueError(f"Order {order_id} is not owned by this shard, create it by new_order_id")
         ordre_creator_scheme = OrderCreatorScheme(
             order_id=order_id,
             amount=Decimal(amount),
@@ -96,36 +167,111 @@ class Terrazip:
             description=description,
             metadata=metadata or {}
         )
-        return await self._engine.create_order(adapter=adapter, order=ordre_creator_scheme)
+        with start_span("terrazip.create_order", {"order.id": order_id, "terrazip.adapter": adapter}):
+            return await self._engine.create_order(adapter=adapter, order=ordre_creator_scheme)
     
+    def new_order_id(self, prefix: str = 'order') -> str:
+        if self._shard_router:
+            return self._shard_router.create_order_id(prefix)
+        return create_order_uuid(prefix)
+
+    def _is_remote(self, order_id: str) -> bool:
+        return bool(self._shard_router) and not self._shard_router.is_owner(order_id)
+
+    async def _handle_forwarded(self, message: dict) -> dict:
+        """
+        Run a request forwarded by another shard on this owner shard.
+        """
+        action = message.get("action")
+        if action == "webhook":
+            await self.handle_webhook(message["headers"], base64.b64decode(message["body"]))
+        elif action == "capture":
+            await self.capture_order(message["order_id"])
+        else:
+            return {"ok": False, "error": f"Unknown action: {action}"}
+        return {"ok": True}
+
+    async def _forward(self, order_id: str, message: dict):
+        reply = await self._shard_router.forward(order_id, message)
+        if not reply.get("ok"):
+            raise RuntimeError(f"Forward {message.get('action')} of {order_id} failed: {reply.get('error')}")
+
+    async def handle_webhook(self, header: dict, body: bytes):
+        """
+        Verify the webhook and confirm the order status, on the owner shard.
+        """
+        adapter_name, driver = self._detect_driver(header)
+        # Parsed once, for the order id, the event id and the verification
+        payload = ParsedPayload(body, header)
+        order_id = driver.extract_order_id(header=header, body=body, payload=payload)
+        with start_span("terrazip.handle_webhook", {"order.id": order_id, "terrazip.adapter": adapter_name}):
+            if self._is_remote(order_id):
+                await self._forward(order_id, {
+                    "action": "webhook",
+                    "headers": dict(header),
+                    "body": base64.b64encode(body).decode("ascii"),
+                })
+                return
+
+            # Deduplicate on the owner shard, so every redelivery meets the same cache
+            event_id = driver.extract_event_id(header=header, body=body, payload=payload)
+            dedup_key = None
+            if event_id:
+                dedup_key = self.webhook_dedup.make_key(adapter_name, event_id, order_id)
+                if not await self.webhook_dedup.claim(dedup_key):
+                    logger.info(f"Skip duplicated webhook {dedup_key}")
+                    return
+
+            try:
+                await self.verify_webhook(order_id, header, body, payload=payload)
+                await self.confirm_order_status(order_id=order_id)
+            except BaseException:
+                if dedup_key:
+                    await self.webhook_dedup.release(dedup_key)
+                raise
+
     async def capture_order(self, order_id: str):
-        snapshot = await self._with_order(
-            order_id,
-            lambda d, s: d.capture_order(s),
-        )
+        with start_span("terrazip.capture_order", {"order.id": order_id}):
+            if self._is_remote(order_id):
+                await self._forward(order_id, {"action": "capture", "order_id": order_id})
+                return
+            snapshot = await self._with_order(
+                order_id,
+                lambda d, s: d.capture_order(s),
+                action_name="capture_order",
+            )
         if snapshot:
-            logger.debug(f"order:{order_id}: capture -> {snapshot}")
+            logger.debug("order:{}: capture -> {}", order_id, snapshot)
         
-    async def verify_webhook(self, order_id: str, header: dict, body: bytes):
+    async def verify_webhook(
+        self,
+        order_id: str,
+        header: dict,
+        body: bytes,
+        payload: Optional[ParsedPayload] = None,
+    ):
         snapshot = await self._with_order(
             order_id,
             lambda d, s: d.verify_webhook(
                 header=header,
                 body=body,
                 order_snapshot=s,
+                payload=payload,
             ),
             skip_if_finished=True,
         )
         if snapshot:
-            logger.debug(f"order:{order_id}: webhook -> {snapshot}")
+            logger.debug("order:{}: webhook -> {}", order_id, snapshot)
         
     async def confirm_order_status(self, order_id: str):
-        snapshot = await self._with_order(
-            order_id=order_id,
-            action=lambda d, s: d.fetch_order_status(s),
-        )
+        with start_span("terrazip.confirm_order_status", {"order.id": order_id}):
+            snapshot = await self._with_order(
+                order_id=order_id,
+                action=lambda d, s: d.fetch_order_status(s),
+                action_name="fetch_order_status",
+            )
         if snapshot:
-            logger.debug(f"order:{order_id}: confirm new snapshort: {snapshot}")
+            logger.debug("order:{}: confirm new snapshort: {}", order_id, snapshot)
 
     async def _with_order(
         self,
@@ -133,8 +279,8 @@ class Terrazip:
         action: Callable[[AdapterDriver, OrderSnapshot], Awaitable[OrderSnapshot]],
         *,
         skip_if_finished: bool = True,
+        action_name: Optional[str] = None,
     ) -> Optional[OrderSnapshot]:
-        driver = self._engine.get_order_driver(order_id)
         snapshot = self._engine.get_order_snapshot(order_id)
 
         if skip_if_finished and snapshot.status in {
@@ -142,118 +288,24 @@ class Terrazip:
             OrderStatus.PAID,
             OrderStatus.FAILED,
         }:
-            logger.debug(f"Order:{order_id} already finished")
+            logger.debug("Order:{} already finished", order_id)
             return None
 
-        new_snapshot = await action(driver, snapshot)
-        await self._engine.apply_snapshot(new_snapshot)
-        return new_snapshot
+        # Concurrent identical actions (action_name) share one provider call
+        return await self._engine.run_order_action(order_id, action, action_name=action_name)
 
-    def extract_order_id_from_request(self, header: dict, body: bytes) -> str:
+    def _detect_driver(self, header: dict) -> tuple[str, AdapterDriver]:
         adapter_name = self._detector.detect(header)
-        driver = self.adapter_manager.get(adapter_name)
+        return adapter_name, self.adapter_manager.get(adapter_name)
+
+    def extract_order_id_from_request(self, header: dict, body: bytes) -> str:
+        _, driver = self._detect_driver(header)
         return driver.extract_order_id(header=header, body=body)
 
 
-class TerrazipFastapi:
-    def __init__(
-        self,
-        app: FastAPI,
-        env: Literal['SANDBOX', 'PRODUCTION'],
-        adapters: Sequence[Literal['alipay', 'paypal']],
-        base_url: str,
-        webhook_base_url: str,
-        endpoints: Optional[EndpointsConfig] = None,
-        event_bus: Optional[AsyncEventBus] = None,
-        order_timeout_min: float = 15,
-        timeout: Decimal = 10.0,
-    ):
-        self.endpoints = endpoints or {
-            "success": "/success",
-            "cancel": "/cancel",
-            "webhook": "/notify"
-        }
-        self.terrazip = Terrazip(
-            env=env,
-            adapters=adapters,
-            base_url=base_url,
-            webhook_base_url=webhook_base_url,
-            endpoints=self.endpoints,
-            event_bus=event_bus,
-            order_timeout_min=order_timeout_min,
-            timeout=timeout,
-        )
-        self.app = app
-        
-    async def init(self):
-        await self.terrazip.init()
-    
-    async def pay(self, request: Request) -> JSONResponse:
-        body = await request.body()
-        header = request.headers
-        payload = process_payload_to_json(
-            payload=body, headers=header
-        )
-        logger.debug(f"input request: header{header}, body: {payload}")
-        try:
-            request_type = RequestCreateType(**payload)
-        except:
-            error_info = error_context()
-            logger.error(f"Error info:{error_info}")
-            return JSONResponse(
-                content={'text': 'Bad Request', 'error': {error_info}},
-                status_code=400,
-            )
-        order_id = create_order_uuid('order')
-        order_snapshot = await self.terrazip.create_order(
-            adapter=request_type.adapter,
-            order_id=order_id,
-            amount=request_type.amount,
-            currency=request_type.currency,
-            description=request_type.description,
-            metadata=request_type.metadata or {},
-        )
-        return JSONResponse(
-            content=asdict(order_snapshot),
-            status_code=200
-        )
-        
-    async def success(self, order_id):
-        await self.terrazip.capture_order(order_id=order_id)
-        return JSONResponse(
-            content='CAPTURE ORDER!',
-            status_code=200
-        )
-        
-    async def notify(self, request: Request):
-        headers = request.headers
-        body = await request.body()
-        order_id = self.terrazip.extract_order_id_from_request(header=headers, body=body)
-        await self.terrazip.verify_webhook(order_id, headers, body)
-        await self.terrazip.confirm_order_status(order_id=order_id)
-        return JSONResponse(
-            content='Order Complete',
-            status_code=200
-        )
-        
-    def add_route(self, app: FastAPI):
-        app.add_api_route('/pay', endpoint=self.pay, methods=["POST"])
-        app.add_api_route(self.endpoints.get('success'), endpoint=self.success, methods=['GET'])
-        app.add_api_route(self.endpoints.get('webhook'), endpoint=self.notify, methods=['POST'])
-        
-    def run(self, host: str='localhost', port: int=5000, app: FastAPI| None = None, log_level: str = 'info'):
-        
-        if not app:
-            app = self.app
-        self.add_route(app)
-        
-        async def start():
-            await self.init()
-            config = uvicorn.Config(app, host=host, port=port, log_level=log_level)
-            server = uvicorn.Server(config)
-            await server.serve()
-            
-        asyncio.run(start())
-        
-    def get_app(self) -> FastAPI:
-        return self.app
+def __getattr__(name: str):
+    # Moved to fastapi_app, loaded on demand so the core does not import FastAPI
+    if name == "TerrazipFastapi":
+        from .fastapi_app import TerrazipFastapi
+        return TerrazipFastapi
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
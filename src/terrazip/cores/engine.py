@@ -1,13 +1,17 @@
-from typing import Literal, Dict, Optional, Callable, Awaitable, List, Type
+from typing import Literal, Dict, Optional, Callable, Awaitable, List
 from dataclasses import dataclass, field
+from collections import defaultdict
 import asyncio
+import time
 from datetime import datetime
-from abc import ABC
-from collections import defaultdict
 
+from .event_bus import AsyncEventBus, DomainEvent
 from .manager import AdapterManager
-from ..models import AdapterDriver, OrderSnapshot, OrderStatus, OrderCreatorScheme
-from ..utils import logger, error_context
+from .reconciler import OrderReconciler, ReconcileConfig
+from .store import OrderStore, OrderRecord, InMemoryOrderStore
+from ..models import AdapterDriver, OrderSnapshot, OrderStatus, OrderCreatorScheme, TERMINAL_STATUSES
+from ..utils import logger, error_context, SingleFlight
+from ..utils.metrics import ORDER_TRANSITIONS, OPEN_ORDERS, ACTIVE_DEADLINES
 
 
 """
@@ -20,10 +24,6 @@ event_bus.subscribe(OrderPaidEvent, after_paid)
 """
 
 
-class DomainEvent(ABC):
-    occurred_at: datetime
-
-
 @dataclass(frozen=True)
 class OrderPaidEvent(DomainEvent):
     order_id: str
@@ -38,86 +38,225 @@ class OrderFailedEvent(DomainEvent):
     occurred_at: datetime = field(default_factory=datetime.now)
 
 
-EventHandler = Callable[[DomainEvent], Awaitable[None]]
+@dataclass(frozen=True)
+class OrderStatusChangedEvent(DomainEvent):
+    """
+    Published on every status transition, e.g. for the status stream.
+    """
+    order_id: str
+    snapshot: OrderSnapshot
+    old_status: OrderStatus
+    occurred_at: datetime = field(default_factory=datetime.now)
 
 
-class AsyncEventBus:
-    def __init__(self):
-        self._subscribers: Dict[Type[DomainEvent], List[EventHandler]] = defaultdict(
-            list
-        )
+# Driver actions whose concurrent calls on one order are coalesced
+COALESCED_ACTIONS = ("fetch_order_status", "capture_order")
 
-    def subscribe(
-        self,
-        event_type: Type[DomainEvent],
-        handler: EventHandler,
-    ):
-        self._subscribers[event_type].append(handler)
-        logger.debug(f"Subscribe event_type:{event_type}, handler: {handler}")
 
-    async def publish(self, event: DomainEvent):
-        handlers = self._subscribers.get(type(event), [])
+class LockStripes:
+    """
+    Fixed array of locks shared by all orders, an order uses the lock of its
+    id hash. No lock is allocated per order; two orders on the same stripe
+    only wait for each other during a status update.
+    """
+
+    __slots__ = ("_locks",)
 
-        for handler in handlers:
-            asyncio.create_task(self._safe_handle(handler, event))
+    def __init__(self, size: int = 256):
+        self._locks = tuple(asyncio.Lock() for _ in range(max(size, 1)))
 
-    async def _safe_handle(self, handler: EventHandler, event: DomainEvent):
-        try:
-            await handler(event)
-        except Exception:
-            error_info = error_context()
-            logger.error(f"error_info: {error_info}")
+    def for_key(self, key: str) -> asyncio.Lock:
+        return self._locks[hash(key) % len(self._locks)]
 
 
 class OrderContext:
+    # One per open order, no per-instance __dict__
+    __slots__ = ("adapter", "driver", "snapshot", "store", "event_bus", "locks")
+
     def __init__(
         self,
         driver: AdapterDriver,
         snapshot: OrderSnapshot,
+        store: OrderStore,
         event_bus: Optional[AsyncEventBus] = None,
+        adapter: str = "",
+        locks: Optional[LockStripes] = None,
     ):
+        self.adapter = adapter
         self.driver = driver
         self.snapshot = snapshot
+        self.store = store
         self.event_bus = event_bus
-        self.lock = asyncio.Lock()
+        self.locks = locks or LockStripes(size=1)
 
     async def update_snapshot(self, new_snapshot: OrderSnapshot) -> bool:
-        async with self.lock:
+        async with self.locks.for_key(new_snapshot.order_id):
             old_status = self.snapshot.status
 
-            if old_status in (OrderStatus.PAID, OrderStatus.FAILED, OrderStatus.CANCEL):
+            if old_status in TERMINAL_STATUSES:
+                return False
+
+            # In the outbox before the status is committed, so a crash in between
+            # cannot lose them; recover() drops the ones never committed
+            staged = await self.event_bus.stage(self._events(old_status, new_snapshot)) if self.event_bus else []
+            try:
+                # Terminal-status guard across processes sharing the store
+                committed = await self.store.compare_and_set(new_snapshot.order_id, old_status, new_snapshot)
+            except BaseException:
+                if staged:
+                    self.event_bus.discard(staged)
+                raise
+            if not committed:
+                if staged:
+                    self.event_bus.discard(staged)
+                logger.warning(f"Order {new_snapshot.order_id} changed by others, skip {new_snapshot.status}")
                 return False
 
             self.snapshot = new_snapshot
 
-        if self.event_bus:
+        if old_status != new_snapshot.status:
+            ORDER_TRANSITIONS.inc(self.adapter, old_status.value, new_snapshot.status.value)
+
+        if staged:
             # EVENT PUBLISH OUT OF LOCK
-            if (
-                old_status != OrderStatus.PAID
-                and new_snapshot.status == OrderStatus.PAID
-            ):
-                logger.info(f"Excution PAID event")
-                await self.event_bus.publish(
-                    OrderPaidEvent(
-                        order_id=new_snapshot.order_id,
-                        snapshot=new_snapshot,
-                    )
+            await self.event_bus.dispatch(staged)
+
+        return True
+
+    @staticmethod
+    def _events(old_status: OrderStatus, new_snapshot: OrderSnapshot) -> List[DomainEvent]:
+        events: List[DomainEvent] = []
+        if old_status != new_snapshot.status:
+            events.append(
+                OrderStatusChangedEvent(
+                    order_id=new_snapshot.order_id,
+                    snapshot=new_snapshot,
+                    old_status=old_status,
                 )
+            )
+
+        if (
+            old_status != OrderStatus.PAID
+            and new_snapshot.status == OrderStatus.PAID
+        ):
+            logger.info(f"Excution PAID event")
+            events.append(
+                OrderPaidEvent(
+                    order_id=new_snapshot.order_id,
+                    snapshot=new_snapshot,
+                )
+            )
 
-            if (
-                old_status != OrderStatus.FAILED
-                and new_snapshot.status == OrderStatus.FAILED
-            ):
-                logger.info(f"Excution FAILED event")
-                await self.event_bus.publish(
-                    OrderFailedEvent(
-                        order_id=new_snapshot.order_id,
-                        snapshot=new_snapshot,
-                    )
+        if (
+            old_status != OrderStatus.FAILED
+            and new_snapshot.status == OrderStatus.FAILED
+        ):
+            logger.info(f"Excution FAILED event")
+            events.append(
+                OrderFailedEvent(
+                    order_id=new_snapshot.order_id,
+                    snapshot=new_snapshot,
                 )
+            )
+        return events
+
+
+class OrderDeadlineScheduler:
+    """
+    Hashed timer wheel for order deadlines.
+
+    A single task wakes once per tick and hands the expired order ids to
+    on_expired in batches of at most batch_size, instead of one sleeping
+    task per open order. schedule and cancel are O(1).
+    """
+
+    def __init__(
+        self,
+        on_expired: Callable[[List[str]], Awaitable[None]],
+        tick_seconds: float = 1.0,
+        wheel_size: int = 512,
+        batch_size: int = 100,
+    ):
+        self._on_expired = on_expired
+        self.tick_seconds = tick_seconds
+        self.wheel_size = wheel_size
+        self.batch_size = batch_size
+        # slot -> {order_id: deadline}, order_id -> slot
+        self._slots: List[Dict[str, float]] = [{} for _ in range(wheel_size)]
+        self._index: Dict[str, int] = {}
+        self._last_tick = self._tick_of(time.monotonic())
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, order_id: str) -> bool:
+        return order_id in self._index
+
+    def _tick_of(self, moment: float) -> int:
+        return int(moment // self.tick_seconds)
+
+    def schedule(self, order_id: str, timeout_seconds: float):
+        self.cancel(order_id)
+        deadline = time.monotonic() + timeout_seconds
+        slot = self._tick_of(deadline) % self.wheel_size
+        self._slots[slot][order_id] = deadline
+        self._index[order_id] = slot
+        self.start()
 
+    def cancel(self, order_id: str) -> bool:
+        slot = self._index.pop(order_id, None)
+        if slot is None:
+            return False
+        self._slots[slot].pop(order_id, None)
         return True
 
+    def start(self):
+        if self._task is None or self._task.done():
+            self._last_tick = self._tick_of(time.monotonic())
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _collect_expired(self) -> List[str]:
+        now = time.monotonic()
+        # Only fully elapsed ticks, so every deadline in those slots is already due
+        current_tick = self._tick_of(now) - 1
+        first_tick = max(self._last_tick + 1, current_tick - self.wheel_size + 1)
+        expired = []
+
+        for tick in range(first_tick, current_tick + 1):
+            slot = self._slots[tick % self.wheel_size]
+            if not slot:
+                continue
+            due = [order_id for order_id, deadline in slot.items() if deadline <= now]
+            for order_id in due:
+                del slot[order_id]
+                del self._index[order_id]
+            expired.extend(due)
+
+        self._last_tick = max(self._last_tick, current_tick)
+        return expired
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.tick_seconds)
+            expired = self._collect_expired()
+            for i in range(0, len(expired), self.batch_size):
+                batch = expired[i : i + self.batch_size]
+                try:
+                    await self._on_expired(batch)
+                except Exception as e:
+                    error_info = error_context()
+                    logger.error(f"Deadline scheduler unexpected error: {e}, trace_error:{error_info}")
+
 
 class OrderEngine:
     def __init__(
@@ -125,12 +264,40 @@ class OrderEngine:
         adapter_manager: AdapterManager,
         event_bus: Optional[AsyncEventBus] = None,
         order_timeout_min: float = 15,
+        timeout_tick_seconds: float = 1.0,
+        timeout_batch_size: int = 100,
+        reconcile_config: Optional[ReconcileConfig] = None,
+        store: Optional[OrderStore] = None,
+        action_result_ttl: float = 1.0,
+        lock_stripes: int = 256,
     ):
         self._adapter_manager = adapter_manager
         self.event_bus = event_bus
+        self._store = store or InMemoryOrderStore()
         self._orders: Dict[str, OrderContext] = {}
-        self._watchers = {}
+        self._locks = LockStripes(size=lock_stripes)
         self.order_timeout_min = order_timeout_min
+        self._scheduler = OrderDeadlineScheduler(
+            on_expired=self._on_orders_timeout,
+            tick_seconds=timeout_tick_seconds,
+            batch_size=timeout_batch_size,
+        )
+        self._reconciler = OrderReconciler(
+            handler=self._verify_timeout_order,
+            config=reconcile_config,
+        )
+        # Concurrent identical provider calls (status query, capture) of one order share one call
+        self._single_flight = SingleFlight(result_ttl=action_result_ttl)
+        # Kept on status transitions, a scrape doesn't walk the orders
+        self._open_orders = 0
+        OPEN_ORDERS.set_function(self._count_open_orders)
+        ACTIVE_DEADLINES.set_function(self._count_deadlines)
+
+    def _count_open_orders(self) -> int:
+        return self._open_orders
+
+    def _count_deadlines(self) -> int:
+        return len(self._scheduler)
 
     async def create_order(
         self, adapter: Literal["alipay", "paypal"], order: OrderCreatorScheme
@@ -141,19 +308,28 @@ class OrderEngine:
         driver = self._adapter_manager.get(adapter)
         snapshot = await driver.create_order(order)
 
-        self._orders[order.order_id] = OrderContext(
-            driver=driver, snapshot=snapshot, event_bus=self.event_bus
+        timeout_seconds = self.order_timeout_min * 60
+        await self._store.put(
+            OrderRecord(
+                order_id=order.order_id,
+                adapter=adapter,
+                snapshot=snapshot,
+                deadline=time.time() + timeout_seconds,
+            )
         )
-        watcher = OrderTimeoutWatcher(
-            order_id=order.order_id,
-            engine=self,
-            timeout_seconds=self.order_timeout_min * 60,
+        self._orders[order.order_id] = OrderContext(
+            driver=driver,
+            snapshot=snapshot,
+            store=self._store,
+            event_bus=self.event_bus,
+            adapter=adapter,
+            locks=self._locks,
         )
-        watcher.start()
+        self._scheduler.schedule(order.order_id, timeout_seconds)
+        if snapshot.status not in TERMINAL_STATUSES:
+            self._open_orders += 1
 
-        self._watchers[order.order_id] = watcher
-
-        logger.info(f"Order created: {order.order_id}, snapshot: {snapshot}")
+        logger.info("Order created: {}, snapshot: {}", order.order_id, snapshot)
         return snapshot
 
     async def apply_snapshot(self, snapshot: OrderSnapshot):
@@ -163,15 +339,71 @@ class OrderEngine:
 
         is_update = await context.update_snapshot(new_snapshot=snapshot)
         if is_update:
-            logger.info(f"Order {snapshot.order_id} " f"status -> {snapshot.status}")
-            if snapshot.status in (
-                OrderStatus.PAID,
-                OrderStatus.FAILED,
-                OrderStatus.CANCEL,
-            ):
-                watcher = self._watchers.pop(snapshot.order_id, None)
-                if watcher:
-                    await watcher.stop()
+            logger.info("Order {} status -> {}", snapshot.order_id, snapshot.status)
+            # Cached results were computed from the previous snapshot
+            for action_name in COALESCED_ACTIONS:
+                self._single_flight.forget((snapshot.order_id, action_name))
+            if snapshot.status in TERMINAL_STATUSES:
+                # Once per order, a terminal status is never updated again
+                self._open_orders -= 1
+                self._scheduler.cancel(snapshot.order_id)
+
+    async def restore(self, owns: Optional[Callable[[str], bool]] = None, adapter: Optional[str] = None):
+        """
+        Reload the unfinished orders from the store, e.g. after a restart,
+        and schedule their remaining timeout.
+
+        :param owns: Filter of the order ids handled by this process, e.g. ShardRouter.is_owner
+        :param adapter: Only restore the orders of this adapter, e.g. once its init succeeded
+        """
+        active = [status for status in OrderStatus if status not in TERMINAL_STATUSES]
+        records = await self._store.list_by_status(active)
+        now = time.time()
+        restored = 0
+        for record in records:
+            if record.order_id in self._orders or (owns and not owns(record.order_id)):
+                continue
+            if adapter and record.adapter != adapter:
+                continue
+            try:
+                driver = self._adapter_manager.get(record.adapter)
+            except KeyError:
+                logger.warning(f"Skip order {record.order_id}, adapter {record.adapter} not registered")
+                continue
+
+            self._orders[record.order_id] = OrderContext(
+                driver=driver,
+                snapshot=record.snapshot,
+                store=self._store,
+                event_bus=self.event_bus,
+                adapter=record.adapter,
+                locks=self._locks,
+            )
+            self._scheduler.schedule(record.order_id, max(record.deadline - now, 0))
+            self._open_orders += 1
+            restored += 1
+
+        scope = f" of adapter {adapter}" if adapter else ""
+        logger.info(f"Restore {restored} orders{scope} from store")
+
+    async def is_committed(self, event: DomainEvent) -> bool:
+        """
+        Whether the status change an order event announces reached the store,
+        the recover() check of events staged before a crash.
+        """
+        snapshot = getattr(event, "snapshot", None)
+        if snapshot is None:
+            return True
+        record = await self._store.get(snapshot.order_id)
+        if record is None:
+            # Nothing to check against, e.g. an in-memory store after a restart
+            return True
+        old_status = getattr(event, "old_status", None)
+        if old_status is not None:
+            # The order has a single writer, an uncommitted change leaves the old status
+            return record.snapshot.status != old_status
+        # Paid and failed events, their status is terminal
+        return record.snapshot.status == snapshot.status
 
     def get_order_status(self, order_id: str) -> OrderStatus:
         return self._orders[order_id].snapshot.status
@@ -185,50 +417,57 @@ class OrderEngine:
     def get_order_driver(self, order_id: str) -> AdapterDriver:
         return self._orders[order_id].driver
 
+    def reconcile_stats(self) -> Dict[str, Dict[str, int]]:
+        return self._reconciler.stats()
 
-class OrderTimeoutWatcher:
-    def __init__(
-        self,
-        order_id: str,
-        engine: OrderEngine,
-        timeout_seconds: int,
-        interval_seconds: int = 10,
-    ):
-        self.order_id = order_id
-        self.engine = engine
-        self.timeout_seconds = timeout_seconds
-        self._task: Optional[asyncio.Task] = None
-        self._stop_event = asyncio.Event()
-
-    def start(self):
-        self._task = asyncio.create_task(self._run())
+    async def aclose(self):
+        OPEN_ORDERS.unset_function(self._count_open_orders)
+        ACTIVE_DEADLINES.unset_function(self._count_deadlines)
+        await self._scheduler.stop()
+        await self._reconciler.stop()
+        await self._store.aclose()
 
-    async def stop(self):
-        self._stop_event.set()
-        if self._task:
-            self._task.cancel()
+    async def _on_orders_timeout(self, order_ids: List[str]):
+        by_adapter: Dict[str, List[str]] = defaultdict(list)
+        for order_id in order_ids:
+            context = self._orders.get(order_id)
+            if context:
+                by_adapter[context.adapter].append(order_id)
 
-    async def _run(self):
-        try:
-            await asyncio.wait_for(
-                self._stop_event.wait(),
-                timeout=self.timeout_seconds,
-            )
-            return
+        for adapter, adapter_order_ids in by_adapter.items():
+            self._reconciler.submit(adapter, adapter_order_ids)
 
-        except asyncio.TimeoutError:
-            try:
-                logger.info(f"Order {self.order_id} reached timeout, verifying...")
-                driver = self.engine.get_order_driver(self.order_id)
-                snapshot = self.engine.get_order_snapshot(self.order_id)
-                new_snapshot = await driver.fetch_order_status(snapshot)
-                await self.engine.apply_snapshot(new_snapshot)
-                logger.debug(f"Timeout watcher trigger: {self.order_id}")
-            except Exception as e:
-                error_info = error_context()
-                logger.error(
-                    f"Failed to query order {self.order_id} on timeout: {e}, trace_error:{error_info}"
-                )
-        except Exception as e:
-            error_info = error_context()
-            logger.error(f"Watcher unexpected error: {e}, trace_error:{error_info}")
+    async def run_order_action(
+        self,
+        order_id: str,
+        action: Callable[[AdapterDriver, OrderSnapshot], Awaitable[Optional[OrderSnapshot]]],
+        action_name: Optional[str] = None,
+    ) -> Optional[OrderSnapshot]:
+        """
+        Run a driver action on the current snapshot and apply its result.
+
+        With action_name, concurrent calls of the same action on one order
+        share a single provider call and result (see COALESCED_ACTIONS).
+        """
+
+        async def _run() -> Optional[OrderSnapshot]:
+            driver = self.get_order_driver(order_id)
+            snapshot = self.get_order_snapshot(order_id)
+            new_snapshot = await action(driver, snapshot)
+            # Drivers return None when nothing changed, e.g. an unverified webhook
+            if new_snapshot is not None:
+                await self.apply_snapshot(new_snapshot)
+            return new_snapshot
+
+        if action_name is None:
+            return await _run()
+        return await self._single_flight.do((order_id, action_name), _run)
+
+    async def _verify_timeout_order(self, order_id: str):
+        logger.info(f"Order {order_id} reached timeout, verifying...")
+        await self.run_order_action(
+            order_id,
+            lambda d, s: d.fetch_order_status(s),
+            action_name="fetch_order_status",
+        )
+        logger.debug("Timeout scheduler trigger: {}", order_id)
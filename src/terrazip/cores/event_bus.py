@@ -0,0 +1,329 @@
+from typing import Literal, Dict, Optional, Callable, Awaitable, List, Type, Any, Tuple
+from dataclasses import dataclass
+from datetime import datetime
+from abc import ABC
+from collections import defaultdict
+import asyncio
+import os
+import pickle
+import tempfile
+import time
+import uuid
+
+from .outbox import EventOutbox
+from ..utils import logger, error_context
+from ..utils.tracing import SpanContext, start_span, current_span_context
+
+
+class DomainEvent(ABC):
+    occurred_at: datetime
+
+
+EventHandler = Callable[[DomainEvent], Awaitable[None]]
+# (outbox event id or None, event, queues of its handlers), see AsyncEventBus.stage
+StagedEvent = Tuple[Optional[str], DomainEvent, List["_HandlerQueue"]]
+
+
+@dataclass(frozen=True)
+class HandlerConfig:
+    queue_size: int = 1000
+    workers: int = 1
+    # When the queue is full: wait for room (backpressure on the publisher),
+    # drop the oldest queued event, or append the event to a file on disk
+    overflow: Literal['block', 'drop_oldest', 'spill'] = 'block'
+    # Directory of the spill files, the system temp dir by default
+    spill_dir: Optional[str] = None
+
+
+class _SpillFile:
+    """
+    FIFO of pickled events in a file, overflow of an in-memory queue.
+    It is truncated when opened: it buffers a burst, it doesn't persist events.
+    """
+
+    def __init__(self, directory: Optional[str], name: str):
+        directory = directory or os.path.join(tempfile.gettempdir(), "terrazip")
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"events-{name}-{uuid.uuid4().hex[:8]}.spill")
+        self._file = open(self.path, "w+b")
+        self._read_offset = 0
+        self.size = 0
+
+    def append(self, item: Any):
+        self._file.seek(0, os.SEEK_END)
+        pickle.dump(item, self._file)
+        self.size += 1
+
+    def pop(self) -> Any:
+        self._file.seek(self._read_offset)
+        item = pickle.load(self._file)
+        self._read_offset = self._file.tell()
+        self.size -= 1
+        if self.size == 0:
+            self._file.seek(0)
+            self._file.truncate()
+            self._read_offset = 0
+        return item
+
+    def close(self):
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class _HandlerQueue:
+    """
+    Bounded queue and workers of one subscribed handler.
+    """
+
+    def __init__(
+        self,
+        handler: EventHandler,
+        config: HandlerConfig,
+        name: str,
+        outbox: Optional[EventOutbox] = None,
+    ):
+        self.handler = handler
+        self.config = config
+        self.name = name
+        self.outbox = outbox
+        self.queue: Optional[asyncio.Queue] = None
+        self.workers: List[asyncio.Task] = []
+        self.spill: Optional[_SpillFile] = None
+        self.published = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def start(self):
+        self.queue = asyncio.Queue(maxsize=max(self.config.queue_size, 1))
+        if self.config.overflow == 'spill':
+            self.spill = _SpillFile(self.config.spill_dir, self.name.replace("/", "_").replace(".", "_"))
+        # Strong references, running tasks must not be garbage collected
+        self.workers = [asyncio.create_task(self._work()) for _ in range(max(self.config.workers, 1))]
+
+    async def put(self, item: Tuple[Optional[str], DomainEvent, Optional[SpanContext]]):
+        """
+        item is (outbox event id or None, event, span context of the publisher).
+        """
+        self.published += 1
+        overflow = self.config.overflow
+        if overflow == 'block':
+            await self.queue.put(item)
+        elif overflow == 'drop_oldest':
+            if self.queue.full():
+                # Not acked, a dropped outbox event is replayed on the next start
+                self.queue.get_nowait()
+                self.queue.task_done()
+                self.dropped += 1
+            self.queue.put_nowait(item)
+        elif self.spill.size or self.queue.full():
+            # Once spilling, keep appending to the file, events stay in order
+            self.spill.append(item)
+            self.spilled += 1
+        else:
+            self.queue.put_nowait(item)
+
+    def _refill(self):
+        while self.spill is not None and self.spill.size and not self.queue.full():
+            self.queue.put_nowait(self.spill.pop())
+
+    async def _work(self):
+        while True:
+            event_id, event, trace_parent = await self.queue.get()
+            self._refill()
+            started_at = time.perf_counter()
+            try:
+                # The handler span continues the trace of the publisher
+                with start_span(f"event {self.name}", parent=trace_parent):
+                    await self.handler(event)
+                self.processed += 1
+                if event_id is not None:
+                    self.outbox.ack(event_id, self.name)
+            except Exception:
+                self.failed += 1
+                error_info = error_context()
+                logger.error(f"Event handler {self.name} failed, error_info: {error_info}")
+            finally:
+                latency = time.perf_counter() - started_at
+                self.latency_total += latency
+                self.latency_max = max(self.latency_max, latency)
+                self.queue.task_done()
+
+    def pending(self) -> int:
+        return (self.queue.qsize() if self.queue else 0) + (self.spill.size if self.spill else 0)
+
+    async def drain(self):
+        while True:
+            await self.queue.join()
+            if not (self.spill and self.spill.size):
+                return
+            self._refill()
+
+    async def stop(self):
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        if self.spill is not None:
+            if self.spill.size:
+                logger.warning(f"Event handler {self.name} stopped with {self.spill.size} spilled events")
+            self.spill.close()
+            self.spill = None
+
+    def stats(self) -> Dict[str, Any]:
+        done = self.processed + self.failed
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "spill_depth": self.spill.size if self.spill else 0,
+            "published": self.published,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "latency_avg": self.latency_total / done if done else 0.0,
+            "latency_max": self.latency_max,
+        }
+
+
+class AsyncEventBus:
+    """
+    Every subscribed handler gets its own bounded queue and worker tasks.
+
+    publish() only enqueues, what happens when a handler's queue is full
+    depends on its HandlerConfig.overflow. aclose() drains the queues.
+
+    With an outbox, publish() first writes the event to it and handlers ack
+    it once done; recover() (after every subscribe) dispatches again what
+    was not acked before a crash, so handlers get events at least once.
+    Handler names identify them across restarts, they must be stable.
+
+    publish() is stage() then dispatch(). A caller committing a change the
+    events announce stages them first, then dispatches them once the change
+    is committed, or discards them if it is not.
+    """
+
+    def __init__(self, default_config: Optional[HandlerConfig] = None, outbox: Optional[EventOutbox] = None):
+        self.default_config = default_config or HandlerConfig()
+        self.outbox = outbox
+        self._subscribers: Dict[Type[DomainEvent], List[_HandlerQueue]] = defaultdict(
+            list
+        )
+        self._started = False
+
+    def subscribe(
+        self,
+        event_type: Type[DomainEvent],
+        handler: EventHandler,
+        config: Optional[HandlerConfig] = None,
+        name: Optional[str] = None,
+    ):
+        name = name or f"{event_type.__name__}/{getattr(handler, '__qualname__', repr(handler))}"
+        handler_queue = _HandlerQueue(handler, config or self.default_config, name, self.outbox)
+        if self._started:
+            handler_queue.start()
+        self._subscribers[event_type].append(handler_queue)
+        logger.debug(f"Subscribe event_type:{event_type}, handler: {handler}")
+
+    def _start(self):
+        # Queues and workers need the running loop, created on first publish
+        self._started = True
+        for handler_queues in self._subscribers.values():
+            for handler_queue in handler_queues:
+                handler_queue.start()
+
+    async def publish(self, event: DomainEvent):
+        await self.dispatch(await self.stage([event]))
+
+    async def stage(self, events: List[DomainEvent]) -> List[StagedEvent]:
+        """
+        Write the events to the outbox (one group commit), no handler sees them yet.
+        """
+        if not self._started:
+            self._start()
+        staged = []
+        records = []
+        for event in events:
+            handler_queues = self._subscribers.get(type(event), [])
+            event_id = None
+            if self.outbox is not None and handler_queues:
+                event_id = uuid.uuid4().hex
+                records.append(self.outbox.record(event_id, event, [q.name for q in handler_queues]))
+            staged.append((event_id, event, handler_queues))
+        # Durable before any handler sees them
+        await asyncio.gather(*records)
+        return staged
+
+    async def dispatch(self, staged: List[StagedEvent]):
+        trace_parent = current_span_context()
+        for event_id, event, handler_queues in staged:
+            for handler_queue in handler_queues:
+                await handler_queue.put((event_id, event, trace_parent))
+
+    def discard(self, staged: List[StagedEvent]):
+        """
+        Drop staged events from the outbox, the change they announce was not committed.
+        """
+        for event_id, _, _ in staged:
+            if event_id is not None:
+                self.outbox.discard(event_id)
+
+    async def recover(self, confirm: Optional[Callable[[DomainEvent], Awaitable[bool]]] = None) -> int:
+        """
+        Dispatch the outbox events some handlers had not acked, e.g. after a crash.
+
+        :param confirm: Whether the change an event announces was committed, the others
+            were staged by a process that crashed before committing and are discarded
+        """
+        if self.outbox is None:
+            return 0
+        if not self._started:
+            self._start()
+        by_name = {q.name: q for queues in self._subscribers.values() for q in queues}
+        dispatched = 0
+        for event_id, event, handler_names in self.outbox.recover():
+            if confirm is not None and not await confirm(event):
+                logger.info(f"Discard outbox event {event_id}, its change was never committed")
+                self.outbox.discard(event_id)
+                continue
+            for handler_name in handler_names:
+                handler_queue = by_name.get(handler_name)
+                if handler_queue is None:
+                    logger.warning(f"Outbox event {event_id} for unknown handler {handler_name}, keep it")
+                    continue
+                await handler_queue.put((event_id, event, None))
+                dispatched += 1
+        if dispatched:
+            logger.info(f"Recover {dispatched} outbox deliveries")
+        return dispatched
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            handler_queue.name: handler_queue.stats()
+            for handler_queues in self._subscribers.values()
+            for handler_queue in handler_queues
+        }
+
+    async def aclose(self, drain_timeout: float = 5.0):
+        """
+        Wait up to drain_timeout for queued events to be handled, then stop the workers.
+        """
+        if not self._started:
+            return
+        handler_queues = [q for queues in self._subscribers.values() for q in queues]
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(q.drain() for q in handler_queues)), timeout=drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning(f"Event bus not drained, {sum(q.pending() for q in handler_queues)} events left")
+        for handler_queue in handler_queues:
+            await handler_queue.stop()
+        if self.outbox is not None:
+            await self.outbox.aclose()
+        self._started = False
@@ -0,0 +1,303 @@
+from typing import Literal, Sequence, Optional, Callable, List, Union, Awaitable
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from decimal import Decimal
+import asyncio
+import inspect
+import json
+
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from starlette.requests import HTTPConnection
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+
+from .application import Terrazip, EndpointsConfig, RequestCreateType
+from .engine import AsyncEventBus
+from .reconciler import ReconcileConfig
+from .store import OrderStore
+from .sharding import ShardRouter
+from .ingestion import WebhookIngestor, WebhookQueueConfig
+from .idempotency import WebhookDeduplicator
+from .streaming import OrderStatusBroadcaster
+from ..utils import logger, process_payload_to_json, error_context, PoolConfig
+from ..utils.metrics import REGISTRY, enable_metrics
+
+# (request or websocket, requested order ids, empty for every order) -> allowed
+StreamAuthorizer = Callable[[HTTPConnection, List[str]], Union[bool, Awaitable[bool]]]
+
+
+class TerrazipFastapi:
+    def __init__(
+        self,
+        app: FastAPI,
+        env: Literal['SANDBOX', 'PRODUCTION'],
+        adapters: Sequence[Literal['alipay', 'paypal']],
+        base_url: str,
+        webhook_base_url: str,
+        endpoints: Optional[EndpointsConfig] = None,
+        event_bus: Optional[AsyncEventBus] = None,
+        order_timeout_min: float = 15,
+        timeout: Decimal = 10.0,
+        http_pool: Optional[PoolConfig] = None,
+        sign_executor: Optional[Literal['thread', 'process']] = None,
+        sign_workers: Optional[int] = None,
+        reconcile_config: Optional[ReconcileConfig] = None,
+        order_store: Optional[OrderStore] = None,
+        shard_router: Optional[ShardRouter] = None,
+        webhook_queue: Optional[WebhookQueueConfig] = None,
+        webhook_dedup: Optional[WebhookDeduplicator] = None,
+        adapter_init_timeout: Optional[float] = 30.0,
+        partial_adapters: bool = False,
+        status_stream: bool = False,
+        stream_authorizer: Optional[StreamAuthorizer] = None,
+        stream_queue_size: int = 100,
+        stream_heartbeat: float = 15.0,
+        metrics: bool = False,
+    ):
+        self.endpoints = endpoints or {
+            "success": "/success",
+            "cancel": "/cancel",
+            "webhook": "/notify"
+        }
+        if status_stream and stream_authorizer is None:
+            # The stream exposes the ids and statuses of every order
+            raise ValueError(
+                "status_stream needs a stream_authorizer, "
+                "e.g. one checking a token and that the client owns the order ids"
+            )
+        if status_stream and event_bus is None:
+            # The status stream is fed by the event bus
+            event_bus = AsyncEventBus()
+        self.terrazip = Terrazip(
+            env=env,
+            adapters=adapters,
+            base_url=base_url,
+            webhook_base_url=webhook_base_url,
+            endpoints=self.endpoints,
+            event_bus=event_bus,
+            order_timeout_min=order_timeout_min,
+            timeout=timeout,
+            http_pool=http_pool,
+            sign_executor=sign_executor,
+            sign_workers=sign_workers,
+            reconcile_config=reconcile_config,
+            order_store=order_store,
+            shard_router=shard_router,
+            webhook_dedup=webhook_dedup,
+            adapter_init_timeout=adapter_init_timeout,
+            partial_adapters=partial_adapters,
+        )
+        self.app = app
+        # Fast ACK mode: webhooks are queued and processed in background
+        self._ingestor = (
+            WebhookIngestor(handler=self.terrazip.handle_webhook, config=webhook_queue)
+            if webhook_queue
+            else None
+        )
+        self._broadcaster: Optional[OrderStatusBroadcaster] = None
+        if status_stream:
+            self._broadcaster = OrderStatusBroadcaster(queue_size=stream_queue_size)
+            self._broadcaster.attach(self.terrazip.event_bus)
+        self._stream_authorizer = stream_authorizer
+        self._stream_heartbeat = stream_heartbeat
+        self._metrics = metrics
+        if metrics:
+            enable_metrics()
+        
+    async def init(self):
+        await self.terrazip.init()
+        if self._ingestor:
+            await self._ingestor.start()
+
+    async def aclose(self):
+        if self._broadcaster:
+            # Ends the open streams, the server can't shut down while they last
+            self._broadcaster.close()
+        if self._ingestor:
+            await self._ingestor.aclose()
+        await self.terrazip.aclose()
+
+    def webhook_stats(self) -> dict:
+        stats = self._ingestor.stats() if self._ingestor else {}
+        stats["dedup"] = self.terrazip.webhook_dedup.stats()
+        return stats
+
+    def stream_stats(self) -> dict:
+        return self._broadcaster.stats() if self._broadcaster else {}
+
+    @asynccontextmanager
+    async def lifespan(self, app: FastAPI):
+        """
+        Startup/shutdown hook when serving the app by yourself:
+            app.router.lifespan_context = terrazip_fastapi.lifespan
+        """
+        await self.init()
+        try:
+            yield
+        finally:
+            await self.aclose()
+    
+    async def pay(self, request: Request) -> JSONResponse:
+        body = await request.body()
+        header = request.headers
+        payload = process_payload_to_json(
+            payload=body, headers=header
+        )
+        logger.debug("input request: header{}, body: {}", dict(header), payload)
+        try:
+            request_type = RequestCreateType(**payload)
+        except:
+            error_info = error_context()
+            logger.error(f"Error info:{error_info}")
+            return JSONResponse(
+                content={'text': 'Bad Request', 'error': {error_info}},
+                status_code=400,
+            )
+        order_id = self.terrazip.new_order_id('order')
+        order_snapshot = await self.terrazip.create_order(
+            adapter=request_type.adapter,
+            order_id=order_id,
+            amount=request_type.amount,
+            currency=request_type.currency,
+            description=request_type.description,
+            metadata=request_type.metadata or {},
+        )
+        return JSONResponse(
+            content=asdict(order_snapshot),
+            status_code=200
+        )
+        
+    async def success(self, order_id):
+        await self.terrazip.capture_order(order_id=order_id)
+        return JSONResponse(
+            content='CAPTURE ORDER!',
+            status_code=200
+        )
+        
+    async def notify(self, request: Request):
+        headers = request.headers
+        body = await request.body()
+        if self._ingestor:
+            return self._enqueue_webhook(headers, body)
+
+        await self.terrazip.handle_webhook(headers, body)
+        return JSONResponse(
+            content='Order Complete',
+            status_code=200
+        )
+        
+    def _enqueue_webhook(self, headers, body: bytes) -> JSONResponse:
+        # Reject what can never succeed now, instead of retrying it in background
+        try:
+            order_id = self.terrazip.extract_order_id_from_request(header=headers, body=body)
+        except Exception as e:
+            logger.warning(f"Reject unparsable webhook: {e}")
+            return JSONResponse(content='Bad Request', status_code=400)
+
+        if not self._ingestor.submit(headers, body):
+            # Providers redeliver on 5xx, so a full queue only delays the webhook
+            return JSONResponse(content='Webhook queue full', status_code=503)
+
+        logger.debug("Enqueue webhook of order:{}", order_id)
+        return JSONResponse(content='Order Accepted', status_code=200)
+
+    async def _authorize_stream(self, connection: HTTPConnection, order_ids: List[str]) -> bool:
+        try:
+            allowed = self._stream_authorizer(connection, order_ids)
+            if inspect.isawaitable(allowed):
+                allowed = await allowed
+        except Exception:
+            error_info = error_context()
+            logger.error(f"Stream authorizer failed, error_info: {error_info}")
+            return False
+        return bool(allowed)
+
+    async def stream_status(self, request: Request):
+        """
+        Server-Sent Events of order status changes, e.g. /orders/stream?order_id=a&order_id=b
+        """
+        order_ids = request.query_params.getlist('order_id')
+        if not await self._authorize_stream(request, order_ids):
+            return JSONResponse(content='Forbidden', status_code=403)
+
+        async def events():
+            # Subscribe inside the generator, so its finally always unsubscribes
+            subscription = self._broadcaster.subscribe(order_ids)
+            try:
+                while not subscription.closed:
+                    message = await subscription.get(timeout=self._stream_heartbeat)
+                    if message is not None:
+                        yield f"event: status\ndata: {json.dumps(message)}\n\n"
+                    elif await request.is_disconnected():
+                        break
+                    elif not subscription.closed:
+                        yield ": ping\n\n"
+            finally:
+                self._broadcaster.unsubscribe(subscription)
+
+        return StreamingResponse(
+            events(),
+            media_type='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+        )
+
+    async def stream_status_ws(self, websocket: WebSocket):
+        """
+        WebSocket of order status changes, e.g. /orders/ws?order_id=a
+        """
+        order_ids = websocket.query_params.getlist('order_id')
+        if not await self._authorize_stream(websocket, order_ids):
+            # Closed before accept: the handshake gets a 403
+            await websocket.close(code=1008)
+            return
+        await websocket.accept()
+        subscription = self._broadcaster.subscribe(order_ids)
+        try:
+            while not subscription.closed:
+                message = await subscription.get(timeout=self._stream_heartbeat)
+                if message is not None:
+                    await websocket.send_json({'type': 'status', **message})
+                elif not subscription.closed:
+                    # Also detects clients gone without a close frame
+                    await websocket.send_json({'type': 'ping'})
+            # Evicted or shutting down, 1013: try again later
+            await websocket.close(code=1013)
+        except WebSocketDisconnect:
+            pass
+        finally:
+            self._broadcaster.unsubscribe(subscription)
+
+    async def metrics(self) -> PlainTextResponse:
+        return PlainTextResponse(REGISTRY.render(), media_type='text/plain; version=0.0.4')
+
+    def add_route(self, app: FastAPI):
+        app.add_api_route('/pay', endpoint=self.pay, methods=["POST"])
+        app.add_api_route(self.endpoints.get('success'), endpoint=self.success, methods=['GET'])
+        app.add_api_route(self.endpoints.get('webhook'), endpoint=self.notify, methods=['POST'])
+        if self._broadcaster:
+            app.add_api_route('/orders/stream', endpoint=self.stream_status, methods=['GET'])
+            app.add_api_websocket_route('/orders/ws', endpoint=self.stream_status_ws)
+        if self._metrics:
+            app.add_api_route('/metrics', endpoint=self.metrics, methods=['GET'])
+        
+    def run(self, host: str='localhost', port: int=5000, app: FastAPI| None = None, log_level: str = 'info'):
+        
+        if not app:
+            app = self.app
+        self.add_route(app)
+        
+        async def start():
+            # Only needed when serving by ourselves
+            import uvicorn
+
+            await self.init()
+            try:
+                config = uvicorn.Config(app, host=host, port=port, log_level=log_level)
+                server = uvicorn.Server(config)
+                await server.serve()
+            finally:
+                await self.aclose()
+            
+        asyncio.run(start())
+        
+    def get_app(self) -> FastAPI:
+        return self.app
@@ -0,0 +1,153 @@
+from typing import Optional, Dict
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import os
+import sqlite3
+import time
+
+from ..utils import logger
+
+
+class IdempotencyStore(ABC):
+    @abstractmethod
+    async def claim(self, key: str, ttl: float) -> bool:
+        """
+        Record the key for ttl seconds, False if it is already recorded.
+        """
+
+    @abstractmethod
+    async def release(self, key: str) -> None:
+        """
+        Forget the key, e.g. its processing failed and a redelivery should run again.
+        """
+
+    async def aclose(self) -> None: ...
+
+
+class InMemoryIdempotencyStore(IdempotencyStore):
+    """
+    Bounded TTL cache, the least recently claimed keys are evicted first.
+    """
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._keys: OrderedDict[str, float] = OrderedDict()
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        now = time.monotonic()
+        expires_at = self._keys.get(key)
+        if expires_at is not None and expires_at > now:
+            return False
+
+        self._keys[key] = now + ttl
+        self._keys.move_to_end(key)
+        while len(self._keys) > self.maxsize:
+            self._keys.popitem(last=False)
+        return True
+
+    async def release(self, key: str) -> None:
+        self._keys.pop(key, None)
+
+
+_CREATE_TABLE = "CREATE TABLE IF NOT EXISTS webhook_keys (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)"
+# Insert a new key, or take over an expired one
+_CLAIM = (
+    "INSERT INTO webhook_keys (key, expires_at) VALUES (?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET expires_at = excluded.expires_at WHERE webhook_keys.expires_at <= ?"
+)
+_RELEASE = "DELETE FROM webhook_keys WHERE key = ?"
+_PURGE = "DELETE FROM webhook_keys WHERE expires_at <= ?"
+
+
+class SqliteIdempotencyStore(IdempotencyStore):
+    """
+    SQLite (WAL) store, shared by restarts and by every worker process on the host.
+    """
+
+    def __init__(self, path: str = "terrazip_webhooks.db", purge_every: int = 1000):
+        self.path = path
+        self.purge_every = purge_every
+        self._claims = 0
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="terrazip-idempotency")
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            conn = sqlite3.connect(self.path, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(_CREATE_TABLE)
+            self._conn = conn
+            logger.info(f"Open sqlite idempotency store: {self.path}")
+        return self._conn
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def claim(self, key: str, ttl: float) -> bool:
+        self._claims += 1
+        purge = self._claims % self.purge_every == 0
+
+        def _claim():
+            # Wall clock, the keys are shared between processes
+            now = time.time()
+            conn = self._connect()
+            if purge:
+                conn.execute(_PURGE, (now,))
+            return conn.execute(_CLAIM, (key, now + ttl, now)).rowcount == 1
+
+        return await self._run(_claim)
+
+    async def release(self, key: str) -> None:
+        await self._run(lambda: self._connect().execute(_RELEASE, (key,)))
+
+    async def aclose(self) -> None:
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        await self._run(_close)
+        self._executor.shutdown(wait=True)
+
+
+class WebhookDeduplicator:
+    """
+    Skip provider redeliveries of a webhook before any verification or provider query.
+
+    Keys are adapter + provider notification id + order id. A key is claimed
+    when processing starts and released if processing fails, so only
+    successfully handled (or in flight) webhooks are treated as duplicates.
+    """
+
+    def __init__(self, store: Optional[IdempotencyStore] = None, ttl: float = 3 * 24 * 3600):
+        self._store = store or InMemoryIdempotencyStore()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(adapter: str, event_id: str, order_id: str) -> str:
+        return f"{adapter}:{event_id}:{order_id}"
+
+    async def claim(self, key: str) -> bool:
+        if await self._store.claim(key, self.ttl):
+            self.misses += 1
+            return True
+        self.hits += 1
+        return False
+
+    async def release(self, key: str):
+        await self._store.release(key)
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
+
+    async def aclose(self):
+        await self._store.aclose()
@@ -0,0 +1,212 @@
+from typing import Optional, Callable, Awaitable, Dict, List
+from dataclasses import dataclass
+import asyncio
+import base64
+import json
+import os
+import uuid
+
+from ..utils import logger, error_context
+
+WebhookHandler = Callable[[dict, bytes], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class WebhookQueueConfig:
+    maxsize: int = 1000
+    workers: int = 4
+    max_retries: int = 3
+    # Backoff base of a failed webhook, doubled per attempt
+    retry_delay: float = 1.0
+    # Append-only file keeping accepted but unfinished webhooks across restarts
+    spool_path: Optional[str] = None
+
+
+@dataclass
+class WebhookJob:
+    job_id: str
+    headers: dict
+    body: bytes
+    attempts: int = 0
+
+
+class WebhookSpool:
+    """
+    JSON lines log of accepted ("put") and finished ("done") webhooks.
+    Lines are flushed to the OS on write, so a process crash loses nothing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._file = None
+
+    def recover(self) -> List[WebhookJob]:
+        pending: Dict[str, WebhookJob] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn last line of a crash
+                        continue
+                    if entry.get("op") == "put":
+                        pending[entry["id"]] = WebhookJob(
+                            job_id=entry["id"],
+                            headers=entry["headers"],
+                            body=base64.b64decode(entry["body"]),
+                        )
+                    elif entry.get("op") == "done":
+                        pending.pop(entry["id"], None)
+
+        # Compact the log to the unfinished jobs only
+        jobs = list(pending.values())
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for job in jobs:
+                f.write(self._put_line(job))
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
+        return jobs
+
+    @staticmethod
+    def _put_line(job: WebhookJob) -> str:
+        return json.dumps({
+            "op": "put",
+            "id": job.job_id,
+            "headers": job.headers,
+            "body": base64.b64encode(job.body).decode("ascii"),
+        }) + "\n"
+
+    def put(self, job: WebhookJob):
+        self._file.write(self._put_line(job))
+        self._file.flush()
+
+    def done(self, job_id: str):
+        self._file.write(json.dumps({"op": "done", "id": job_id}) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class WebhookIngestor:
+    """
+    Bounded in-process queue between the webhook endpoint and its processing.
+
+    submit() only enqueues and never waits, a full queue is reported to the
+    caller (backpressure) so it can answer with a retryable status code.
+    Workers process the jobs and retry failed ones with exponential backoff.
+    """
+
+    def __init__(self, handler: WebhookHandler, config: Optional[WebhookQueueConfig] = None):
+        self._handler = handler
+        self.config = config or WebhookQueueConfig()
+        self._queue: Optional[asyncio.Queue[WebhookJob]] = None
+        self._workers: List[asyncio.Task] = []
+        self._retry_handles: Dict[str, asyncio.TimerHandle] = {}
+        self._spool = WebhookSpool(self.config.spool_path) if self.config.spool_path else None
+        self.accepted = 0
+        self.dropped = 0
+        self.retried = 0
+        self.processed = 0
+        self.failed = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.config.maxsize)
+        self._workers = [
+            asyncio.create_task(self._work()) for _ in range(max(self.config.workers, 1))
+        ]
+        if self._spool:
+            recovered = self._spool.recover()
+            # Wait for free room instead of dropping, a restart must not lose accepted webhooks
+            for job in recovered:
+                await self._queue.put(job)
+            if recovered:
+                logger.info(f"Recover {len(recovered)} webhooks from spool")
+
+    def submit(self, headers: dict, body: bytes) -> bool:
+        job = WebhookJob(job_id=uuid.uuid4().hex, headers=dict(headers), body=body)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Webhook queue full ({self.config.maxsize}), drop webhook")
+            return False
+
+        if self._spool:
+            self._spool.put(job)
+        self.accepted += 1
+        return True
+
+    def _retry(self, job: WebhookJob):
+        self._retry_handles.pop(job.job_id, None)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            # Still in the spool, it will be recovered on the next start
+            self.dropped += 1
+            logger.warning(f"Webhook queue full, drop retry of {job.job_id}")
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._handler(job.headers, job.body)
+                self.processed += 1
+                if self._spool:
+                    self._spool.done(job.job_id)
+            except Exception as e:
+                job.attempts += 1
+                error_info = error_context()
+                if job.attempts <= self.config.max_retries:
+                    self.retried += 1
+                    delay = self.config.retry_delay * 2 ** (job.attempts - 1)
+                    logger.warning(f"Webhook {job.job_id} failed: {e}, retry in {delay}s")
+                    self._retry_handles[job.job_id] = asyncio.get_running_loop().call_later(
+                        delay, self._retry, job
+                    )
+                else:
+                    self.failed += 1
+                    logger.error(f"Webhook {job.job_id} failed after {job.attempts} attempts: {error_info}")
+                    if self._spool:
+                        self._spool.done(job.job_id)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "retried": self.retried,
+            "processed": self.processed,
+            "failed": self.failed,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "retry_waiting": len(self._retry_handles),
+        }
+
+    async def aclose(self, drain_timeout: float = 5.0):
+        """
+        Wait up to drain_timeout for queued webhooks, then stop the workers.
+        Unfinished ones stay in the spool when it is enabled.
+        """
+        if self._queue is not None and self._workers:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Webhook queue not drained, {self._queue.qsize()} left")
+
+        for handle in self._retry_handles.values():
+            handle.cancel()
+        self._retry_handles.clear()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._spool:
+            self._spool.close()
@@ -1,24 +1,42 @@
-from typing import Sequence, Literal, Callable, Optional, Dict
+from typing import Sequence, Literal, Callable, Optional, Dict, Type, List, Awaitable
 from dataclasses import dataclass
 from decimal import Decimal
-
-from ..adapters.alipay import AlipayDriver, AlipayCredential, AlipayGateway
-from ..adapters.paypal import PayPalCredential, PayPalGateway, PayPalDriver
+import asyncio
+import importlib
+import time
 
 from ..models import Environment, AdapterDriver
-from ..utils import logger
+from ..utils import logger, PoolConfig, SignExecutor
 
 @dataclass(frozen=True)
-class Alipay:
-    driver: AlipayDriver = AlipayDriver
-    credential: AlipayCredential = AlipayCredential
-    gateway: AlipayGateway = AlipayGateway
+class AdapterBundle:
+    """
+    Where the classes of an adapter live, imported on first use so an
+    unused adapter (and its dependencies) is never loaded.
+    """
+    module: str
+    driver_name: str
+    credential_name: str
+    gateway_name: str
+
+    def _load(self, name: str):
+        return getattr(importlib.import_module(self.module, __package__), name)
+
+    @property
+    def driver(self) -> Type[AdapterDriver]:
+        return self._load(self.driver_name)
+
+    @property
+    def credential(self) -> type:
+        return self._load(self.credential_name)
+
+    @property
+    def gateway(self) -> type:
+        return self._load(self.gateway_name)
 
-@dataclass(frozen=True)
-class PayPal:
-    driver: PayPalDriver = PayPalDriver
-    credential: PayPalCredential = PayPalCredential
-    gateway: PayPalGateway = PayPalGateway
+
+Alipay = AdapterBundle('..adapters.alipay', 'AlipayDriver', 'AlipayCredential', 'AlipayGateway')
+PayPal = AdapterBundle('..adapters.paypal', 'PayPalDriver', 'PayPalCredential', 'PayPalGateway')
 
 
 ADAPTERS = {
@@ -39,10 +57,17 @@ class AdapterRegistry:
             raise KeyError(f"Adapter {name} not registered")
         return self._adapters[name]
 
+    def values(self) -> list[AdapterDriver]:
+        return list(self._adapters.values())
+
 
 class AdapterManager:
     def __init__(self):
         self._adapter_registry = AdapterRegistry()
+        # Drivers whose init failed in partial mode, retried in background
+        self._unavailable: Dict[str, AdapterDriver] = {}
+        self._retry_tasks: Dict[str, asyncio.Task] = {}
+        self._available_callbacks: List[Callable[[str], Awaitable[None]]] = []
 
     @classmethod
     async def create(
@@ -51,34 +76,142 @@ class AdapterManager:
         adapters: Sequence[Literal['alipay', 'paypal']],
         webhook_url: str | None = None,
         timeout: Decimal = Decimal("10.0"),
+        pool: PoolConfig | None = None,
+        sign_executor: SignExecutor | None = None,
+        init_timeout: float | None = 30.0,
+        partial: bool = False,
+        retry_delay: float = 5.0,
+        max_retry_delay: float = 300.0,
     ) -> "AdapterManager":
+        """
+        Build the drivers and init them concurrently, each within init_timeout seconds.
+
+        With partial=True the manager starts with the adapters whose init
+        succeeded (at least one), the failed ones are retried in background
+        with exponential backoff and registered once ready.
+        """
         self = cls()
+        started_at = time.perf_counter()
+        drivers: Dict[str, AdapterDriver] = {}
+
+        try:
+            for adapter in adapters:
+                name = adapter.lower()
 
-        for adapter in adapters:
-            name = adapter.lower()
+                if name not in ADAPTERS:
+                    raise KeyError(f"Just support {list(ADAPTERS.keys())}, but got {adapter}")
 
-            if name not in ADAPTERS:
-                raise KeyError(f"Just support {list(ADAPTERS.keys())}, but got {adapter}")
+                bundle = ADAPTERS[name]
 
-            bundle = ADAPTERS[name]
+                drivers[name] = bundle.driver(
+                    credentials=bundle.credential(_env_file=f".env.{env.value}"),
+                    gateway=getattr(bundle.gateway, env.name),
+                    webhook_url=webhook_url,
+                    timeout=timeout,
+                    pool=pool,
+                    sign_executor=sign_executor,
+                )
 
-            driver = bundle.driver(
-                credentials=bundle.credential(_env_file=f".env.{env.value}"),
-                gateway=getattr(bundle.gateway, env.name),
-                webhook_url=webhook_url,
-                timeout=timeout,
+            results = await asyncio.gather(
+                *(self._init_driver(name, driver, init_timeout) for name, driver in drivers.items()),
+                return_exceptions=True,
             )
+            failed = {}
+            for (name, driver), result in zip(drivers.items(), results):
+                if isinstance(result, BaseException):
+                    failed[name] = result
+                    self._unavailable[name] = driver
+                else:
+                    self._adapter_registry.register(name, driver)
 
-            await driver.init()
-            self._adapter_registry.register(name, driver)
+            if failed and (not partial or len(failed) == len(drivers)):
+                raise next(iter(failed.values()))
+            for name, error in failed.items():
+                logger.warning(f"Adapter {name} unavailable: {error!r}, retry in background")
+                self._retry_tasks[name] = asyncio.create_task(
+                    self._retry_init(name, init_timeout, retry_delay, max_retry_delay)
+                )
+        except BaseException:
+            # Close every built driver, a failed init still holds its pool
+            await self._cancel_retries()
+            await self._close_drivers(list(drivers.values()))
+            raise
 
-        logger.info("Init adapters")
-        logger.debug(f"Register: {adapters}, env: {env}, webhook_url:{webhook_url}")
+        logger.info(f"Init adapters in {time.perf_counter() - started_at:.3f}s")
+        logger.debug("Register: {}, env: {}, webhook_url:{}", adapters, env, webhook_url)
         return self
-    
+
+    @staticmethod
+    async def _init_driver(name: str, driver: AdapterDriver, init_timeout: float | None):
+        init_started_at = time.perf_counter()
+        try:
+            await asyncio.wait_for(driver.init(), timeout=init_timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Init adapter {name} timed out after {init_timeout}s")
+        logger.info(f"Init adapter {name} in {time.perf_counter() - init_started_at:.3f}s")
+
+    async def _retry_init(self, name: str, init_timeout: float | None, retry_delay: float, max_retry_delay: float):
+        driver = self._unavailable[name]
+        attempt = 0
+        while True:
+            await asyncio.sleep(min(retry_delay * 2 ** attempt, max_retry_delay))
+            attempt += 1
+            try:
+                await self._init_driver(name, driver, init_timeout)
+            except Exception as e:
+                logger.warning(f"Retry init adapter {name} failed (attempt {attempt}): {e!r}")
+                continue
+            self._adapter_registry.register(name, driver)
+            self._unavailable.pop(name, None)
+            logger.info(f"Adapter {name} available after {attempt} retries")
+            for callback in self._available_callbacks:
+                try:
+                    await callback(name)
+                except Exception as e:
+                    logger.error(f"Adapter {name} available callback failed: {e!r}")
+            self._retry_tasks.pop(name, None)
+            return
+
+    def on_available(self, callback: Callable[[str], Awaitable[None]]):
+        """
+        Await callback(name) when an adapter retried in background is registered,
+        e.g. to restore its orders.
+        """
+        self._available_callbacks.append(callback)
+
     def get(self, name: str) -> AdapterDriver:
+        if name in self._unavailable:
+            raise KeyError(f"Adapter {name} unavailable, its init is being retried")
         return self._adapter_registry.get(name=name)
 
+    def unavailable(self) -> list[str]:
+        """
+        Adapters still waiting for a successful init.
+        """
+        return list(self._unavailable)
+
+    async def aclose(self):
+        """
+        Stop the init retries and release the pooled http connections held by every driver.
+        """
+        await self._cancel_retries()
+        await self._close_drivers(self._adapter_registry.values() + list(self._unavailable.values()))
+        self._unavailable.clear()
+
+    async def _cancel_retries(self):
+        for task in self._retry_tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._retry_tasks.values(), return_exceptions=True)
+        self._retry_tasks.clear()
+
+    @staticmethod
+    async def _close_drivers(drivers: list[AdapterDriver]):
+        for driver in drivers:
+            try:
+                await driver.aclose()
+            except Exception as e:
+                logger.warning(f"Close adapter {driver} failed: {e}")
+
           
 class AdapterDetector:
     """
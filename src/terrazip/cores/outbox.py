@@ -0,0 +1,227 @@
+from typing import Dict, List, Optional, Set, Tuple, Collection
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import json
+import os
+import pickle
+
+from ..utils import logger
+
+
+class EventOutbox:
+    """
+    Append-only log of published domain events and of their handler acks.
+
+    record() returns once the event is on disk; records arriving within
+    flush_interval (or up to max_batch) share one write and one fsync
+    (group commit). Acks are batched the same way without being awaited, a
+    lost ack only means the handler sees the event again after a restart.
+    recover() returns the events not acked by every handler and compacts
+    the log to them.
+
+    While running, once the log holds compact_lines lines (and twice the
+    pending events), a flush rewrites it with the pending events only,
+    so the log does not grow with every event ever published.
+    """
+
+    def __init__(
+        self,
+        path: str = "terrazip_outbox.log",
+        flush_interval: float = 0.002,
+        max_batch: int = 512,
+        fsync: bool = True,
+        compact_lines: int = 10000,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.fsync = fsync
+        self.compact_lines = compact_lines
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._file = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="terrazip-outbox")
+        self._lines: List[str] = []
+        self._waiters: List[asyncio.Future] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: Set[asyncio.Task] = set()
+        self._flush_queued = False
+        # event_id -> (encoded event, handlers not acked yet), mirrors the log
+        self._pending: Dict[str, Tuple[str, Set[str]]] = {}
+        # Lines written to the log since it was last compacted
+        self._log_lines = 0
+        self.recorded = 0
+        self.acked = 0
+        self.flushes = 0
+        self.compactions = 0
+
+    def _open(self):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+
+    def recover(self) -> List[Tuple[str, object, List[str]]]:
+        """
+        (event_id, event, handlers not acked yet) of the unfinished events, in log order.
+        """
+        # event_id -> (encoded event, handlers not acked yet)
+        pending: Dict[str, Tuple[str, Set[str]]] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Torn last line of a crash, its record() never returned
+                        continue
+                    if entry.get("op") == "put":
+                        pending[entry["id"]] = (entry["event"], set(entry["handlers"]))
+                    elif entry.get("op") == "ack" and entry["id"] in pending:
+                        handlers = pending[entry["id"]][1]
+                        handlers.discard(entry["handler"])
+                        if not handlers:
+                            del pending[entry["id"]]
+
+        self._close_file()
+        self._rewrite(pending)
+        self._pending = pending
+        self._open()
+
+        recovered = []
+        for event_id, (encoded, handlers) in pending.items():
+            try:
+                event = pickle.loads(base64.b64decode(encoded))
+            except Exception as e:
+                logger.error(f"Skip undecodable outbox event {event_id}: {e}")
+                continue
+            recovered.append((event_id, event, sorted(handlers)))
+        return recovered
+
+    def _rewrite(self, pending: Dict[str, Tuple[str, Collection[str]]]):
+        """
+        Replace the log with the put lines of pending, atomically.
+        """
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for event_id, (encoded, handlers) in pending.items():
+                f.write(self._put_line(event_id, encoded, handlers))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._log_lines = len(pending)
+
+    @staticmethod
+    def _put_line(event_id: str, encoded: str, handlers: Collection[str]) -> str:
+        return json.dumps({"op": "put", "id": event_id, "handlers": sorted(handlers), "event": encoded}) + "\n"
+
+    async def record(self, event_id: str, event: object, handlers: Collection[str]):
+        encoded = base64.b64encode(pickle.dumps(event)).decode("ascii")
+        future = asyncio.get_running_loop().create_future()
+        self._lines.append(self._put_line(event_id, encoded, handlers))
+        self._pending[event_id] = (encoded, set(handlers))
+        self._waiters.append(future)
+        self.recorded += 1
+        self._schedule()
+        await future
+
+    def ack(self, event_id: str, handler: str):
+        self._lines.append(json.dumps({"op": "ack", "id": event_id, "handler": handler}) + "\n")
+        entry = self._pending.get(event_id)
+        if entry is not None:
+            entry[1].discard(handler)
+            if not entry[1]:
+                del self._pending[event_id]
+        self.acked += 1
+        self._schedule()
+
+    def discard(self, event_id: str):
+        """
+        Ack the event for every handler still waiting for it, it is never replayed.
+        """
+        entry = self._pending.get(event_id)
+        if entry is None:
+            return
+        for handler in sorted(entry[1]):
+            self.ack(event_id, handler)
+
+    def _schedule(self):
+        if len(self._lines) >= self.max_batch:
+            if not self._flush_queued:
+                self._flush_queued = True
+                self._start_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.flush_interval, self._start_flush)
+
+    def _start_flush(self):
+        task = asyncio.create_task(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    def _write(self, lines: List[str]):
+        self._open()
+        self._file.write("".join(lines))
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._log_lines += len(lines)
+
+    def _compact(self, pending: Dict[str, Tuple[str, Collection[str]]]):
+        # pending already includes the lines of the batch it replaces
+        self._close_file()
+        self._rewrite(pending)
+        self._open()
+
+    async def flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._flush_queued = False
+        if not self._lines:
+            return
+        lines, self._lines = self._lines, []
+        waiters, self._waiters = self._waiters, []
+        compact = self._log_lines + len(lines) >= max(self.compact_lines, 2 * len(self._pending))
+        if compact:
+            # Taken with the batch, nothing can be recorded or acked in between
+            pending = {event_id: (encoded, tuple(handlers)) for event_id, (encoded, handlers) in self._pending.items()}
+        try:
+            # One thread, batches and compactions reach the file in order
+            loop = asyncio.get_running_loop()
+            if compact:
+                await loop.run_in_executor(self._executor, self._compact, pending)
+                self.compactions += 1
+            else:
+                await loop.run_in_executor(self._executor, self._write, lines)
+            self.flushes += 1
+        except Exception as e:
+            logger.error(f"Write outbox {self.path} failed: {e}")
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_exception(e)
+            return
+        for waiter in waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "recorded": self.recorded,
+            "acked": self.acked,
+            "flushes": self.flushes,
+            "compactions": self.compactions,
+            "pending": len(self._pending),
+            "log_lines": self._log_lines,
+        }
+
+    async def aclose(self):
+        await self.flush()
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close_file)
+        self._executor.shutdown(wait=True)
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,156 @@
+from typing import Dict, List, Optional, Callable, Awaitable, Set
+from dataclasses import dataclass
+import asyncio
+import random
+import time
+
+from ..utils import logger, error_context
+
+
+@dataclass(frozen=True)
+class ReconcileConfig:
+    """
+    Limits applied to each adapter separately when querying expired orders.
+    """
+    concurrency: int = 4
+    # Provider queries per second, None for unlimited
+    rate_per_second: Optional[float] = 5.0
+    burst: int = 5
+    # Spread the queries of a batch over [0, jitter_seconds)
+    jitter_seconds: float = 1.0
+
+
+class TokenBucket:
+    def __init__(self, rate: Optional[float], capacity: int):
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+
+    async def acquire(self):
+        if not self.rate:
+            return
+
+        while True:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated_at) * self.rate
+            )
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _ReconcileLane:
+    """
+    Queue and workers reconciling the expired orders of one adapter.
+    """
+
+    def __init__(
+        self,
+        adapter: str,
+        handler: Callable[[str], Awaitable[None]],
+        config: ReconcileConfig,
+    ):
+        self.adapter = adapter
+        self._handler = handler
+        self._config = config
+        self._bucket = TokenBucket(config.rate_per_second, config.burst)
+        self._queue: asyncio.Queue[str] = asyncio.Queue()
+        # Order ids waiting for jitter or in queue, used to coalesce duplicates
+        self._queued: Set[str] = set()
+        self._workers: List[asyncio.Task] = []
+        self.submitted = 0
+        self.coalesced = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.in_flight = 0
+
+    def submit(self, order_ids: List[str]):
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._work()) for _ in range(max(self._config.concurrency, 1))
+            ]
+
+        loop = asyncio.get_running_loop()
+        for order_id in order_ids:
+            if order_id in self._queued:
+                self.coalesced += 1
+                continue
+            self._queued.add(order_id)
+            self.submitted += 1
+            if self._config.jitter_seconds > 0:
+                loop.call_later(
+                    random.uniform(0, self._config.jitter_seconds),
+                    self._queue.put_nowait,
+                    order_id,
+                )
+            else:
+                self._queue.put_nowait(order_id)
+
+    async def _work(self):
+        while True:
+            order_id = await self._queue.get()
+            self._queued.discard(order_id)
+            await self._bucket.acquire()
+            self.in_flight += 1
+            try:
+                await self._handler(order_id)
+                self.succeeded += 1
+            except Exception as e:
+                self.failed += 1
+                error_info = error_context()
+                logger.error(f"Reconcile order {order_id} failed: {e}, trace_error:{error_info}")
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+
+            if not self._queued and self.in_flight == 0:
+                logger.info(f"Reconcile {self.adapter} drained: {self.stats()}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "pending": len(self._queued),
+            "in_flight": self.in_flight,
+        }
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+
+class OrderReconciler:
+    """
+    Coalesce expired orders per adapter and query the provider with a bounded
+    concurrency, a token bucket rate limit and a jittered schedule, instead of
+    firing every query at once.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[str], Awaitable[None]],
+        config: Optional[ReconcileConfig] = None,
+    ):
+        self._handler = handler
+        self._config = config or ReconcileConfig()
+        self._lanes: Dict[str, _ReconcileLane] = {}
+
+    def submit(self, adapter: str, order_ids: List[str]):
+        lane = self._lanes.get(adapter)
+        if lane is None:
+            lane = self._lanes[adapter] = _ReconcileLane(adapter, self._handler, self._config)
+        lane.submit(order_ids)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {adapter: lane.stats() for adapter, lane in self._lanes.items()}
+
+    async def stop(self):
+        await asyncio.gather(*(lane.stop() for lane in self._lanes.values()))
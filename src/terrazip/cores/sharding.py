@@ -0,0 +1,162 @@
+from typing import Optional, Callable, Awaitable, Dict, Any
+import asyncio
+import fcntl
+import json
+import os
+import struct
+import tempfile
+import zlib
+
+from ..utils import logger, error_context, create_order_uuid, is_private_path
+
+_FRAME_HEADER = struct.Struct(">I")
+
+ForwardHandler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+async def _write_frame(writer: asyncio.StreamWriter, message: Dict[str, Any]):
+    data = json.dumps(message, separators=(",", ":")).encode("utf-8")
+    writer.write(_FRAME_HEADER.pack(len(data)) + data)
+    await writer.drain()
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    header = await reader.readexactly(_FRAME_HEADER.size)
+    (size,) = _FRAME_HEADER.unpack(header)
+    return json.loads(await reader.readexactly(size))
+
+
+class ShardRouter:
+    """
+    Split the orders of N worker processes on one host by order id.
+
+    Every order id is hashed to an owner worker, the owner keeps the order
+    state and its timeout scheduling. Requests arriving at another worker
+    (webhooks, capture redirects) are forwarded to the owner over a Unix socket.
+
+    Workers started by the same command (e.g. `uvicorn --workers N`) don't
+    know their index, so by default each worker claims the first free index
+    with a lock file in socket_dir.
+    socket_dir must be private to the user of the workers (owner only, 0700),
+    it is created so when missing, anything else is refused.
+    At most max_forwards forwards of a worker are in flight, the others wait
+    for a connection instead of overflowing the listen backlog of the owner.
+    """
+
+    def __init__(
+        self,
+        worker_count: int,
+        socket_dir: Optional[str] = None,
+        worker_index: Optional[int] = None,
+        forward_timeout: float = 30.0,
+        max_forwards: int = 64,
+    ):
+        if worker_count < 1:
+            raise ValueError(f"worker_count should be >= 1, but got {worker_count}")
+        self.worker_count = worker_count
+        # Per user default, another user cannot have created it first
+        self.socket_dir = socket_dir or os.path.join(tempfile.gettempdir(), f"terrazip-shards-{os.getuid()}")
+        self.worker_index = worker_index
+        self.forward_timeout = forward_timeout
+        self.max_forwards = max_forwards
+        self._forwards = asyncio.Semaphore(max_forwards)
+        self._lock_fd: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def socket_path(self, index: int) -> str:
+        return os.path.join(self.socket_dir, f"shard-{index}.sock")
+
+    def claim(self) -> int:
+        os.makedirs(self.socket_dir, mode=0o700, exist_ok=True)
+        if not is_private_path(self.socket_dir, is_dir=True):
+            raise RuntimeError(f"Shard directory {self.socket_dir} is not private (owner only, 0700)")
+        candidates = [self.worker_index] if self.worker_index is not None else range(self.worker_count)
+
+        for index in candidates:
+            fd = os.open(os.path.join(self.socket_dir, f"shard-{index}.lock"), os.O_CREAT | os.O_RDWR | os.O_NOFOLLOW, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            self._lock_fd = fd
+            self.worker_index = index
+            logger.info(f"Claim shard {index}/{self.worker_count}")
+            return index
+
+        raise RuntimeError(f"No free shard in {self.socket_dir} for {self.worker_count} workers")
+
+    def owner_of(self, order_id: str) -> int:
+        # crc32 is stable across processes, unlike the randomized builtin hash()
+        return zlib.crc32(order_id.encode("utf-8")) % self.worker_count
+
+    def is_owner(self, order_id: str) -> bool:
+        return self.owner_of(order_id) == self.worker_index
+
+    def create_order_id(self, prefix: str) -> str:
+        """
+        Create an order id owned by this worker, takes worker_count tries on average.
+        """
+        while True:
+            order_id = create_order_uuid(prefix)
+            if self.is_owner(order_id):
+                return order_id
+
+    async def start(self, handler: ForwardHandler):
+        if self.worker_index is None or self._lock_fd is None:
+            self.claim()
+
+        path = self.socket_path(self.worker_index)
+        # Stale socket of a dead worker, we own the lock so nobody else listens on it
+        if os.path.exists(path):
+            os.remove(path)
+
+        async def _serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+            try:
+                while True:
+                    try:
+                        message = await _read_frame(reader)
+                    except asyncio.IncompleteReadError:
+                        return
+                    try:
+                        reply = await handler(message)
+                    except Exception as e:
+                        error_info = error_context()
+                        logger.error(f"Handle forwarded {message.get('action')} failed: {error_info}")
+                        reply = {"ok": False, "error": str(e)}
+                    await _write_frame(writer, reply)
+            finally:
+                writer.close()
+
+        # Room for the in flight forwards of every other worker
+        backlog = max(100, self.max_forwards * self.worker_count)
+        self._server = await asyncio.start_unix_server(_serve, path=path, backlog=backlog)
+        logger.info(f"Shard {self.worker_index} listening on {path}")
+
+    async def forward(self, order_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        owner = self.owner_of(order_id)
+        logger.debug(f"Forward {message.get('action')} of {order_id} to shard {owner}")
+
+        async def _roundtrip():
+            async with self._forwards:
+                reader, writer = await asyncio.open_unix_connection(self.socket_path(owner))
+                try:
+                    await _write_frame(writer, message)
+                    return await _read_frame(reader)
+                finally:
+                    writer.close()
+
+        return await asyncio.wait_for(_roundtrip(), timeout=self.forward_timeout)
+
+    async def aclose(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+            path = self.socket_path(self.worker_index)
+            if os.path.exists(path):
+                os.remove(path)
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
@@ -0,0 +1,325 @@
+from typing import Dict, List, Optional, Collection
+from dataclasses import dataclass, replace
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import os
+import sqlite3
+
+from ..models import OrderSnapshot, OrderStatus, TERMINAL_STATUSES
+from ..utils import logger
+
+
+@dataclass(frozen=True, slots=True)
+class OrderRecord:
+    order_id: str
+    adapter: str
+    snapshot: OrderSnapshot
+    # Unix timestamp of the order timeout, survives restarts unlike monotonic time
+    deadline: float
+
+
+class OrderStore(ABC):
+    """
+    Persistence of open orders behind OrderEngine.
+    """
+
+    @abstractmethod
+    async def get(self, order_id: str) -> Optional[OrderRecord]: ...
+
+    @abstractmethod
+    async def put(self, record: OrderRecord) -> None: ...
+
+    @abstractmethod
+    async def compare_and_set(
+        self, order_id: str, expected: OrderStatus, snapshot: OrderSnapshot
+    ) -> bool:
+        """
+        Atomically replace the snapshot only if the stored status is still `expected`.
+        """
+
+    @abstractmethod
+    async def list_by_status(self, statuses: Collection[OrderStatus]) -> List[OrderRecord]: ...
+
+    @abstractmethod
+    async def list_due(self, deadline: float) -> List[OrderRecord]:
+        """
+        Orders whose deadline <= `deadline` and are not finished yet.
+        """
+
+    async def aclose(self) -> None: ...
+
+
+class InMemoryOrderStore(OrderStore):
+    """
+    Process local store, orders are lost on restart.
+    """
+
+    def __init__(self):
+        self._records: Dict[str, OrderRecord] = {}
+
+    async def get(self, order_id: str) -> Optional[OrderRecord]:
+        return self._records.get(order_id)
+
+    async def put(self, record: OrderRecord) -> None:
+        self._records[record.order_id] = record
+
+    async def compare_and_set(
+        self, order_id: str, expected: OrderStatus, snapshot: OrderSnapshot
+    ) -> bool:
+        # No await between check and set, atomic on the event loop
+        record = self._records.get(order_id)
+        if record is None or record.snapshot.status != expected:
+            return False
+        self._records[order_id] = replace(record, snapshot=snapshot)
+        return True
+
+    async def list_by_status(self, statuses: Collection[OrderStatus]) -> List[OrderRecord]:
+        return [r for r in self._records.values() if r.snapshot.status in statuses]
+
+    async def list_due(self, deadline: float) -> List[OrderRecord]:
+        return [
+            r
+            for r in self._records.values()
+            if r.deadline <= deadline and r.snapshot.status not in TERMINAL_STATUSES
+        ]
+
+
+_CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS orders (
+    order_id TEXT PRIMARY KEY,
+    adapter TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payment_link TEXT NOT NULL,
+    signature TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    raw_response TEXT,
+    deadline REAL NOT NULL,
+    provider_order_id TEXT NOT NULL DEFAULT ''
+)
+"""
+# Tables created before provider_order_id existed
+_ADD_PROVIDER_ORDER_ID = "ALTER TABLE orders ADD COLUMN provider_order_id TEXT NOT NULL DEFAULT ''"
+_CREATE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_deadline ON orders (deadline)",
+)
+_COLUMNS = "order_id, adapter, status, payment_link, signature, created_at, raw_response, deadline, provider_order_id"
+_UPSERT = f"INSERT OR REPLACE INTO orders ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+_SELECT_ONE = f"SELECT {_COLUMNS} FROM orders WHERE order_id = ?"
+_COMPARE_AND_SET = (
+    "UPDATE orders SET status = ?, payment_link = ?, signature = ?, created_at = ?, raw_response = ?, "
+    "provider_order_id = ? WHERE order_id = ? AND status = ?"
+)
+
+
+class SqliteOrderStore(OrderStore):
+    """
+    SQLite (WAL) store shared by restarts and by every worker process on the host.
+
+    All statements run on one dedicated thread with constant SQL strings, so
+    sqlite3 reuses its prepared statements. put() is write-behind: records are
+    buffered and flushed with executemany in one transaction every
+    flush_interval seconds or max_batch records; reads and compare_and_set
+    flush first, a background flush in progress included, so callers always
+    see their own writes. A failed background
+    flush keeps its records and is retried after retry_delay seconds.
+    """
+
+    def __init__(
+        self,
+        path: str = "terrazip_orders.db",
+        flush_interval: float = 0.05,
+        max_batch: int = 256,
+        retry_delay: float = 1.0,
+    ):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.retry_delay = retry_delay
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="terrazip-sqlite")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pending: Dict[str, OrderRecord] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory)
+            conn = sqlite3.connect(self.path, isolation_level=None, cached_statements=64)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.execute(_CREATE_TABLE)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(orders)")}
+            if "provider_order_id" not in columns:
+                conn.execute(_ADD_PROVIDER_ORDER_ID)
+            for statement in _CREATE_INDEXES:
+                conn.execute(statement)
+            self._conn = conn
+            logger.info(f"Open sqlite order store: {self.path}")
+        return self._conn
+
+    @staticmethod
+    def _to_row(record: OrderRecord) -> tuple:
+        snapshot = record.snapshot
+        return (
+            record.order_id,
+            record.adapter,
+            snapshot.status.value,
+            snapshot.payment_link,
+            snapshot.signature,
+            snapshot.created_at,
+            json.dumps(snapshot.raw_response) if snapshot.raw_response is not None else None,
+            record.deadline,
+            snapshot.provider_order_id,
+        )
+
+    @staticmethod
+    def _from_row(row: tuple) -> OrderRecord:
+        order_id, adapter, status, payment_link, signature, created_at, raw_response, deadline, provider_order_id = row
+        return OrderRecord(
+            order_id=order_id,
+            adapter=adapter,
+            snapshot=OrderSnapshot(
+                order_id=order_id,
+                status=OrderStatus(status),
+                payment_link=payment_link,
+                signature=signature,
+                created_at=created_at,
+                provider_order_id=provider_order_id,
+                raw_response=json.loads(raw_response) if raw_response is not None else None,
+            ),
+            deadline=deadline,
+        )
+
+    def _write_batch(self, rows: List[tuple]):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(_UPSERT, rows)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def flush(self):
+        task = self._flush_task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            # Its batch is out of _pending but not committed yet, wait for it and
+            # raise its error rather than run on without those records
+            await asyncio.shield(task)
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        try:
+            await self._run(self._write_batch, [self._to_row(r) for r in batch.values()])
+        except Exception:
+            # Keep the records for the next flush, newer puts win
+            self._pending = {**batch, **self._pending}
+            raise
+
+    def _schedule_flush(self):
+        self._flush_handle = None
+        self._flush_task = asyncio.create_task(self.flush())
+
+        def _done(done: asyncio.Task):
+            if done.cancelled() or not done.exception():
+                return
+            # Nobody awaits this flush, its records are back in _pending
+            logger.error(f"Flush sqlite order store failed: {done.exception()!r}, retry in {self.retry_delay}s")
+            if self._pending and self._flush_handle is None:
+                self._flush_handle = asyncio.get_running_loop().call_later(self.retry_delay, self._schedule_flush)
+
+        self._flush_task.add_done_callback(_done)
+
+    async def get(self, order_id: str) -> Optional[OrderRecord]:
+        if order_id in self._pending:
+            return self._pending[order_id]
+
+        def _select():
+            row = self._connect().execute(_SELECT_ONE, (order_id,)).fetchone()
+            return self._from_row(row) if row else None
+
+        return await self._run(_select)
+
+    async def put(self, record: OrderRecord) -> None:
+        self._pending[record.order_id] = record
+        if len(self._pending) >= self.max_batch:
+            await self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                self.flush_interval, self._schedule_flush
+            )
+
+    async def compare_and_set(
+        self, order_id: str, expected: OrderStatus, snapshot: OrderSnapshot
+    ) -> bool:
+        await self.flush()
+
+        def _update():
+            cursor = self._connect().execute(
+                _COMPARE_AND_SET,
+                (
+                    snapshot.status.value,
+                    snapshot.payment_link,
+                    snapshot.signature,
+                    snapshot.created_at,
+                    json.dumps(snapshot.raw_response) if snapshot.raw_response is not None else None,
+                    snapshot.provider_order_id,
+                    order_id,
+                    expected.value,
+                ),
+            )
+            return cursor.rowcount == 1
+
+        return await self._run(_update)
+
+    async def list_by_status(self, statuses: Collection[OrderStatus]) -> List[OrderRecord]:
+        await self.flush()
+        values = [status.value for status in statuses]
+        if not values:
+            return []
+
+        def _select():
+            placeholders = ", ".join("?" for _ in values)
+            rows = self._connect().execute(
+                f"SELECT {_COLUMNS} FROM orders WHERE status IN ({placeholders})", values
+            ).fetchall()
+            return [self._from_row(row) for row in rows]
+
+        return await self._run(_select)
+
+    async def list_due(self, deadline: float) -> List[OrderRecord]:
+        await self.flush()
+        terminal = [status.value for status in TERMINAL_STATUSES]
+
+        def _select():
+            placeholders = ", ".join("?" for _ in terminal)
+            rows = self._connect().execute(
+                f"SELECT {_COLUMNS} FROM orders WHERE deadline <= ? AND status NOT IN ({placeholders})",
+                (deadline, *terminal),
+            ).fetchall()
+            return [self._from_row(row) for row in rows]
+
+        return await self._run(_select)
+
+    async def aclose(self) -> None:
+        await self.flush()
+
+        def _close():
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+        await self._run(_close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,114 @@
+from typing import Optional, Dict, Set, Collection
+import asyncio
+
+from .engine import AsyncEventBus, OrderStatusChangedEvent
+from ..utils import logger
+
+
+def status_message(event: OrderStatusChangedEvent) -> dict:
+    return {
+        "order_id": event.order_id,
+        "status": event.snapshot.status.value,
+        "old_status": event.old_status.value,
+        "occurred_at": event.occurred_at.isoformat(),
+    }
+
+
+class StatusSubscription:
+    """
+    Bounded queue of the status messages of one stream client.
+    """
+
+    __slots__ = ("order_ids", "_queue", "closed")
+
+    def __init__(self, order_ids: Optional[Set[str]], maxsize: int):
+        # None streams every order
+        self.order_ids = order_ids
+        self._queue: asyncio.Queue[Optional[dict]] = asyncio.Queue(maxsize=maxsize)
+        self.closed = False
+
+    def offer(self, message: dict) -> bool:
+        try:
+            self._queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        # Make room for the end marker, a closed client doesn't need the backlog
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """
+        Next message, None on timeout or once the subscription is closed.
+        """
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class OrderStatusBroadcaster:
+    """
+    Fan out OrderStatusChangedEvent of the event bus to stream clients.
+
+    Every client has its own bounded queue. publishing never waits: a client
+    whose queue is full is too slow and gets evicted (its stream ends, it
+    can reconnect), so one slow reader can't hold back the others.
+    """
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._all: Set[StatusSubscription] = set()
+        self._by_order: Dict[str, Set[StatusSubscription]] = {}
+        self.published = 0
+        self.evicted = 0
+
+    def attach(self, event_bus: AsyncEventBus):
+        event_bus.subscribe(OrderStatusChangedEvent, self.publish)
+
+    def subscribe(self, order_ids: Optional[Collection[str]] = None) -> StatusSubscription:
+        subscription = StatusSubscription(set(order_ids) if order_ids else None, self.queue_size)
+        if subscription.order_ids is None:
+            self._all.add(subscription)
+        else:
+            for order_id in subscription.order_ids:
+                self._by_order.setdefault(order_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: StatusSubscription):
+        subscription.close()
+        if subscription.order_ids is None:
+            self._all.discard(subscription)
+            return
+        for order_id in subscription.order_ids:
+            subscribers = self._by_order.get(order_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._by_order[order_id]
+
+    async def publish(self, event: OrderStatusChangedEvent):
+        message = status_message(event)
+        self.published += 1
+        for subscription in (*self._all, *self._by_order.get(event.order_id, ())):
+            if not subscription.offer(message):
+                self.evicted += 1
+                logger.warning(f"Evict slow status stream subscriber, queue size {self.queue_size}")
+                self.unsubscribe(subscription)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._all) + len({s for subs in self._by_order.values() for s in subs}),
+            "published": self.published,
+            "evicted": self.evicted,
+        }
+
+    def close(self):
+        for subscription in (*self._all, *{s for subs in self._by_order.values() for s in subs}):
+            self.unsubscribe(subscription)
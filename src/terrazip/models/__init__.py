@@ -1,6 +1,6 @@
 from .adapter import AdapterDriver
 from .config import Environment, GatewayConfig, BaseGateway, ServerGateway
-from .order import OrderStatus, OrderSnapshot, OrderCreatorScheme
+from .order import OrderStatus, OrderSnapshot, OrderCreatorScheme, TERMINAL_STATUSES
 
 __all__ = [
     'AdapterDriver',
@@ -11,4 +11,5 @@ __all__ = [
     'OrderStatus',
     'OrderSnapshot',
     'OrderCreatorScheme',
+    'TERMINAL_STATUSES',
 ]
\ No newline at end of file
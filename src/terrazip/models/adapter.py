@@ -1,27 +1,75 @@
 from abc import ABC, abstractmethod
+from typing import Optional
+import functools
+import inspect
 
 from .order import OrderSnapshot, OrderCreatorScheme
+from ..utils.signatures import ParsedPayload
+from ..utils.tracing import start_span, tracing_enabled
+
+# Driver methods wrapped in a tracing span by every subclass
+TRACED_METHODS = ("init", "create_order", "capture_order", "verify_webhook", "fetch_order_status")
+
+
+def _traced_driver_method(func, span_name: str):
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        if not tracing_enabled():
+            return await func(self, *args, **kwargs)
+        with start_span(span_name) as span:
+            for value in (*kwargs.values(), *args):
+                order_id = getattr(value, "order_id", None)
+                if order_id:
+                    span.set_attribute("order.id", order_id)
+                    break
+            return await func(self, *args, **kwargs)
+
+    wrapper.__traced__ = True
+    return wrapper
 
 
 class AdapterDriver(ABC):
     is_support_capture_order = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for name in TRACED_METHODS:
+            method = cls.__dict__.get(name)
+            if inspect.iscoroutinefunction(method) and not getattr(method, "__traced__", False):
+                setattr(cls, name, _traced_driver_method(method, f"{cls.__name__}.{name}"))
     
     async def init(self) -> None: ...
 
+    async def aclose(self) -> None: ...
+
     @abstractmethod
     async def create_order(self, order: OrderCreatorScheme) -> OrderSnapshot: ...
 
     @abstractmethod
     async def capture_order(self, order_snapshot: OrderSnapshot) -> OrderSnapshot: ...
 
+    # The webhook methods get the body parsed once by the caller as payload,
+    # they parse it themselves when it is None
     @abstractmethod
     async def verify_webhook(
-        self, header: dict, body: bytes, order_snapshot: OrderSnapshot
+        self,
+        header: dict,
+        body: bytes,
+        order_snapshot: OrderSnapshot,
+        payload: Optional[ParsedPayload] = None,
     ) -> OrderSnapshot: ...
 
     @classmethod
     @abstractmethod
-    def extract_order_id(cls, header: dict, body: bytes) -> str: ...
+    def extract_order_id(cls, header: dict, body: bytes, payload: Optional[ParsedPayload] = None) -> str: ...
+
+    @classmethod
+    def extract_event_id(cls, header: dict, body: bytes, payload: Optional[ParsedPayload] = None) -> Optional[str]:
+        """
+        Provider id of a webhook delivery, the same for its redeliveries.
+        None disables deduplication for this adapter.
+        """
+        return None
 
     @abstractmethod
     async def fetch_order_status(self, order_snapshot: OrderSnapshot) -> OrderSnapshot: ...
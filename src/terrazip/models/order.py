@@ -17,13 +17,20 @@ class OrderStatus(str, Enum):
     CANCEL = 'CANCEL'
 
 
-@dataclass
+# Statuses after which an order never changes anymore
+TERMINAL_STATUSES = frozenset({OrderStatus.PAID, OrderStatus.FAILED, OrderStatus.CANCEL})
+
+
+@dataclass(slots=True)
 class OrderSnapshot:
     order_id: str = field(default="")
     status: OrderStatus = field(default=OrderStatus.NEW)
     payment_link: str = field(default="")
     signature: str = field(default="")
     created_at: str = field(default="")
+    # Order id on the provider side (e.g. PayPal order id), instead of keeping its whole response
+    provider_order_id: str = field(default="")
+    # Deprecated, only set by snapshots persisted before provider_order_id existed
     raw_response: Dict[str, Any] | None = None
 
     def replace(self, **kwargs):
@@ -1,27 +1,65 @@
-from .loggers import logger, setup_logger
+from .loggers import logger, setup_logger, redact, JsonLinesSink, log_sink_stats
 from .tracebackers import error_context
-from .httpxs import AsyncRequest
+from .httpxs import AsyncRequest, PoolConfig
 from .signatures import (
     normalize_rsa2_public_key,
     normalize_rsa2_private_key,
     process_payload_to_json,
+    ParsedPayload,
+    RSA2Signer,
+    SignExecutor,
     sign_with_rsa2,
     verify_sign_rsa2,
 )
 from . import exceptions
-from .facilitors import is_currency_support, create_order_uuid
+from .facilitors import is_currency_support, create_order_uuid, is_private_path
+from .singleflight import SingleFlight
+from .metrics import enable_metrics, MetricsRegistry, Counter, Gauge, Histogram, REGISTRY as METRICS
+from .tracing import (
+    configure_tracing,
+    start_span,
+    traced,
+    Span,
+    SpanContext,
+    SpanExporter,
+    InMemorySpanExporter,
+    FileSpanExporter,
+)
 
 __all__ = [
     "logger",
     "setup_logger",
+    "redact",
+    "JsonLinesSink",
+    "log_sink_stats",
     "error_context",
     "AsyncRequest",
+    "PoolConfig",
     "exceptions",
     "normalize_rsa2_public_key",
     "normalize_rsa2_private_key",
     "process_payload_to_json",
+    "ParsedPayload",
+    "RSA2Signer",
+    "SignExecutor",
     "sign_with_rsa2",
     "verify_sign_rsa2",
     "is_currency_support",
     "create_order_uuid",
+    "is_private_path",
+    "SingleFlight",
+    "enable_metrics",
+    "MetricsRegistry",
+    "Counter",
+    "Gauge",
+    "Histogram",
+    "METRICS",
+    "configure_tracing",
+    "start_span",
+    "traced",
+    "Span",
+    "SpanContext",
+    "SpanExporter",
+    "InMemorySpanExporter",
+    "FileSpanExporter",
 ]
@@ -1,4 +1,6 @@
 from typing import Collection
+import os
+import stat
 import uuid
 
 def is_currency_support(input_currency: str, support_currency: Collection[str]) -> bool:
@@ -15,4 +17,21 @@ def create_order_uuid(prefix: str) -> str:
     if not prefix:
         raise ValueError("prefix must not be empty")
 
-    return f"{prefix}_{uuid.uuid4().hex}"
\ No newline at end of file
+    return f"{prefix}_{uuid.uuid4().hex}"
+
+
+def is_private_path(path: str, is_dir: bool) -> bool:
+    """
+    True when path is a real directory / file owned by the user of this
+    process, with no group or other permission: nobody else can have planted
+    or changed it.
+    """
+    if not hasattr(os, "getuid"):
+        # No ownership to check (Windows)
+        return False
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    kind_ok = stat.S_ISDIR(st.st_mode) if is_dir else stat.S_ISREG(st.st_mode)
+    return kind_ok and st.st_uid == os.getuid() and not st.st_mode & 0o077
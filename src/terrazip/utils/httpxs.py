@@ -1,5 +1,8 @@
 from typing import Tuple, Optional, Dict, Any, Union
+from dataclasses import dataclass
 from decimal import Decimal
+import importlib.util
+import time
 
 import httpx
 from tenacity import (
@@ -13,19 +16,79 @@ from tenacity import (
 from .loggers import logger
 from .exceptions import *
 from .tracebackers import error_context
+from .metrics import REGISTRY, PROVIDER_REQUEST_SECONDS
+from .tracing import start_span
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    """
+    Connection pool settings of the long-lived client owned by AsyncRequest.
+
+    Every adapter driver owns its own AsyncRequest and only talks to its own
+    provider host, so these limits effectively apply per host.
+    """
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = False
+
 
 class AsyncRequest:
     def __init__(
         self,
         timeout: Decimal = 10.0,
-        retry_codes: Tuple[int, ...] = (500, 502, 503, 504)
+        retry_codes: Tuple[int, ...] = (500, 502, 503, 504),
+        pool: Optional[PoolConfig] = None,
+        name: str = "",
     ):
         """
             :param timeout: Default request timeout in seconds.
+            :param pool: Connection pool settings, defaults to PoolConfig().
+            :param name: Adapter name used as metrics label.
         """
+        self.name = name
         self.timeout = timeout
         self.retry_codes = retry_codes
         # Standard HTTP status codes that warrant a retry (usually transient server issues)
+        self.pool = pool or PoolConfig()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Lazily create the shared client, so connections (TCP + TLS) are reused across requests.
+        """
+        if self._client is None or self._client.is_closed:
+            http2 = self.pool.http2
+            if http2 and importlib.util.find_spec("h2") is None:
+                logger.warning("HTTP/2 requested but 'h2' is not installed, fallback to HTTP/1.1")
+                http2 = False
+
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=http2,
+                limits=httpx.Limits(
+                    max_connections=self.pool.max_connections,
+                    max_keepalive_connections=self.pool.max_keepalive_connections,
+                    keepalive_expiry=self.pool.keepalive_expiry,
+                ),
+            )
+        return self._client
+
+    async def aclose(self):
+        """
+        Close the shared client and release pooled connections.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def __aenter__(self) -> "AsyncRequest":
+        self._get_client()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
         
     @retry(
         # Stops after the specified number of attempts (default 3)
@@ -54,6 +117,7 @@ class AsyncRequest:
         data: Optional[Any] = None,
         json: Optional[Any] = None,
         timeout: Optional[float] = None,
+        endpoint: Optional[str] = None,
         **kwargs
     ) -> httpx.Response:
         """
@@ -61,43 +125,67 @@ class AsyncRequest:
 
         :param method: HTTP method (GET, POST, etc.)
         :param url: Target URL
+        :param endpoint: Endpoint name used as metrics label, e.g. create_order
         :param kwargs: Additional arguments passed to httpx.request (headers, params, json, etc.)
         :return: httpx.Response object
         :raises: httpx.HTTPStatusError for 4xx/5xx errors not handled by retry
         """
         # Allow overriding the default timeout per request
 
-        async with httpx.AsyncClient(timeout=timeout or self.timeout) as client:
-            logger.debug(f"Sending {method} request to {url}")
-            response = await client.request(
-                            method=method,
-                            url=url,
-                            headers=headers,
-                            params=params,
-                            data=data,
-                            json=json,
-                            **kwargs
-                        )
-
-            # If the status code is NOT in the retry list (500, 502, 504),
-            # we check if it's an error (like 400 or 403) and raise immediately.
-            if response.status_code not in self.retry_codes:
-                return response
+        client = self._get_client()
+        logger.debug("Sending {} request to {}", method, url)
+        started_at = time.perf_counter() if REGISTRY.enabled else 0.0
+        with start_span(f"HTTP {method}") as span:
+            if span is not None:
+                span.attributes.update({
+                    "http.method": method,
+                    "http.url": str(httpx.URL(url).copy_with(query=None)),
+                    "terrazip.adapter": self.name,
+                    "terrazip.endpoint": endpoint or "other",
+                })
             try:
-                response.raise_for_status()
-                return response
-
-            except Exception as e:
-                errors = error_context()
-                logger.error(
-                    f"AsyncRequest failed for {e}, please check args: method: {method} | url: {url}",
-                    f"Error context: {errors}",
-                )
-                raise RequestError("AysncRequest error")
-
-            finally:
-                logger.debug(f"Return finally: {response}")
-                return response
+                response = await client.request(
+                                method=method,
+                                url=url,
+                                headers=headers,
+                                params=params,
+                                data=data,
+                                json=json,
+                                timeout=timeout or self.timeout,
+                                **kwargs
+                            )
+            except Exception:
+                if started_at:
+                    PROVIDER_REQUEST_SECONDS.observe(
+                        time.perf_counter() - started_at, self.name, endpoint or "other", method, "error"
+                    )
+                raise
+            if span is not None:
+                span.set_attribute("http.status_code", response.status_code)
+        if started_at:
+            PROVIDER_REQUEST_SECONDS.observe(
+                time.perf_counter() - started_at, self.name, endpoint or "other", method, str(response.status_code)
+            )
+
+        # If the status code is NOT in the retry list (500, 502, 504),
+        # we check if it's an error (like 400 or 403) and raise immediately.
+        if response.status_code not in self.retry_codes:
+            return response
+        try:
+            response.raise_for_status()
+            return response
+
+        except Exception as e:
+            errors = error_context()
+            logger.error(
+                f"AsyncRequest failed for {e}, please check args: method: {method} | url: {url}",
+                f"Error context: {errors}",
+            )
+            raise RequestError("AysncRequest error")
+
+        finally:
+            logger.debug("Return finally: {}", response)
+            return response
 
     async def get(self, url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None, **kwargs):
             return await self._request("GET", url, params=params, headers=headers, **kwargs)
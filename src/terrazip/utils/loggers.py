@@ -1,36 +1,177 @@
+from typing import Any, Dict, List, Literal, TextIO
+from functools import partial
+import json
 import os
+import queue
+import re
 import sys
+import threading
+import traceback
 import loguru
 
 # 1. It is recommended to keep this name consistent with your SDK package name
-SDK_NAME = "src"
+SDK_NAME = __name__.split(".")[0]
 
 # 2. Disable log output by default to avoid interfering with the end-user's console
 loguru.logger.disable(SDK_NAME)
 
 
-def setup_logger(level="INFO", log_to_file=False, log_path="logs/sdk.log"):
+_STOP = object()
+
+
+class JsonLinesSink:
+    """
+    Non-blocking loguru sink writing one JSON object per record.
+
+    The logging thread only puts the record in a bounded queue, records
+    arriving while it is full are dropped and counted. A background thread
+    serializes and writes them in batches, one write and flush per batch.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO,
+        buffer_size: int = 10000,
+        batch_size: int = 256,
+        close_stream: bool = False,
+    ):
+        self._stream = stream
+        self._close_stream = close_stream
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=buffer_size)
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="terrazip-log-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, message):
+        # loguru passes the formatted str, its record carries the fields
+        try:
+            self._queue.put_nowait(message.record)
+        except queue.Full:
+            self.dropped += 1
+
+    @staticmethod
+    def _to_json(record: Dict[str, Any]) -> str:
+        extra = {k: v for k, v in record["extra"].items() if k != "name"}
+        entry = {
+            "time": record["time"].isoformat(),
+            "level": record["level"].name,
+            "logger": record["name"],
+            "function": record["function"],
+            "line": record["line"],
+            "message": record["message"],
+        }
+        if extra:
+            entry["extra"] = extra
+        if record["exception"] is not None:
+            entry["exception"] = "".join(traceback.format_exception(*record["exception"]))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            self._stream.write("".join(self._to_json(record) + "\n" for record in batch))
+            self._stream.flush()
+            self.written += len(batch)
+            self.batches += 1
+        except Exception:
+            # Nowhere to log it, count it
+            self.errors += 1
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            record = self._queue.get()
+            if record is _STOP:
+                break
+            batch = [record]
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            self._write(batch)
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Write what is queued and stop the writer, called by loguru.logger.remove().
+        """
+        if not self._thread.is_alive():
+            return
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        if self._close_stream:
+            self._stream.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "errors": self.errors,
+        }
+
+
+# Sinks added by the last setup_logger in json mode, by destination
+_json_sinks: Dict[str, JsonLinesSink] = {}
+
+
+def log_sink_stats() -> Dict[str, Dict[str, int]]:
+    """
+    Counters of the JSON lines sinks, e.g. {"stderr": {"dropped": 0, ...}}.
+    """
+    return {name: sink.stats() for name, sink in _json_sinks.items()}
+
+
+def setup_logger(
+    level="INFO",
+    log_to_file=False,
+    log_path="logs/sdk.log",
+    log_format: Literal["text", "json"] = "text",
+    buffer_size: int = 10000,
+    batch_size: int = 256,
+):
     """
     User calls this function to configure and enable SDK logging.
 
     :param level: Logging level ("DEBUG", "INFO", "WARNING", "ERROR")
     :param log_to_file: Boolean, whether to save logs to a local file
     :param log_path: File path for logs, defaults to 'logs/sdk.log' in the workspace
+    :param log_format: "text", or "json" for JSON lines written by a background
+        thread (JsonLinesSink); the json log file is appended to, not rotated
+    :param buffer_size: json only, records queued before new ones are dropped
+    :param batch_size: json only, max records per write
     """
     # Remove all default loguru handlers to prevent duplicate or unwanted formatting
+    # (it also stops the writers of previous json sinks)
     loguru.logger.remove()
+    _json_sinks.clear()
 
     # Re-enable logging for this specific SDK module
     loguru.logger.enable(SDK_NAME)
 
-    # Configure console (stdout/stderr) output
-    loguru.logger.add(
-        sys.stderr,
-        backtrace=False,
-        diagnose=True,
-        level=level.upper(),
-        format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-    )
+    if log_format == "json":
+        _json_sinks["stderr"] = JsonLinesSink(sys.stderr, buffer_size=buffer_size, batch_size=batch_size)
+        loguru.logger.add(_json_sinks["stderr"], level=level.upper(), format="{message}")
+    else:
+        # Configure console (stdout/stderr) output
+        loguru.logger.add(
+            sys.stderr,
+            backtrace=False,
+            diagnose=True,
+            level=level.upper(),
+            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
+        )
 
     # Configure file logging if requested
     if log_to_file:
@@ -39,16 +180,118 @@ def setup_logger(level="INFO", log_to_file=False, log_path="logs/sdk.log"):
         if log_dir and not os.path.exists(log_dir):
             os.makedirs(log_dir)
 
-        loguru.logger.add(
-            log_path,
-            rotation="10 MB",  # Rotate file when it reaches 10MB
-            retention="1 week",  # Keep logs for 7 days
-            level=level,
-            encoding="utf-8",
-            enqueue=True,  # Ensure thread-safety for multi-threaded apps
-        )
+        if log_format == "json":
+            _json_sinks[log_path] = JsonLinesSink(
+                open(log_path, "a", encoding="utf-8"),
+                buffer_size=buffer_size,
+                batch_size=batch_size,
+                close_stream=True,
+            )
+            loguru.logger.add(_json_sinks[log_path], level=level.upper(), format="{message}")
+        else:
+            loguru.logger.add(
+                log_path,
+                rotation="10 MB",  # Rotate file when it reaches 10MB
+                retention="1 week",  # Keep logs for 7 days
+                level=level,
+                encoding="utf-8",
+                enqueue=True,  # Ensure thread-safety for multi-threaded apps
+            )
+
+
+# Keys whose values never reach a log line, compared lowercased
+SECRET_KEYS = frozenset({
+    "authorization",
+    "access_token",
+    "refresh_token",
+    "client_secret",
+    "private_key",
+    "app_private_key",
+    "password",
+    "sign",
+    "signature",
+    "paypal-transmission-sig",
+})
+REDACTED = "***"
+_SECRET_QUERY_RE = re.compile(
+    r"\b(" + "|".join(re.escape(key) for key in sorted(SECRET_KEYS)) + r")=(['\"]?)[^&\s'\"]+",
+    re.IGNORECASE,
+)
+
+
+def redact(value: Any) -> Any:
+    """
+    Copy of value with the secrets masked: values of SECRET_KEYS in dicts
+    (recursively) and `key=value` pairs in strings, e.g. signed paylinks.
+    Objects other than containers and numbers come back as masked strings.
+    """
+    if isinstance(value, str):
+        return _SECRET_QUERY_RE.sub(lambda m: f"{m.group(1)}={m.group(2)}{REDACTED}", value)
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if isinstance(k, str) and k.lower() in SECRET_KEYS else redact(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        masked = [redact(v) for v in value]
+        return masked if isinstance(value, list) else tuple(masked)
+    if value is None or isinstance(value, (int, float)):
+        return value
+    # Other objects (snapshots, responses...) as their str, e.g. `signature='...'`
+    return redact(str(value))
+
+
+class LazyLogger:
+    """
+    The SDK logger: positional arguments fill the `{}` of the message and are
+    redacted and formatted only when a handler takes the record. With the SDK
+    disabled or the level filtered out, a call costs a few attribute lookups,
+    no str() of payloads, headers or snapshots.
+
+        logger.debug("Create order {} payload: {}", order_id, payload)
+
+    Messages without arguments are logged as is, like loguru (f-strings still
+    work, but are built before the level check). Anything else, e.g. opt() or
+    bind(), is loguru's.
+    """
+
+    def __init__(self, bound_logger):
+        self._logger = bound_logger
+        # depth=2: report the caller's function and line, not this class
+        self._plain = bound_logger.opt(depth=2)
+        self._lazy = bound_logger.opt(lazy=True, depth=2)
+
+    def __getattr__(self, name: str):
+        return getattr(self._logger, name)
+
+    def _log(self, level: str, message: str, args: tuple):
+        if args:
+            self._lazy.log(level, message, *[partial(redact, arg) for arg in args])
+        else:
+            self._plain.log(level, message)
+
+    def trace(self, message: str, *args: Any):
+        self._log("TRACE", message, args)
+
+    def debug(self, message: str, *args: Any):
+        self._log("DEBUG", message, args)
+
+    def info(self, message: str, *args: Any):
+        self._log("INFO", message, args)
+
+    def success(self, message: str, *args: Any):
+        self._log("SUCCESS", message, args)
+
+    def warning(self, message: str, *args: Any):
+        self._log("WARNING", message, args)
+
+    def error(self, message: str, *args: Any):
+        self._log("ERROR", message, args)
+
+    def critical(self, message: str, *args: Any):
+        self._log("CRITICAL", message, args)
 
 
 # 3. Export the bound logger instance
-# Internal SDK modules should use: from .logger_config import sdk_logger
-logger = loguru.logger.bind(name=SDK_NAME)
+# Internal SDK modules should use: from ..utils import logger
+logger = LazyLogger(loguru.logger.bind(name=SDK_NAME))
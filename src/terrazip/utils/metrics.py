@@ -0,0 +1,204 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from abc import ABC, abstractmethod
+import bisect
+import math
+import threading
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class MetricsRegistry:
+    """
+    In-process metrics rendered in the Prometheus text format, no server or client library.
+
+    Disabled by default: every update returns after one attribute check,
+    and call sites check `enabled` before timing anything.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._metrics: Dict[str, "_Metric"] = {}
+
+    def register(self, metric: "_Metric") -> "_Metric":
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.reset()
+
+
+REGISTRY = MetricsRegistry()
+
+
+def enable_metrics(enabled: bool = True):
+    REGISTRY.enabled = enabled
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class _Metric(ABC):
+    kind = "untyped"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        registry: Optional[MetricsRegistry] = REGISTRY,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._registry = registry or REGISTRY
+        # Updates may come from executor threads too
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+        if registry is not None:
+            registry.register(self)
+
+    @abstractmethod
+    def samples(self) -> List[str]: ...
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        if not self._registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in values]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, *labels: str):
+        if not self._registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = float(value)
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        if not self._registry.enabled:
+            return
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def dec(self, *labels: str, amount: float = 1.0):
+        self.inc(*labels, amount=-amount)
+
+    def set_function(self, func: Callable[[], float], *labels: str):
+        """
+        Compute the value when rendering, nothing to update on the hot path.
+        """
+        self._functions[labels] = func
+
+    def unset_function(self, func: Callable[[], float], *labels: str):
+        """
+        Drop func, unless another one was set for labels since.
+        """
+        if self._functions.get(labels) == func:
+            del self._functions[labels]
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+        for labels, func in list(self._functions.items()):
+            try:
+                values[labels] = float(func())
+            except Exception:
+                continue
+        return [f"{self.name}{_format_labels(self.label_names, k)} {_format_value(v)}" for k, v in values.items()]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, *labels: str):
+        if not self._registry.enabled:
+            return
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # [bucket counts (non cumulative)..., sum]
+                state = self._values[labels] = [0] * len(self.buckets) + [0.0]
+            state[bisect.bisect_left(self.buckets, value)] += 1
+            state[-1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(k, list(v)) for k, v in self._values.items()]
+        lines = []
+        for labels, state in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+PROVIDER_REQUEST_SECONDS = Histogram(
+    "terrazip_provider_request_seconds",
+    "Latency of the HTTP calls to the payment providers.",
+    labels=("adapter", "endpoint", "method", "status"),
+)
+ORDER_TRANSITIONS = Counter(
+    "terrazip_order_status_transitions_total",
+    "Order status transitions.",
+    labels=("adapter", "from_status", "to_status"),
+)
+OPEN_ORDERS = Gauge(
+    "terrazip_open_orders",
+    "Orders tracked by the order engine and not finished yet.",
+)
+ACTIVE_DEADLINES = Gauge(
+    "terrazip_order_deadlines",
+    "Order timeouts being watched by the deadline scheduler.",
+)
@@ -0,0 +1,85 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+import asyncio
+import time
+
+T = TypeVar("T")
+
+# Result handed to the followers of a cancelled leader
+_LEADER_CANCELLED = object()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls with the same key into one execution.
+
+    Callers arriving while a call is in flight await the same result, and
+    callers arriving within result_ttl seconds after it completed get the
+    cached result without a new execution.
+    When the leader is cancelled, its followers are not: one of them takes
+    over and runs the call.
+    """
+
+    def __init__(self, result_ttl: float = 1.0, maxsize: int = 10_000):
+        self.result_ttl = result_ttl
+        self.maxsize = maxsize
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # key -> (expires_at, result)
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+        self.executions = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        while True:
+            cached = self._results.get(key)
+            if cached is not None:
+                if cached[0] > time.monotonic():
+                    self.shared += 1
+                    return cached[1]
+                del self._results[key]
+
+            future = self._inflight.get(key)
+            if future is None:
+                return await self._lead(key, func)
+            # Shield, so a cancelled follower doesn't cancel the leader's call
+            result = await asyncio.shield(future)
+            if result is not _LEADER_CANCELLED:
+                self.shared += 1
+                return result
+            # Only the leader was cancelled, the next follower runs func itself
+
+    async def _lead(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.executions += 1
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.set_result(_LEADER_CANCELLED)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved, there may be no follower at all
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if self.result_ttl > 0:
+                self._remember(key, result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
+
+    def _remember(self, key: Hashable, result: Any):
+        now = time.monotonic()
+        if len(self._results) >= self.maxsize:
+            self._results = {k: v for k, v in self._results.items() if v[0] > now}
+            while len(self._results) >= self.maxsize:
+                # Oldest inserted first
+                self._results.pop(next(iter(self._results)))
+        self._results[key] = (now + self.result_ttl, result)
+
+    def forget(self, key: Hashable):
+        """
+        Drop the cached result of key, e.g. the underlying state changed.
+        """
+        self._results.pop(key, None)
@@ -0,0 +1,215 @@
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import functools
+import json
+import os
+import threading
+import time
+
+T = TypeVar("T")
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    """
+    Ids of a span, W3C / OpenTelemetry sized: 32 and 16 hex chars.
+    """
+    trace_id: str
+    span_id: str
+
+
+@dataclass
+class Span:
+    name: str
+    context: SpanContext
+    parent_id: Optional[str] = None
+    # Unix time in nanoseconds
+    start_time: int = 0
+    end_time: int = 0
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    # UNSET, OK or ERROR, as OpenTelemetry
+    status: str = "UNSET"
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        return (self.end_time - self.start_time) / 1e9
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.context.trace_id,
+            "span_id": self.context.span_id,
+            "parent_span_id": self.parent_id,
+            "start_time_unix_nano": self.start_time,
+            "end_time_unix_nano": self.end_time,
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.error},
+        }
+
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, span: Span) -> None: ...
+
+    def shutdown(self) -> None: ...
+
+
+class InMemorySpanExporter(SpanExporter):
+    """
+    Keep finished spans in a list, e.g. for tests.
+    """
+
+    def __init__(self):
+        self._spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def get_finished_spans(self) -> List[Span]:
+        with self._lock:
+            return list(self._spans)
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Append finished spans to a JSON lines file, one OpenTelemetry like dict per line.
+    """
+
+    def __init__(self, path: str = "terrazip_spans.jsonl"):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("terrazip_current_span", default=None)
+_exporter: Optional[SpanExporter] = None
+
+
+def configure_tracing(exporter: Optional[SpanExporter]):
+    """
+    Enable tracing with exporter, None disables it again.
+    """
+    global _exporter
+    previous, _exporter = _exporter, exporter
+    if previous is not None and previous is not exporter:
+        previous.shutdown()
+
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+
+def current_span_context() -> Optional[SpanContext]:
+    span = _current_span.get()
+    return span.context if span is not None else None
+
+
+class _NoopScope:
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info) -> bool:
+        return False
+
+
+_NOOP_SCOPE = _NoopScope()
+
+
+class _SpanScope:
+    __slots__ = ("_span", "_token")
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]], parent: Optional[SpanContext]):
+        parent = parent or current_span_context()
+        self._span = Span(
+            name=name,
+            context=SpanContext(
+                trace_id=parent.trace_id if parent else os.urandom(16).hex(),
+                span_id=os.urandom(8).hex(),
+            ),
+            parent_id=parent.span_id if parent else None,
+            attributes=dict(attributes) if attributes else {},
+        )
+        self._token = None
+
+    def __enter__(self) -> Span:
+        self._span.start_time = time.time_ns()
+        self._token = _current_span.set(self._span)
+        return self._span
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        span = self._span
+        span.end_time = time.time_ns()
+        if exc is not None:
+            span.status = "ERROR"
+            span.error = f"{exc_type.__name__}: {exc}"
+        elif span.status == "UNSET":
+            span.status = "OK"
+        try:
+            _current_span.reset(self._token)
+        except ValueError:
+            # Exited in another context than entered, e.g. an async generator
+            pass
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export(span)
+        return False
+
+
+def start_span(
+    name: str,
+    attributes: Optional[Dict[str, Any]] = None,
+    parent: Optional[SpanContext] = None,
+):
+    """
+    Context manager of a span, child of the current span (or of parent).
+    Yields the Span, or None while tracing is disabled.
+    """
+    if _exporter is None:
+        return _NOOP_SCOPE
+    return _SpanScope(name, attributes, parent)
+
+
+def traced(name: Optional[str] = None) -> Callable[[Callable[..., T]], Callable[..., T]]:
+    """
+    Decorator opening a span around a coroutine function.
+    """
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _exporter is None:
+                return await func(*args, **kwargs)
+            with _SpanScope(span_name, None, None):
+                return await func(*args, **kwargs)
+
+        wrapper.__traced__ = True
+        return wrapper
+
+    return decorator
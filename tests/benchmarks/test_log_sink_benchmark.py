@@ -0,0 +1,73 @@
+import asyncio
+import contextlib
+import sys
+import time
+
+import loguru
+import pytest
+
+from terrazip.cores import Terrazip, application
+from terrazip.utils import loggers
+
+from ..conftest import FakeDriver, FakeManager
+
+pytestmark = pytest.mark.benchmark
+
+ROUNDS = 5000
+HEADER = {"user-agent": "PayPal/AUHD-214.0-58544216"}
+
+
+@pytest.fixture
+def fake_providers(monkeypatch):
+    class BenchAdapterManager:
+        @classmethod
+        async def create(cls, **kwargs):
+            return FakeManager(paypal=FakeDriver())
+
+    monkeypatch.setattr(application, "AdapterManager", BenchAdapterManager)
+
+
+async def create_and_notify(rounds: int) -> float:
+    terrazip = Terrazip(
+        env="SANDBOX",
+        adapters=["paypal"],
+        base_url="http://localhost",
+        webhook_base_url="http://localhost",
+    )
+    await terrazip.init()
+    try:
+        started_at = time.perf_counter()
+        for i in range(rounds):
+            order_id = f"order-{i}"
+            await terrazip.create_order("paypal", order_id, "1.00", "USD")
+            await terrazip.handle_webhook(HEADER, order_id.encode())
+        return time.perf_counter() - started_at
+    finally:
+        await terrazip.aclose()
+
+
+@pytest.mark.parametrize("log_format", [None, "text", "json"], ids=["off", "text", "json"])
+def test_requests_per_second_at_info(fake_providers, tmp_path, log_format):
+    """
+    Orders (create + webhook) per second with SDK logging at INFO, stderr
+    going to a file: the synchronous text sink against the json sink
+    written by a background thread.
+    """
+    stats = {}
+    with open(tmp_path / "stderr.log", "w") as stderr, contextlib.redirect_stderr(stderr):
+        if log_format:
+            loggers.setup_logger(level="INFO", log_format=log_format)
+        try:
+            elapsed = asyncio.run(create_and_notify(ROUNDS))
+            stats = loggers.log_sink_stats().get("stderr", {})
+        finally:
+            # Stops the json writer once its queue is written, back to loguru's default handler
+            loguru.logger.remove()
+            loguru.logger.add(sys.stderr)
+            loguru.logger.disable(loggers.SDK_NAME)
+    lines = sum(1 for _ in open(tmp_path / "stderr.log"))
+
+    label = f"{log_format} at INFO" if log_format else "off"
+    print(f"\nlogging {label}: {ROUNDS / elapsed:,.0f} orders/s, {lines} lines, sink {stats}")
+    if log_format:
+        assert lines + stats.get("dropped", 0) >= ROUNDS
@@ -0,0 +1,76 @@
+import sys
+import time
+
+import loguru
+import pytest
+
+from terrazip.utils import loggers
+
+pytestmark = pytest.mark.benchmark
+
+CALLS = 20000
+# A PayPal order response, what the drivers log per request
+RESPONSE = {
+    "id": "5O190127TN364715T",
+    "status": "PAYER_ACTION_REQUIRED",
+    "payment_source": {"paypal": {"email_address": "buyer@example.com", "account_status": "VERIFIED"}},
+    "purchase_units": [
+        {"reference_id": f"order-{i}", "amount": {"currency_code": "USD", "value": "10.00"}} for i in range(20)
+    ],
+    "links": [
+        {"href": f"https://api.sandbox.paypal.com/v2/checkout/orders/5O190127TN364715T/{i}", "rel": "self"}
+        for i in range(40)
+    ],
+}
+
+# loguru decides enabled/disabled from the caller's module, so the calls are
+# compiled as a module of the SDK, like the hot paths they stand for
+HOT_PATHS = '''
+def no_log(calls, payload):
+    for _ in range(calls):
+        pass
+
+def eager_debug(calls, payload):
+    for _ in range(calls):
+        logger.debug(f"Response: {payload}")
+
+def lazy_debug(calls, payload):
+    for _ in range(calls):
+        logger.debug("Response: {}", payload)
+'''
+
+
+@pytest.fixture
+def hot_paths():
+    namespace = {"__name__": f"{loggers.SDK_NAME}.benchmark", "logger": loggers.logger}
+    exec(compile(HOT_PATHS, "<terrazip hot paths>", "exec"), namespace)
+    return namespace
+
+
+def per_call_us(func) -> float:
+    started_at = time.perf_counter()
+    func(CALLS, RESPONSE)
+    return (time.perf_counter() - started_at) / CALLS * 1e6
+
+
+@pytest.mark.parametrize("logging", ["disabled", "info"])
+def test_debug_cost_with_logging_off(hot_paths, logging):
+    """
+    Cost of a debug call with a large payload when it is not emitted: SDK
+    logging disabled (the default), or enabled at INFO.
+    """
+    if logging == "info":
+        loggers.setup_logger(level="INFO")
+    try:
+        baseline = per_call_us(hot_paths["no_log"])
+        eager = per_call_us(hot_paths["eager_debug"]) - baseline
+        lazy = per_call_us(hot_paths["lazy_debug"]) - baseline
+    finally:
+        # Back to loguru's default handler, with the SDK disabled
+        loguru.logger.remove()
+        loguru.logger.add(sys.stderr)
+        loguru.logger.disable(loggers.SDK_NAME)
+
+    print(f"\ndebug with logging {logging}: f-string {eager:.2f}us/call, lazy {lazy:.2f}us/call")
+    # The f-string formats the payload whether the record is emitted or not
+    assert lazy * 10 < eager
@@ -0,0 +1,68 @@
+import asyncio
+import gc
+import os
+import time
+
+import pytest
+
+from terrazip.cores.engine import OrderEngine
+from terrazip.models import OrderCreatorScheme, OrderSnapshot, OrderStatus
+
+from ..conftest import FakeDriver, FakeManager, make_order
+
+pytestmark = pytest.mark.benchmark
+
+ORDERS = int(os.environ.get("TERRAZIP_BENCHMARK_ORDERS", 1_000_000))
+
+
+def resident_bytes() -> int:
+    # tracemalloc would be exact but makes creating a million orders several times slower
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class PayPalLikeDriver(FakeDriver):
+    """
+    FakeDriver creating snapshots shaped like the PayPal ones: approve link and provider order id.
+    """
+
+    async def create_order(self, order: OrderCreatorScheme) -> OrderSnapshot:
+        provider_order_id = f"5O190127TN{len(order.order_id):06d}{order.order_id[-6:]}"
+        return OrderSnapshot(
+            order_id=order.order_id,
+            status=OrderStatus.CREATED,
+            payment_link=f"https://www.sandbox.paypal.com/checkoutnow?token={provider_order_id}",
+            created_at=order.created_at,
+            provider_order_id=provider_order_id,
+        )
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/statm"), reason="reads the resident memory from /proc")
+def test_open_orders_memory():
+    """
+    Memory held by the engine (contexts, snapshots, store records, deadlines)
+    for ORDERS open orders.
+    """
+
+    async def scenario():
+        engine = OrderEngine(adapter_manager=FakeManager(paypal=PayPalLikeDriver()))
+        gc.collect()
+        baseline = resident_bytes()
+        started_at = time.perf_counter()
+        try:
+            for i in range(ORDERS):
+                await engine.create_order("paypal", make_order(f"order-{i:08d}"))
+            elapsed = time.perf_counter() - started_at
+            gc.collect()
+            used = resident_bytes() - baseline
+        finally:
+            await engine.aclose()
+        return engine, used, elapsed
+
+    engine, used, elapsed = asyncio.run(scenario())
+
+    print(
+        f"\nmemory {ORDERS:,} open orders: {used / 2**20:,.0f} MiB resident, {used / ORDERS:,.0f} bytes/order "
+        f"(created in {elapsed:.1f}s)"
+    )
+    assert len(engine.list_orders()) == ORDERS
@@ -0,0 +1,52 @@
+import asyncio
+import time
+
+import pytest
+
+from terrazip.cores import EventOutbox
+
+pytestmark = pytest.mark.benchmark
+
+EVENTS = 5000
+
+
+async def publish_concurrently(outbox: EventOutbox, events: int) -> float:
+    started_at = time.perf_counter()
+    await asyncio.gather(*(outbox.record(f"e{i}", {"order_id": f"o{i}"}, ["handler"]) for i in range(events)))
+    return time.perf_counter() - started_at
+
+
+async def publish_one_by_one(outbox: EventOutbox, events: int) -> float:
+    started_at = time.perf_counter()
+    for i in range(events):
+        await outbox.record(f"e{i}", {"order_id": f"o{i}"}, ["handler"])
+    return time.perf_counter() - started_at
+
+
+@pytest.mark.parametrize("concurrent", [False, True], ids=["sequential", "concurrent"])
+def test_group_commit_throughput(tmp_path, concurrent):
+    """
+    Durable (fsync) records per second: sequential publishers pay one fsync
+    each, concurrent ones share the group commit.
+    """
+    events = EVENTS if concurrent else EVENTS // 10
+
+    async def scenario():
+        outbox = EventOutbox(str(tmp_path / "outbox.log"), flush_interval=0.002)
+        outbox.recover()
+        publish = publish_concurrently if concurrent else publish_one_by_one
+        elapsed = await publish(outbox, events)
+        stats = outbox.stats()
+        await outbox.aclose()
+        return elapsed, stats
+
+    elapsed, stats = asyncio.run(scenario())
+
+    print(
+        f"\noutbox {'concurrent' if concurrent else 'sequential'}: {events / elapsed:,.0f} records/s, "
+        f"{stats['flushes']} flushes for {events} records"
+    )
+    assert stats["recorded"] == events
+    if concurrent:
+        # Group commit: far fewer fsyncs than records
+        assert stats["flushes"] <= events // 100
@@ -0,0 +1,137 @@
+import asyncio
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+import pytest
+
+from terrazip.utils import RSA2Signer
+
+from ..conftest import FakeDriver, FakeManager
+
+pytestmark = pytest.mark.benchmark
+
+ORDERS = 2000
+MAX_WORKERS = int(os.environ.get("TERRAZIP_BENCHMARK_WORKERS", os.cpu_count() or 1))
+HEADER = {"user-agent": "PayPal/AUHD-214.0-58544216"}
+PARAMS = {"event_type": "PAYMENT.CAPTURE.COMPLETED", "resource_type": "capture"}
+
+
+class SigningDriver(FakeDriver):
+    """
+    FakeDriver verifying an RSA2 signature per webhook, the CPU cost sharding spreads.
+    """
+
+    def __init__(self, public_key: str, sign: str):
+        super().__init__()
+        self.signer = RSA2Signer(public_key=public_key)
+        self.sign = sign
+
+    async def verify_webhook(self, header, body, order_snapshot, payload=None):
+        assert self.signer.verify(PARAMS, self.sign)
+        return await super().verify_webhook(header, body, order_snapshot, payload)
+
+
+async def run_worker(index, worker_count, socket_dir, order_ids, public_key, sign, barrier):
+    from terrazip.cores import Terrazip, ShardRouter, application
+
+    class BenchAdapterManager:
+        @classmethod
+        async def create(cls, **kwargs):
+            return FakeManager(paypal=SigningDriver(public_key, sign))
+
+    # Every worker runs the real init, only the providers are faked
+    application.AdapterManager = BenchAdapterManager
+    terrazip = Terrazip(
+        env="SANDBOX",
+        adapters=["paypal"],
+        base_url="http://localhost",
+        webhook_base_url="http://localhost",
+        shard_router=ShardRouter(worker_count, socket_dir=socket_dir, worker_index=index),
+    )
+    await terrazip.init()
+    loop = asyncio.get_running_loop()
+    try:
+        for order_id in order_ids:
+            if terrazip._shard_router.is_owner(order_id):
+                await terrazip.create_order("paypal", order_id, "1.00", "USD")
+        await loop.run_in_executor(None, barrier.wait)
+
+        # Webhooks are spread over the workers like a load balancer would, most land on a non owner
+        started_at = time.perf_counter()
+        await asyncio.gather(*(
+            terrazip.handle_webhook(HEADER, order_id.encode()) for order_id in order_ids[index::worker_count]
+        ))
+        elapsed = time.perf_counter() - started_at
+
+        # Keep serving the forwarded webhooks of the slower workers
+        await loop.run_in_executor(None, barrier.wait)
+        paid = sum(
+            1 for order_id in order_ids
+            if terrazip._shard_router.is_owner(order_id)
+            and terrazip._engine.get_order_status(order_id).value == "PAID"
+        )
+    finally:
+        await terrazip.aclose()
+    return elapsed, paid
+
+
+def worker_main(index, worker_count, socket_dir, order_ids, public_key, sign, barrier, results):
+    try:
+        results.put(asyncio.run(run_worker(index, worker_count, socket_dir, order_ids, public_key, sign, barrier)))
+    except BaseException as e:
+        # Release the other workers, they would wait for this one forever
+        barrier.abort()
+        results.put(e)
+        raise
+
+
+@pytest.fixture(scope="module")
+def webhook_key():
+    from Crypto.PublicKey import RSA
+
+    key = RSA.generate(2048)
+    private_key = key.export_key(pkcs=8).decode()
+    public_key = key.public_key().export_key().decode()
+    return public_key, RSA2Signer(private_key=private_key).sign(PARAMS)
+
+
+@pytest.mark.parametrize("worker_count", range(1, MAX_WORKERS + 1))
+def test_sharded_throughput(webhook_key, worker_count):
+    """
+    Webhooks per second of N sharded worker processes on this host, with
+    the webhooks arriving at any worker and forwarded to the owner.
+    """
+    public_key, sign = webhook_key
+    order_ids = [f"order-{i}" for i in range(ORDERS)]
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(worker_count)
+    results = context.Queue()
+    # Unix socket paths are limited to about 100 characters, keep it short
+    socket_dir = tempfile.mkdtemp(prefix="tz-shards-")
+    workers = [
+        context.Process(
+            target=worker_main,
+            args=(index, worker_count, socket_dir, order_ids, public_key, sign, barrier, results),
+        )
+        for index in range(worker_count)
+    ]
+    try:
+        for worker in workers:
+            worker.start()
+        outcomes = [results.get(timeout=300) for _ in workers]
+        errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        assert not errors, errors
+        for worker in workers:
+            worker.join()
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.kill()
+        shutil.rmtree(socket_dir, ignore_errors=True)
+
+    elapsed = max(elapsed for elapsed, _ in outcomes)
+    print(f"\nsharding {worker_count} worker(s): {ORDERS / elapsed:,.0f} webhooks/s")
+    assert sum(paid for _, paid in outcomes) == ORDERS
@@ -0,0 +1,72 @@
+import base64
+import time
+
+import pytest
+from Crypto.PublicKey import RSA
+
+from terrazip.utils import RSA2Signer, sign_with_rsa2, verify_sign_rsa2
+from terrazip.utils.signatures import _load_rsa2_signer, _load_rsa2_verifier
+
+pytestmark = pytest.mark.benchmark
+
+ROUNDS = 200
+PARAMS = {
+    "app_id": "2021000000000000",
+    "method": "alipay.trade.page.pay",
+    "charset": "utf-8",
+    "sign_type": "RSA2",
+    "timestamp": "2026-01-01 00:00:00",
+    "version": "1.0",
+    "biz_content": '{"out_trade_no":"order-1","total_amount":"1.00","subject":"Test Order"}',
+}
+
+
+@pytest.fixture(scope="module")
+def keys():
+    key = RSA.generate(2048)
+    # Alipay hands out bare base64 keys, the PEM armour is added on load
+    private_key = base64.b64encode(key.export_key(format="DER", pkcs=8)).decode()
+    public_key = base64.b64encode(key.public_key().export_key(format="DER")).decode()
+    return private_key, public_key
+
+
+def per_second(func, rounds: int = ROUNDS) -> float:
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return rounds / (time.perf_counter() - started_at)
+
+
+def test_cold_vs_cached_signing(keys):
+    """
+    Signatures per second when the key is parsed for every call (before)
+    and when the parsed key is reused.
+    """
+    private_key, public_key = keys
+    signer = RSA2Signer(private_key=private_key, public_key=public_key)
+    sign = signer.sign(PARAMS)
+
+    def cold_sign():
+        _load_rsa2_signer.cache_clear()
+        sign_with_rsa2(PARAMS, private_key)
+
+    def cold_verify():
+        _load_rsa2_verifier.cache_clear()
+        verify_sign_rsa2(PARAMS, sign, public_key)
+
+    results = {
+        # Parsing a private key is slow, fewer rounds keep the run short
+        "cold sign": per_second(cold_sign, ROUNDS // 10),
+        "cached sign (free function)": per_second(lambda: sign_with_rsa2(PARAMS, private_key)),
+        "cached sign (RSA2Signer)": per_second(lambda: signer.sign(PARAMS)),
+        "cold verify": per_second(cold_verify),
+        "cached verify (free function)": per_second(lambda: verify_sign_rsa2(PARAMS, sign, public_key)),
+        "cached verify (RSA2Signer)": per_second(lambda: signer.verify(PARAMS, sign)),
+    }
+
+    print()
+    for name, rate in results.items():
+        print(f"rsa2 {name}: {rate:,.0f}/s")
+    assert signer.verify(PARAMS, sign)
+    # Parsing a public key is cheap, only the private key gap is wide enough to assert
+    assert results["cached sign (RSA2Signer)"] > results["cold sign"]
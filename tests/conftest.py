@@ -0,0 +1,85 @@
+import asyncio
+import os
+from decimal import Decimal
+
+import pytest
+
+from terrazip.models import AdapterDriver, OrderCreatorScheme, OrderSnapshot, OrderStatus, ServerGateway
+
+
+def pytest_collection_modifyitems(config, items):
+    # Benchmarks are slow and machine dependent, opt in with TERRAZIP_BENCHMARK=1
+    if os.environ.get("TERRAZIP_BENCHMARK") == "1":
+        return
+    skip = pytest.mark.skip(reason="benchmark, run with TERRAZIP_BENCHMARK=1")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+class FakeDriver(AdapterDriver):
+    """
+    In-memory driver: records its calls, fetch_order_status returns `status`.
+    """
+
+    def __init__(self, status: OrderStatus = OrderStatus.PAID, delay: float = 0.0):
+        self.status = status
+        self.delay = delay
+        self.fetch_calls = 0
+
+    async def create_order(self, order: OrderCreatorScheme) -> OrderSnapshot:
+        return OrderSnapshot(order_id=order.order_id, status=OrderStatus.CREATED, created_at=order.created_at)
+
+    async def capture_order(self, order_snapshot: OrderSnapshot) -> OrderSnapshot:
+        return order_snapshot.replace(status=OrderStatus.CAPTURED)
+
+    async def verify_webhook(self, header, body, order_snapshot, payload=None) -> OrderSnapshot:
+        return order_snapshot.replace(status=OrderStatus.WEBHOOKED)
+
+    @classmethod
+    def extract_order_id(cls, header, body, payload=None) -> str:
+        return body.decode()
+
+    async def fetch_order_status(self, order_snapshot: OrderSnapshot) -> OrderSnapshot:
+        self.fetch_calls += 1
+        await asyncio.sleep(self.delay)
+        return order_snapshot.replace(status=self.status)
+
+
+class FakeManager:
+    """
+    Stand-in of AdapterManager over already built drivers.
+    """
+
+    def __init__(self, **drivers: AdapterDriver):
+        self.drivers = drivers
+
+    def get(self, name: str) -> AdapterDriver:
+        return self.drivers[name]
+
+    def on_available(self, callback):
+        # Every driver is ready from the start
+        pass
+
+    async def aclose(self):
+        pass
+
+
+def make_order(order_id: str, amount: str = "1.00", currency: str = "USD") -> OrderCreatorScheme:
+    return OrderCreatorScheme(
+        order_id=order_id,
+        amount=Decimal(amount),
+        currency=currency,
+        created_at="2026-01-01 00:00:00",
+        server_gateway=ServerGateway(),
+    )
+
+
+async def wait_until(predicate, timeout: float = 2.0, interval: float = 0.01) -> bool:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not predicate():
+        if loop.time() > deadline:
+            return False
+        await asyncio.sleep(interval)
+    return True
@@ -0,0 +1,77 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from terrazip.cores import Terrazip, application, manager
+from terrazip.cores.store import InMemoryOrderStore, OrderRecord
+from terrazip.models import OrderSnapshot, OrderStatus
+
+from .conftest import FakeDriver, wait_until
+
+
+class FlakyInitDriver(FakeDriver):
+    """
+    FakeDriver whose first init fails, like a provider down at startup.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.init_calls = 0
+
+    async def init(self):
+        self.init_calls += 1
+        if self.init_calls == 1:
+            raise ConnectionError("provider unreachable")
+
+
+def fake_bundle(driver):
+    return SimpleNamespace(
+        driver=lambda **kwargs: driver,
+        credential=lambda **kwargs: None,
+        gateway=SimpleNamespace(SANDBOX=None),
+    )
+
+
+def open_order(order_id: str, adapter: str) -> OrderRecord:
+    snapshot = OrderSnapshot(order_id=order_id, status=OrderStatus.CREATED)
+    return OrderRecord(order_id=order_id, adapter=adapter, snapshot=snapshot, deadline=time.time() + 60)
+
+
+def test_orders_of_a_late_adapter_are_restored(monkeypatch):
+    paypal = FlakyInitDriver()
+    monkeypatch.setitem(manager.ADAPTERS, "alipay", fake_bundle(FakeDriver()))
+    monkeypatch.setitem(manager.ADAPTERS, "paypal", fake_bundle(paypal))
+
+    class FastRetryAdapterManager(manager.AdapterManager):
+        @classmethod
+        async def create(cls, **kwargs):
+            return await super().create(**kwargs, retry_delay=0.01)
+
+    monkeypatch.setattr(application, "AdapterManager", FastRetryAdapterManager)
+
+    async def scenario():
+        store = InMemoryOrderStore()
+        await store.put(open_order("a1", "alipay"))
+        await store.put(open_order("p1", "paypal"))
+        terrazip = Terrazip(
+            env="SANDBOX",
+            adapters=["alipay", "paypal"],
+            base_url="http://localhost",
+            webhook_base_url="http://localhost",
+            order_store=store,
+            partial_adapters=True,
+        )
+        await terrazip.init()
+        try:
+            restored_at_init = terrazip._engine.list_orders()
+            restored = await wait_until(lambda: "p1" in terrazip._engine.list_orders())
+            return restored_at_init, restored, terrazip._engine.get_order_driver("p1")
+        finally:
+            await terrazip.aclose()
+
+    restored_at_init, restored, driver = asyncio.run(scenario())
+
+    assert restored_at_init == ["a1"]
+    assert restored
+    assert driver is paypal
+    assert paypal.init_calls == 2
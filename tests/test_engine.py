@@ -0,0 +1,49 @@
+import asyncio
+
+from terrazip.cores.engine import OrderEngine
+from terrazip.cores.reconciler import ReconcileConfig
+from terrazip.models import OrderStatus
+from terrazip.utils.metrics import OPEN_ORDERS, ACTIVE_DEADLINES
+
+from .conftest import FakeDriver, FakeManager, make_order, wait_until
+
+
+def test_expired_order_is_reconciled():
+    async def scenario():
+        driver = FakeDriver(status=OrderStatus.FAILED)
+        engine = OrderEngine(
+            adapter_manager=FakeManager(paypal=driver),
+            order_timeout_min=0.05 / 60,
+            timeout_tick_seconds=0.01,
+            reconcile_config=ReconcileConfig(rate_per_second=None, jitter_seconds=0),
+        )
+        try:
+            await engine.create_order("paypal", make_order("o1"))
+            reconciled = await wait_until(lambda: engine.get_order_status("o1") == OrderStatus.FAILED)
+        finally:
+            await engine.aclose()
+        assert reconciled
+        assert driver.fetch_calls == 1
+        assert engine.reconcile_stats()["paypal"]["succeeded"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_open_order_gauge_follows_transitions_and_is_unbound_on_close():
+    async def scenario():
+        engine = OrderEngine(adapter_manager=FakeManager(paypal=FakeDriver()))
+        snapshots = [await engine.create_order("paypal", make_order(f"o{i}")) for i in range(3)]
+        opened = OPEN_ORDERS.samples()
+        await engine.apply_snapshot(snapshots[0].replace(status=OrderStatus.PAID))
+        # A second terminal update is rejected, it must not count twice
+        await engine.apply_snapshot(snapshots[0].replace(status=OrderStatus.FAILED))
+        paid = OPEN_ORDERS.samples()
+        await engine.aclose()
+        return opened, paid
+
+    opened, paid = asyncio.run(scenario())
+
+    assert opened == ["terrazip_open_orders 3.0"]
+    assert paid == ["terrazip_open_orders 2.0"]
+    assert OPEN_ORDERS.samples() == []
+    assert ACTIVE_DEADLINES.samples() == []
@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+
+# What importing the core must not load, it is loaded on first use
+HEAVY_MODULES = (
+    "fastapi",
+    "starlette",
+    "uvicorn",
+    "Crypto",
+    "pydantic_settings",
+    "langchain",
+    "langgraph",
+    "web3",
+    "eth_account",
+    "terrazip.adapters",
+    "terrazip.ai",
+    "terrazip.x402_mock",
+)
+# Generous, a few times the usual cost, override on slow machines
+BUDGET_MS = float(os.environ.get("TERRAZIP_IMPORT_BUDGET_MS", 1500))
+
+
+def import_time(statement: str):
+    """
+    (modules imported, cumulative microseconds of the top level imports) of statement,
+    from `python -X importtime` in a fresh interpreter.
+    """
+    env = {**os.environ, "PYTHONPATH": str(SRC)}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = []
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        modules.append(name.strip())
+        # Nested imports are indented, their time is in their parent's
+        if not name[1:].startswith(" "):
+            total_us += int(cumulative)
+    return modules, total_us
+
+
+@pytest.mark.parametrize("statement", [
+    "import terrazip",
+    "from terrazip.cores import Terrazip",
+    "from terrazip.utils import logger, AsyncRequest",
+])
+def test_core_import_skips_heavy_modules(statement):
+    modules, _ = import_time(statement)
+
+    loaded = [m for m in modules if any(m == heavy or m.startswith(f"{heavy}.") for heavy in HEAVY_MODULES)]
+    assert loaded == []
+
+
+def test_core_import_time_budget():
+    _, total_us = import_time("from terrazip.cores import Terrazip")
+
+    assert total_us / 1000 < BUDGET_MS, f"import took {total_us / 1000:.0f}ms, budget {BUDGET_MS:.0f}ms"
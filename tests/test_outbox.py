@@ -0,0 +1,149 @@
+import asyncio
+import shutil
+
+from terrazip.cores import AsyncEventBus, EventOutbox, OrderPaidEvent
+from terrazip.cores.engine import OrderEngine
+from terrazip.cores.store import InMemoryOrderStore
+from terrazip.models import OrderStatus
+
+from .conftest import FakeDriver, FakeManager, make_order
+
+
+def count_lines(path) -> int:
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def test_log_is_compacted_while_running(tmp_path):
+    path = tmp_path / "outbox.log"
+
+    async def scenario():
+        outbox = EventOutbox(str(path), flush_interval=0, fsync=False, compact_lines=100)
+        outbox.recover()
+        for i in range(1000):
+            await outbox.record(f"e{i}", {"n": i}, ["a", "b"])
+            outbox.ack(f"e{i}", "a")
+            if i < 990:
+                outbox.ack(f"e{i}", "b")
+        await outbox.flush()
+        stats = outbox.stats()
+        await outbox.aclose()
+        return stats
+
+    stats = asyncio.run(scenario())
+
+    assert stats["compactions"] > 0
+    assert stats["pending"] == 10
+    # 3000 lines appended in total, compacted down as the process runs
+    assert count_lines(path) < 200
+
+    recovered = EventOutbox(str(path), fsync=False).recover()
+    assert [(event_id, handlers) for event_id, _, handlers in recovered] == [
+        (f"e{i}", ["b"]) for i in range(990, 1000)
+    ]
+    assert recovered[0][1] == {"n": 990}
+
+
+def test_unacked_events_survive_compaction(tmp_path):
+    path = tmp_path / "outbox.log"
+
+    async def scenario():
+        outbox = EventOutbox(str(path), fsync=False, compact_lines=10)
+        outbox.recover()
+        await asyncio.gather(*(outbox.record(f"e{i}", i, ["a"]) for i in range(50)))
+        for i in range(0, 50, 2):
+            outbox.ack(f"e{i}", "a")
+        await outbox.aclose()
+
+    asyncio.run(scenario())
+
+    recovered = EventOutbox(str(path), fsync=False).recover()
+    assert [event for _, event, _ in recovered] == list(range(1, 50, 2))
+
+
+class CrashPointStore(InMemoryOrderStore):
+    """
+    Copies the outbox log at compare_and_set, what a crash there would leave on disk.
+    """
+
+    def __init__(self, outbox_path, crash_path, after_commit: bool, commit: bool = True):
+        super().__init__()
+        self.outbox_path = outbox_path
+        self.crash_path = crash_path
+        self.after_commit = after_commit
+        self.commit = commit
+
+    async def compare_and_set(self, order_id, expected, snapshot) -> bool:
+        if not self.after_commit:
+            shutil.copy(self.outbox_path, self.crash_path)
+        if not self.commit:
+            return False
+        committed = await super().compare_and_set(order_id, expected, snapshot)
+        if self.after_commit:
+            shutil.copy(self.outbox_path, self.crash_path)
+        return committed
+
+
+async def pay_order(store: CrashPointStore, outbox_path) -> OrderEngine:
+    bus = AsyncEventBus(outbox=EventOutbox(str(outbox_path), flush_interval=0, fsync=False))
+    bus.subscribe(OrderPaidEvent, lambda event: asyncio.sleep(0), name="paid")
+    bus.outbox.recover()
+    engine = OrderEngine(adapter_manager=FakeManager(paypal=FakeDriver()), event_bus=bus, store=store)
+    snapshot = await engine.create_order("paypal", make_order("o1"))
+    await engine.apply_snapshot(snapshot.replace(status=OrderStatus.PAID))
+    await engine.aclose()
+    await bus.aclose()
+    return engine
+
+
+async def recover_after_crash(crash_path, engine: OrderEngine):
+    delivered = []
+
+    async def handler(event):
+        delivered.append(event)
+
+    bus = AsyncEventBus(outbox=EventOutbox(str(crash_path), fsync=False))
+    bus.subscribe(OrderPaidEvent, handler, name="paid")
+    dispatched = await bus.recover(confirm=engine.is_committed)
+    await bus.aclose()
+    return dispatched, delivered
+
+
+def test_event_staged_before_a_committed_status_is_replayed(tmp_path):
+    outbox_path, crash_path = tmp_path / "outbox.log", tmp_path / "crash.log"
+
+    async def scenario():
+        engine = await pay_order(CrashPointStore(outbox_path, crash_path, after_commit=True), outbox_path)
+        return await recover_after_crash(crash_path, engine)
+
+    dispatched, delivered = asyncio.run(scenario())
+
+    # The crash came after the commit and before any handler ran
+    assert dispatched == 1
+    assert [(event.order_id, event.snapshot.status) for event in delivered] == [("o1", OrderStatus.PAID)]
+
+
+def test_event_of_an_uncommitted_status_is_discarded(tmp_path):
+    outbox_path, crash_path = tmp_path / "outbox.log", tmp_path / "crash.log"
+
+    async def scenario():
+        # The crash came before the commit, the order is still CREATED in the store
+        engine = await pay_order(CrashPointStore(outbox_path, crash_path, after_commit=False, commit=False), outbox_path)
+        return await recover_after_crash(crash_path, engine)
+
+    dispatched, delivered = asyncio.run(scenario())
+
+    assert dispatched == 0
+    assert delivered == []
+    assert EventOutbox(str(crash_path), fsync=False).recover() == []
+
+
+def test_rejected_status_discards_its_events(tmp_path):
+    outbox_path, crash_path = tmp_path / "outbox.log", tmp_path / "crash.log"
+
+    async def scenario():
+        await pay_order(CrashPointStore(outbox_path, crash_path, after_commit=True, commit=False), outbox_path)
+
+    asyncio.run(scenario())
+
+    assert EventOutbox(str(outbox_path), fsync=False).recover() == []
@@ -0,0 +1,99 @@
+import json
+import os
+
+import pytest
+
+from terrazip.adapters.paypal import CertificateCache, WebhookRegistryCache
+
+CERT_URL = "https://api.paypal.com/v1/notifications/certs/CERT-1"
+
+posix_only = pytest.mark.skipif(not hasattr(os, "getuid"), reason="ownership checks need POSIX")
+
+
+def test_certificates_stay_in_memory_by_default(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cache = CertificateCache()
+    cache.set(CERT_URL, "PEM")
+
+    assert cache.get(CERT_URL) == "PEM"
+    assert cache.directory is None
+    assert list(tmp_path.iterdir()) == []
+    assert CertificateCache().get(CERT_URL) is None
+
+
+@posix_only
+def test_private_directory_is_shared(tmp_path):
+    directory = tmp_path / "certs"
+    CertificateCache(directory=str(directory)).set(CERT_URL, "PEM")
+
+    assert oct(directory.stat().st_mode & 0o777) == oct(0o700)
+    (path,) = directory.iterdir()
+    assert oct(path.stat().st_mode & 0o777) == oct(0o600)
+    assert CertificateCache(directory=str(directory)).get(CERT_URL) == "PEM"
+
+
+@posix_only
+def test_shared_directory_is_not_trusted(tmp_path):
+    directory = tmp_path / "certs"
+    directory.mkdir(mode=0o777)
+    directory.chmod(0o777)
+    cache = CertificateCache(directory=str(directory))
+    assert cache.directory is None
+
+
+@posix_only
+def test_planted_certificate_is_ignored(tmp_path):
+    directory = tmp_path / "certs"
+    cache = CertificateCache(directory=str(directory))
+    cache.set(CERT_URL, "PEM")
+    (path,) = directory.iterdir()
+
+    # Rewritten with a group / world writable mode, as another user could leave it
+    path.write_text(json.dumps({"url": CERT_URL, "expires_at": 4102444800, "pem": "EVIL"}))
+    path.chmod(0o666)
+
+    assert CertificateCache(directory=str(directory)).get(CERT_URL) is None
+
+
+def test_webhook_registry_stays_in_memory_by_default(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    key = WebhookRegistryCache.make_key("https://api-m.paypal.com", "client")
+    cache = WebhookRegistryCache()
+    cache.set(key, {"https://example.com/hook"})
+
+    assert cache.get(key) == {"https://example.com/hook"}
+    assert cache.path is None
+    assert list(tmp_path.iterdir()) == []
+    assert WebhookRegistryCache().get(key) is None
+
+
+@posix_only
+def test_webhook_registry_is_shared_through_a_private_directory(tmp_path):
+    directory = tmp_path / "webhooks"
+    key = WebhookRegistryCache.make_key("https://api-m.paypal.com", "client")
+    WebhookRegistryCache(directory=str(directory)).set(key, {"https://example.com/hook"})
+
+    assert oct(directory.stat().st_mode & 0o777) == oct(0o700)
+    # No temp file left behind, the written file is owner only
+    (path,) = directory.iterdir()
+    assert path.name == WebhookRegistryCache.FILENAME
+    assert oct(path.stat().st_mode & 0o777) == oct(0o600)
+    assert WebhookRegistryCache(directory=str(directory)).get(key) == {"https://example.com/hook"}
+
+
+@posix_only
+def test_webhook_registry_ignores_a_shared_directory_and_links(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    assert WebhookRegistryCache(directory=str(shared)).directory is None
+
+    directory = tmp_path / "webhooks"
+    key = WebhookRegistryCache.make_key("https://api-m.paypal.com", "client")
+    cache = WebhookRegistryCache(directory=str(directory))
+    planted = tmp_path / "planted.json"
+    planted.write_text(json.dumps({key: {"expires_at": 4102444800, "urls": ["https://evil.example"]}}))
+    planted.chmod(0o600)
+    os.symlink(planted, directory / WebhookRegistryCache.FILENAME)
+
+    assert cache.get(key) is None
@@ -0,0 +1,129 @@
+import asyncio
+import itertools
+
+import httpx
+
+from terrazip.adapters.paypal.paypal_config import PayPalCredential, PayPalGateway
+from terrazip.adapters.paypal.paypal_driver import PayPalDriver
+
+from .conftest import make_order
+
+
+class FakePayPal:
+    """
+    Local fake of the OAuth and order endpoints: a token is valid until the
+    next one is issued, unless `expire()` revoked it.
+    """
+
+    def __init__(self, oauth_delay: float = 0.0):
+        self.oauth_delay = oauth_delay
+        self._tokens = itertools.count(1)
+        self.valid_token = None
+        self.oauth_calls = 0
+        self.order_calls = 0
+
+    def expire(self):
+        self.valid_token = None
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("oauth2/token"):
+            self.oauth_calls += 1
+            await asyncio.sleep(self.oauth_delay)
+            self.valid_token = f"token-{next(self._tokens)}"
+            return httpx.Response(200, json={"access_token": self.valid_token, "expires_in": 32400})
+
+        if request.headers.get("Authorization") != f"Bearer {self.valid_token}":
+            return httpx.Response(401, json={"error": "invalid_token"})
+        self.order_calls += 1
+        return httpx.Response(201, json={
+            "id": f"PAYPAL-{self.order_calls}",
+            "status": "CREATED",
+            "links": [{"href": "https://www.sandbox.paypal.com/checkoutnow?token=x", "rel": "payer-action"}],
+        })
+
+
+def make_driver(fake: FakePayPal) -> PayPalDriver:
+    driver = PayPalDriver(
+        PayPalGateway.SANDBOX,
+        PayPalCredential(
+            PAYPAL_CLIENT_ID="client",
+            PAYPAL_SECRET="secret",
+            PAYPAL_WEBHOOK_ID="webhook",
+            _env_file=None,
+        ),
+    )
+    driver._http._client = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+    return driver
+
+
+async def create_orders(driver: PayPalDriver, count: int):
+    return await asyncio.gather(*(driver.create_order(make_order(f"o{i}")) for i in range(count)))
+
+
+def test_hot_path_makes_no_token_round_trip():
+    async def scenario():
+        fake = FakePayPal()
+        driver = make_driver(fake)
+        await driver.init()
+        try:
+            snapshots = await create_orders(driver, 50)
+        finally:
+            await driver.aclose()
+        return fake, driver, snapshots
+
+    fake, driver, snapshots = asyncio.run(scenario())
+
+    assert len(snapshots) == 50
+    assert fake.order_calls == 50
+    # The init fetch only, shared by every order
+    assert driver._tokens.fetch_count == 1
+    assert fake.oauth_calls == 1
+
+
+def test_concurrent_401s_share_one_refresh():
+    async def scenario():
+        fake = FakePayPal(oauth_delay=0.01)
+        driver = make_driver(fake)
+        await driver.init()
+        fake.expire()
+        try:
+            await create_orders(driver, 20)
+        finally:
+            await driver.aclose()
+        return fake, driver
+
+    fake, driver = asyncio.run(scenario())
+
+    assert fake.order_calls == 20
+    assert driver._tokens.fetch_count == 2
+
+
+def test_401_after_a_concurrent_refresh_reuses_the_new_token():
+    async def scenario():
+        fake = FakePayPal()
+        driver = make_driver(fake)
+        await driver.init()
+        stale_token = driver._tokens.token
+        # Another caller got a 401 and refreshed the token in the meantime
+        fake.expire()
+        await driver._tokens.refresh()
+        assert not driver._tokens.invalidate(stale_token)
+
+        original_get_token = driver._tokens.get_token
+        calls = iter([stale_token])
+
+        async def get_token():
+            # This request still holds the stale token
+            return next(calls, None) or await original_get_token()
+
+        driver._tokens.get_token = get_token
+        try:
+            await driver.create_order(make_order("o1"))
+        finally:
+            await driver.aclose()
+        return fake, driver
+
+    fake, driver = asyncio.run(scenario())
+
+    assert fake.order_calls == 1
+    assert driver._tokens.fetch_count == 2
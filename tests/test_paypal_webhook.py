@@ -0,0 +1,123 @@
+import asyncio
+import base64
+import json
+import zlib
+
+import httpx
+import pytest
+from Crypto.Hash import SHA256
+from Crypto.PublicKey import RSA
+from Crypto.Signature import pkcs1_15
+from Crypto.Util.asn1 import DerBitString, DerNull, DerObjectId, DerSequence, DerSetOf
+
+from terrazip.adapters.paypal import CertificateCache
+from terrazip.adapters.paypal.paypal_config import PayPalCredential
+from terrazip.adapters.paypal.paypal_driver import PayPalDriver
+from terrazip.models import OrderSnapshot, OrderStatus
+from terrazip.models.config import GatewayConfig
+
+CERT_URL = "https://api.paypal.com/v1/notifications/certs/CERT-1"
+WEBHOOK_ID = "WH-ID"
+SHA256_WITH_RSA = "1.2.840.113549.1.1.11"
+
+
+def make_certificate(key: RSA.RsaKey, common_name: str) -> str:
+    """
+    Minimal self-signed X.509 v1 certificate (PEM) of key.
+    """
+    algorithm = DerSequence([DerObjectId(SHA256_WITH_RSA), DerNull()])
+    utf8_name = b"\x0c" + bytes([len(common_name)]) + common_name.encode("ascii")
+    name = DerSequence([DerSetOf([DerSequence([DerObjectId("2.5.4.3"), utf8_name]).encode()])])
+    validity = DerSequence([b"\x17\x0d260101000000Z", b"\x17\x0d360101000000Z"])
+    tbs = DerSequence([
+        1, algorithm, name, validity, name, key.public_key().export_key(format="DER"),
+    ]).encode()
+    signature = pkcs1_15.new(key).sign(SHA256.new(tbs))
+    der = DerSequence([tbs, algorithm, DerBitString(signature)]).encode()
+    body = base64.encodebytes(der).decode("ascii")
+    return f"-----BEGIN CERTIFICATE-----\n{body}-----END CERTIFICATE-----\n"
+
+
+def sign_transmission(key: RSA.RsaKey, transmission_id: str, transmission_time: str, body: bytes) -> str:
+    message = f"{transmission_id}|{transmission_time}|{WEBHOOK_ID}|{zlib.crc32(body)}"
+    return base64.b64encode(pkcs1_15.new(key).sign(SHA256.new(message.encode("utf-8")))).decode("ascii")
+
+
+def make_driver(cert_pem: str, calls: list) -> PayPalDriver:
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        if request.url.path.startswith("/v1/notifications/certs/"):
+            return httpx.Response(200, text=cert_pem)
+        if request.url.path.endswith("verify-webhook-signature"):
+            return httpx.Response(200, json={"verification_status": "FAILURE"})
+        return httpx.Response(200, json={"access_token": "token", "expires_in": 3600})
+
+    driver = PayPalDriver(
+        GatewayConfig(base_url="https://api-m.sandbox.paypal.com/"),
+        PayPalCredential(
+            PAYPAL_CLIENT_ID="client",
+            PAYPAL_SECRET="secret",
+            PAYPAL_WEBHOOK_ID=WEBHOOK_ID,
+            _env_file=None,
+        ),
+        cert_cache=CertificateCache(),
+    )
+    driver._http._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return driver
+
+
+def webhook(key: RSA.RsaKey):
+    body = json.dumps({"id": "WH-1", "event_type": "CHECKOUT.ORDER.COMPLETED", "resource": {"id": "P1"}}).encode()
+    headers = {
+        "content-type": "application/json",
+        "paypal-auth-algo": "SHA256withRSA",
+        "paypal-cert-url": CERT_URL,
+        "paypal-transmission-id": "tx-1",
+        "paypal-transmission-time": "2026-01-01T00:00:00Z",
+        "paypal-transmission-sig": sign_transmission(key, "tx-1", "2026-01-01T00:00:00Z", body),
+    }
+    return headers, body
+
+
+@pytest.fixture(scope="module")
+def keys():
+    # Key generation is slow, share them between the tests
+    return [RSA.generate(2048) for _ in range(3)]
+
+
+def verify(driver: PayPalDriver, headers: dict, body: bytes):
+    return asyncio.run(driver.verify_webhook(headers, body, OrderSnapshot(order_id="o1")))
+
+
+def test_local_verification_of_signed_webhook(keys):
+    key = keys[0]
+    calls = []
+    driver = make_driver(make_certificate(key, "messageverificationcerts"), calls)
+
+    snapshot = verify(driver, *webhook(key))
+
+    assert snapshot.status == OrderStatus.PAID
+    # Certificate download only, no remote verification call
+    assert calls == ["/v1/notifications/certs/CERT-1"]
+
+
+def test_local_verification_with_certificate_chain(keys):
+    key, issuer_key = keys[0], keys[1]
+    chain = make_certificate(key, "messageverificationcerts") + make_certificate(issuer_key, "issuer")
+    calls = []
+    driver = make_driver(chain, calls)
+
+    snapshot = verify(driver, *webhook(key))
+
+    assert snapshot.status == OrderStatus.PAID
+    assert calls == ["/v1/notifications/certs/CERT-1"]
+
+
+def test_forged_signature_falls_back_to_remote_verification(keys):
+    key, forger = keys[0], keys[2]
+    calls = []
+    driver = make_driver(make_certificate(key, "messageverificationcerts"), calls)
+
+    # Remote verification answers FAILURE: not paid
+    assert verify(driver, *webhook(forger)) is None
+    assert calls[-1] == "/v1/notifications/verify-webhook-signature"
@@ -0,0 +1,56 @@
+import asyncio
+import os
+
+import pytest
+
+from terrazip.cores import ShardRouter
+
+
+def test_burst_of_forwards_reaches_the_owner(tmp_path):
+    async def scenario():
+        sender = ShardRouter(2, socket_dir=str(tmp_path), worker_index=0)
+        owner = ShardRouter(2, socket_dir=str(tmp_path), worker_index=1)
+        order_ids = [f"order-{i}" for i in range(1000) if owner.owner_of(f"order-{i}") == 1][:300]
+
+        async def handle(message):
+            await asyncio.sleep(0.05)
+            return {"ok": True, "order_id": message["order_id"]}
+
+        await owner.start(handle)
+        try:
+            # Far more than the default listen backlog of 100
+            return order_ids, await asyncio.gather(*(
+                sender.forward(order_id, {"action": "capture", "order_id": order_id}) for order_id in order_ids
+            ))
+        finally:
+            await owner.aclose()
+            await sender.aclose()
+
+    order_ids, replies = asyncio.run(scenario())
+
+    assert len(order_ids) == 300
+    assert [reply["order_id"] for reply in replies] == order_ids
+
+
+def test_socket_dir_is_created_private(tmp_path):
+    socket_dir = tmp_path / "shards"
+    router = ShardRouter(2, socket_dir=str(socket_dir))
+
+    assert router.claim() == 0
+    assert oct(socket_dir.stat().st_mode & 0o777) == oct(0o700)
+    assert oct((socket_dir / "shard-0.lock").stat().st_mode & 0o777) == oct(0o600)
+
+
+def test_shared_socket_dir_and_linked_lock_are_refused(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    with pytest.raises(RuntimeError):
+        ShardRouter(2, socket_dir=str(shared)).claim()
+
+    socket_dir = tmp_path / "shards"
+    socket_dir.mkdir(mode=0o700)
+    os.symlink(tmp_path / "elsewhere", socket_dir / "shard-0.lock")
+    with pytest.raises(OSError):
+        ShardRouter(2, socket_dir=str(socket_dir), worker_index=0).claim()
+    assert not (tmp_path / "elsewhere").exists()
@@ -0,0 +1,56 @@
+import asyncio
+import os
+import threading
+
+from terrazip.utils import SignExecutor
+
+
+def test_flushed_batch_is_spread_over_workers():
+    executor = SignExecutor(mode="thread", max_workers=4, max_batch=8, batch_window=1)
+    # Each job waits for 3 others, it only passes if 4 workers run at once
+    barrier = threading.Barrier(4, timeout=2)
+
+    def job(i):
+        barrier.wait()
+        return threading.get_ident(), i
+
+    async def scenario():
+        return await asyncio.gather(*(executor.run(job, i) for i in range(8)))
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    assert [i for _, i in results] == list(range(8))
+    assert len({ident for ident, _ in results}) == 4
+
+
+def test_failed_job_only_fails_its_call():
+    executor = SignExecutor(mode="thread", max_workers=2, max_batch=4, batch_window=1)
+
+    def job(i):
+        if i == 1:
+            raise ValueError("bad signature")
+        return i
+
+    async def scenario():
+        return await asyncio.gather(*(executor.run(job, i) for i in range(4)), return_exceptions=True)
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+    assert results[0] == 0 and results[2:] == [2, 3]
+    assert isinstance(results[1], ValueError)
+
+
+def test_default_worker_count_matches_the_pools():
+    cpu_count = os.cpu_count() or 1
+    for mode, expected in (("thread", min(32, cpu_count + 4)), ("process", cpu_count)):
+        executor = SignExecutor(mode=mode)
+        try:
+            assert executor.max_workers == expected
+        finally:
+            executor.shutdown()
@@ -0,0 +1,31 @@
+import asyncio
+
+from terrazip.utils import SingleFlight
+
+
+def test_followers_take_over_from_a_cancelled_leader():
+    async def scenario():
+        flight = SingleFlight(result_ttl=0)
+        calls = []
+
+        async def query():
+            calls.append(len(calls))
+            await asyncio.sleep(0.05)
+            return f"status-{len(calls)}"
+
+        leader = asyncio.create_task(flight.do("o1", query))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do("o1", query)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        return leader, calls, results, flight
+
+    leader, calls, results, flight = asyncio.run(scenario())
+
+    assert leader.cancelled()
+    # One follower ran the call again, the other two shared its result
+    assert len(calls) == 2
+    assert results == ["status-2"] * 3
+    assert flight.executions == 2
+    assert flight.shared == 2
@@ -0,0 +1,69 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from terrazip.cores.store import OrderRecord, SqliteOrderStore
+from terrazip.models import OrderSnapshot, OrderStatus
+
+from .conftest import wait_until
+
+
+def test_failed_background_flush_is_retried(tmp_path):
+    path = str(tmp_path / "orders.db")
+    store = SqliteOrderStore(path, flush_interval=0.01, retry_delay=0.02)
+    write_batch = store._write_batch
+    writes = []
+
+    def flaky_write_batch(rows):
+        writes.append(len(rows))
+        if len(writes) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        write_batch(rows)
+
+    store._write_batch = flaky_write_batch
+
+    async def scenario():
+        loop_errors = []
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: loop_errors.append(context))
+        snapshot = OrderSnapshot(order_id="o1", status=OrderStatus.CREATED)
+        try:
+            await store.put(OrderRecord(order_id="o1", adapter="paypal", snapshot=snapshot, deadline=time.time()))
+            written = await wait_until(lambda: len(writes) == 2 and not store._pending)
+        finally:
+            await store.aclose()
+        return written, loop_errors
+
+    written, loop_errors = asyncio.run(scenario())
+
+    assert written
+    assert writes == [1, 1]
+    assert loop_errors == []
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT status FROM orders WHERE order_id = 'o1'").fetchall() == [("CREATED",)]
+
+
+def test_compare_and_set_waits_for_a_background_flush(tmp_path):
+    store = SqliteOrderStore(str(tmp_path / "orders.db"), flush_interval=0.01, retry_delay=60)
+    started = []
+
+    def slow_failing_write_batch(rows):
+        started.append(len(rows))
+        time.sleep(0.05)
+        raise sqlite3.OperationalError("database is locked")
+
+    store._write_batch = slow_failing_write_batch
+
+    async def scenario():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: None)
+        snapshot = OrderSnapshot(order_id="o1", status=OrderStatus.CREATED)
+        await store.put(OrderRecord(order_id="o1", adapter="paypal", snapshot=snapshot, deadline=time.time()))
+        await wait_until(lambda: started)
+        # The row is not written yet, the CAS must not report a lost race
+        with pytest.raises(sqlite3.OperationalError):
+            await store.compare_and_set("o1", OrderStatus.CREATED, snapshot.replace(status=OrderStatus.PAID))
+        assert "o1" in store._pending
+        store._executor.shutdown(wait=True)
+
+    asyncio.run(scenario())
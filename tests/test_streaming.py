@@ -0,0 +1,84 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from terrazip.cores import TerrazipFastapi
+from terrazip.cores.engine import OrderStatusChangedEvent
+from terrazip.models import OrderSnapshot, OrderStatus
+
+from .conftest import wait_until
+
+
+def make_app(**kwargs):
+    app = FastAPI()
+    terrazip_fastapi = TerrazipFastapi(
+        app=app,
+        env="SANDBOX",
+        adapters=["paypal"],
+        base_url="http://localhost",
+        webhook_base_url="http://localhost",
+        **kwargs,
+    )
+    terrazip_fastapi.add_route(app)
+    return terrazip_fastapi, app
+
+
+def paid_event(order_id: str) -> OrderStatusChangedEvent:
+    return OrderStatusChangedEvent(
+        order_id=order_id,
+        snapshot=OrderSnapshot(order_id=order_id, status=OrderStatus.PAID),
+        old_status=OrderStatus.CREATED,
+    )
+
+
+def token_authorizer(connection, order_ids):
+    # Only a filtered stream with the right token
+    return bool(order_ids) and connection.query_params.get("token") == "secret"
+
+
+def test_status_stream_is_off_by_default():
+    terrazip_fastapi, app = make_app()
+    client = TestClient(app)
+
+    assert terrazip_fastapi.terrazip.event_bus is None
+    assert client.get("/orders/stream").status_code == 404
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/orders/ws"):
+            pass
+
+
+def test_status_stream_requires_an_authorizer():
+    with pytest.raises(ValueError):
+        make_app(status_stream=True)
+
+
+def test_unauthorized_stream_is_rejected():
+    _, app = make_app(status_stream=True, stream_authorizer=token_authorizer)
+    client = TestClient(app)
+
+    assert client.get("/orders/stream").status_code == 403
+    assert client.get("/orders/stream?order_id=o1&token=wrong").status_code == 403
+    with pytest.raises(WebSocketDisconnect) as disconnect:
+        with client.websocket_connect("/orders/ws?token=secret"):
+            pass
+    assert disconnect.value.code == 1008
+
+
+def test_authorized_websocket_receives_its_orders():
+    async def authorizer(connection, order_ids):
+        return token_authorizer(connection, order_ids)
+
+    terrazip_fastapi, app = make_app(status_stream=True, stream_authorizer=authorizer)
+    broadcaster = terrazip_fastapi._broadcaster
+
+    with TestClient(app) as client:
+        with client.websocket_connect("/orders/ws?order_id=o1&token=secret") as websocket:
+            # The server subscribes right after accepting
+            assert client.portal.call(wait_until, lambda: broadcaster.stats()["subscribers"] == 1)
+            client.portal.call(broadcaster.publish, paid_event("o2"))
+            client.portal.call(broadcaster.publish, paid_event("o1"))
+            message = websocket.receive_json()
+
+    assert message["type"] == "status"
+    assert message["order_id"] == "o1"